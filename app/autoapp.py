@@ -1,10 +1,20 @@
 # -*- coding: utf-8 -*-
 """Create an application instance."""
+from functools import partial
+
 from flask.helpers import get_debug_flag
 
 from league.app import create_app
 from league.settings import DevConfig, ProdConfig
+from league.warmup import warm_worker
 
 CONFIG = DevConfig if get_debug_flag() else ProdConfig
 
 app = create_app(CONFIG)
+
+try:
+    from uwsgidecorators import postfork
+except ImportError:  # Not running under uwsgi
+    pass
+else:
+    postfork(partial(warm_worker, app))
@@ -4,8 +4,8 @@ from collections import OrderedDict
 
 from flask_login import current_user
 from flask_wtf import FlaskForm
-from wtforms import BooleanField, StringField, SubmitField
-from wtforms.validators import URL, DataRequired, Email, Length
+from wtforms import BooleanField, IntegerField, StringField, SubmitField
+from wtforms.validators import URL, DataRequired, Email, Length, NumberRange
 
 from league.forms import CheckboxTableField
 
@@ -97,6 +97,11 @@ class SlackIntegrationForm(FlaskForm):
     icon_emoji = StringField('Icon emoji',
                              validators=[DataRequired(),
                                          Length(min=3, max=25)])
+    digest_window = IntegerField(
+        'Digest window (seconds to hold messages; 0 sends each at once)',
+        validators=[NumberRange(0, 3600)])
+    digest_size = IntegerField('Digest size (messages sent together at most)',
+                               validators=[NumberRange(1, 100)])
     update = SubmitField('Update Configuration')
     test = SubmitField('Test Configuration')
 
@@ -109,6 +114,13 @@ class SlackIntegrationForm(FlaskForm):
         return True
 
 
+class SamplingProfilerForm(FlaskForm):
+    """Sampling profiler form."""
+
+    enabled = BooleanField('Sample the stacks of requests?')
+    update = SubmitField('Update Configuration')
+
+
 class SiteSettingsForm(FlaskForm):
     """Create Site settings form."""
 
@@ -1,18 +1,26 @@
 # -*- coding: utf-8 -*-
 """Admin models."""
 import datetime as dt
+import pickle
+import threading
+import time
+import uuid
 
+from flask import current_app
 from flask_login import UserMixin
 
-from league.database import (Column, Model, SurrogatePK, db, reference_col,
-                             relationship)
-from league.extensions import bcrypt
+from league.database import (Column, Model, SurrogatePK, db, joinedload,
+                             on_commit, reference_col, relationship)
+from league.extensions import passwords
 
 
 class SiteSettings(SurrogatePK, Model):
     """Configuration data for the webapp."""
 
     __tablename__ = 'site_settings'
+    #: Key of the row holding the settings version.
+    VERSION_KEY = 'settings_version'
+
     key = Column(db.String(80), unique=True, nullable=False)
     value = Column(db.String(80), nullable=False)
 
@@ -34,6 +42,31 @@ class SiteSettings(SurrogatePK, Model):
         """Get all SiteSettings."""
         return cls.query.all()
 
+    @classmethod
+    def get_values(cls):
+        """Get every setting as a dictionary of values by key."""
+        return dict(db.session.query(cls.key, cls.value))
+
+    @classmethod
+    def get_version(cls):
+        """Get the settings version, which changes with every save."""
+        return (db.session.query(cls.value)
+                .filter_by(key=cls.VERSION_KEY).scalar())
+
+    @classmethod
+    def save_values(cls, values):
+        """Save values by key and a new version in a single transaction."""
+        values = dict(values)
+        values[cls.VERSION_KEY] = uuid.uuid4().hex
+        rows = {row.key: row for row
+                in cls.query.filter(cls.key.in_(list(values)))}
+        for key, value in values.items():
+            if key in rows:
+                rows[key].value = value
+            else:
+                db.session.add(cls(key=key, value=value))
+        db.session.commit()
+
 
 class Role(SurrogatePK, Model):
     """A role for a user."""
@@ -78,11 +111,17 @@ class User(UserMixin, SurrogatePK, Model):
 
     def set_password(self, password):
         """Set password."""
-        self.password = bcrypt.generate_password_hash(password)
+        self.password = passwords.hash(password)
 
     def check_password(self, value):
         """Check password."""
-        return bcrypt.check_password_hash(self.password, value)
+        return passwords.check(self.password, value)
+
+    @property
+    def password_needs_rehash(self):
+        """Check whether the password was hashed with another cost."""
+        return (self.password is not None and
+                passwords.needs_rehash(self.password))
 
     @property
     def full_name(self):
@@ -108,3 +147,60 @@ class User(UserMixin, SurrogatePK, Model):
         """Delete users by id."""
         cls.query.filter(User.id.in_(ids)).delete(synchronize_session=False)
         db.session.commit()
+        # Bulk deletes do not trigger the commit hook below.
+        user_cache.forget(*ids)
+
+
+class UserCache(object):
+    """
+    Per-worker cache of the users loaded for authenticated requests.
+
+    Users are kept detached, with their roles, for ``USER_CACHE_TIMEOUT``
+    seconds, and merged into the request's session without a query. Commits
+    of this worker that write users or roles empty the cache; changes made by
+    other workers are picked up once entries expire.
+    """
+
+    def __init__(self):
+        """Start empty."""
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def load(self, user_id):
+        """Get the user with ``user_id`` for the current session, or None."""
+        now = time.monotonic()
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > now:
+            return db.session.merge(entry[1], load=False)
+
+        user = (User.query.options(joinedload(User.roles))
+                .filter_by(id=user_id).first())
+        if user is not None:
+            # A pickled copy is detached from the session with everything
+            # loaded, so it never expires or lazy loads.
+            detached = pickle.loads(pickle.dumps(user))
+            expires = now + current_app.config['USER_CACHE_TIMEOUT']
+            with self._lock:
+                self._entries = {key: value for key, value
+                                 in self._entries.items() if value[0] > now}
+                self._entries[user_id] = (expires, detached)
+        return user
+
+    def forget(self, *user_ids):
+        """Drop users by id, or every user if no id is given."""
+        with self._lock:
+            if user_ids:
+                self._entries = {key: value for key, value
+                                 in self._entries.items()
+                                 if key not in user_ids}
+            else:
+                self._entries = {}
+
+
+user_cache = UserCache()
+
+
+@on_commit(User, Role)
+def _forget_users():
+    """Drop cached users after users or their roles change."""
+    user_cache.forget()
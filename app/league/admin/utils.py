@@ -1,69 +1,96 @@
 # -*- coding: utf-8 -*-
 """Admin helper utilities."""
 from league.admin.models import SiteSettings, User
-from league.slack_messenger import DEFAULT_CONFIG, SLACK_ENABLED
+from league.passwords import HashingBusy
+from league.slack_messenger import DEFAULT_CONFIG
+
+#: Prefixes of the keys of Slack configuration and site settings.
+SLACK_PREFIX = 'slack_'
+SITE_PREFIX = 'site_settings_'
+PROFILER_PREFIX = 'profiler_'
 
 
 def create_root_user(app):
-    """Create root user."""
+    """Create root user, returning False if hashing its password is refused."""
     if User.get_by_username('root') is None:
-        root_user = User(username='root', email='root@localhost',
-                         password=app.config['LEAGUE_ROOT_PASS'],
-                         active=True,
-                         is_admin=True)
+        try:
+            root_user = User(username='root', email='root@localhost',
+                             password=app.config['LEAGUE_ROOT_PASS'],
+                             active=True,
+                             is_admin=True)
+        except HashingBusy:
+            app.logger.warning('Root user not created: password hashing is '
+                               'busy, it will be created at the next warm-up')
+            return False
         root_user.save()
+    return True
+
+
+def _setting_value(value):
+    """Convert a configuration value to its stored form."""
+    if type(value) == bool:
+        return 'True' if value else 'False'
+    return str(value)
+
+
+def load_settings(app):
+    """
+    Load site settings and Slack messenger configuration with one query.
+
+    Slack configuration missing from the database is saved with its defaults
+    first.
+    """
+    values = SiteSettings.get_values()
+    missing = {SLACK_PREFIX + k: _setting_value(v)
+               for k, v in DEFAULT_CONFIG.items()
+               if SLACK_PREFIX + k not in values}
+    if missing:
+        SiteSettings.save_values(missing)
+        values = SiteSettings.get_values()
 
+    site_settings = {k: values[SITE_PREFIX + k]
+                     for k in app.config['SITE_SETTINGS']
+                     if SITE_PREFIX + k in values}
+    app.config.update(SITE_SETTINGS=dict(app.config['SITE_SETTINGS'],
+                                         **site_settings))
+    app.extensions['messenger'].update_configuration(
+        config={k: values[SLACK_PREFIX + k] for k in DEFAULT_CONFIG})
+    # Until switched once, sampling follows the app's configuration.
+    if PROFILER_PREFIX + 'enabled' in values:
+        app.extensions['sampling_profiler'].update_configuration(
+            enabled=values[PROFILER_PREFIX + 'enabled'] == 'True')
+    app.extensions['settings_version'] = values.get(SiteSettings.VERSION_KEY)
 
-def load_messenger_config(app):
-    """Load Slack messenger configuration."""
-    if SiteSettings.get_by_key(SLACK_ENABLED) is None:
-        for k, v in DEFAULT_CONFIG.items():
-            config_item = SiteSettings(key='slack_{}'.format(k), value=v)
-            config_item.save()
-    else:
-        new_config = {k: SiteSettings.get_by_key('slack_{}'.format(k)).value
-                      for k in DEFAULT_CONFIG.keys()}
-        app.extensions['messenger'].update_configuration(config=new_config)
+
+def refresh_settings(app):
+    """
+    Reload settings if they were saved since this process loaded them.
+
+    This costs a single query when nothing changed, so it runs before every
+    request to pick up changes made by other workers.
+    """
+    if ('settings_version' not in app.extensions or
+            SiteSettings.get_version() != app.extensions['settings_version']):
+        load_settings(app)
+
+
+def _save_settings(app, prefix, values):
+    """Save a batch of settings in one transaction and reload them."""
+    SiteSettings.save_values({prefix + key: _setting_value(value)
+                              for key, value in values.items()})
+    load_settings(app)
 
 
 def update_messenger_config(app, **kwargs):
     """Update Slack messenger configuration."""
-    for key, value in kwargs.items():
-        if type(value) == bool:
-            value = 'True' if value else 'False'
-        config_item = SiteSettings.get_by_key(key='slack_{}'.format(key))
-        config_item.value = value
-        config_item.update()
-    app.extensions['messenger'].update_configuration(config=kwargs)
-
-
-def load_site_config(app):
-    """Load site settings from the database."""
-    config = app.config['SITE_SETTINGS']
-    new_config = dict()
-    for key in config:
-        config_item = SiteSettings.get_by_key(
-            key='site_settings_{}'.format(key))
-        if config_item is not None:
-            new_config[key] = config_item.value
-    config.update(new_config)
-    app.config.update(SITE_SETTINGS=config)
+    _save_settings(app, SLACK_PREFIX, kwargs)
 
 
 def update_site_settings(app, **kwargs):
     """Update site settings."""
-    config = app.config['SITE_SETTINGS']
-    for key, value in kwargs.items():
-        if type(value) == bool:
-            value = 'True' if value else 'False'
-        config_item = SiteSettings.get_by_key(
-            key='site_settings_{key}'.format(key=key))
-        if config_item is not None:
-            config_item.value = value
-            config_item.update()
-        else:
-            config_item = SiteSettings(
-                key='site_settings_{}'.format(key), value=value)
-            config_item.save()
-    config.update(**kwargs)
-    app.config.update(SITE_SETTINGS=config)
+    _save_settings(app, SITE_PREFIX, kwargs)
+
+
+def update_profiler_config(app, **kwargs):
+    """Update sampling profiler configuration."""
+    _save_settings(app, PROFILER_PREFIX, kwargs)
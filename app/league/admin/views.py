@@ -1,15 +1,18 @@
 # -*- coding: utf-8 -*-
 """User views."""
-from flask import (Blueprint, current_app, flash, redirect, render_template,
-                   request, url_for)
+from flask import (Blueprint, current_app, flash, jsonify, redirect,
+                   render_template, request, url_for)
 
-from league.extensions import messenger
+from league.caching import fragment_stats
+from league.extensions import db, messenger, sampling_profiler
+from league.passwords import HashingBusy
 from league.utils import admin_required, flash_errors
 
-from .forms import (CreateUserForm, DeleteUsersForm, SiteSettingsForm,
-                    SlackIntegrationForm)
+from .forms import (CreateUserForm, DeleteUsersForm, SamplingProfilerForm,
+                    SiteSettingsForm, SlackIntegrationForm)
 from .models import User
-from .utils import update_messenger_config, update_site_settings
+from .utils import (update_messenger_config, update_profiler_config,
+                    update_site_settings)
 
 blueprint = Blueprint('admin', __name__, url_prefix='/admin',
                       static_folder='../static')
@@ -40,12 +43,18 @@ def create_user():
     """Create new user."""
     form = CreateUserForm()
     if form.validate_on_submit():
-        User.create(first_name=form.first_name.data,
-                    last_name=form.last_name.data,
-                    username=form.username.data, email=form.email.data,
-                    password=form.password.data, is_admin=form.is_admin.data,
-                    active=True)
-        flash('User created!', 'success')
+        try:
+            User.create(first_name=form.first_name.data,
+                        last_name=form.last_name.data,
+                        username=form.username.data, email=form.email.data,
+                        password=form.password.data,
+                        is_admin=form.is_admin.data, active=True)
+        except HashingBusy:
+            form.password.errors.append(
+                'Too many passwords are being hashed, try again shortly')
+            flash_errors(form)
+        else:
+            flash('User created!', 'success')
     else:
         flash_errors(form)
     return render_template('admin/create_user.html', create_user_form=form)
@@ -62,14 +71,14 @@ def manage_slack_integration():
                                 webhook=form.webhook.data,
                                 channel=form.channel.data,
                                 username=form.username.data,
-                                icon_emoji=form.icon_emoji.data)
+                                icon_emoji=form.icon_emoji.data,
+                                digest_window=form.digest_window.data,
+                                digest_size=form.digest_size.data)
         flash('Slack integration updated!', 'success')
         if form.test.data:
             flash('Sending test message...', 'success')
-            try:
-                messenger.notify_slack('Test message sent.')
-            except Exception as e:
-                current_app.logger.info(e)
+            messenger.notify_slack('Test message sent.')
+            db.session.commit()
     else:
         flash_errors(form)
     return render_template('admin/slack_integration.html',
@@ -77,6 +86,23 @@ def manage_slack_integration():
                            messenger=messenger.config)
 
 
+@blueprint.route('/sampling_profiler/', methods=['GET', 'POST'])
+@admin_required
+def manage_sampling_profiler():
+    """Switch the sampling profiler of every worker on or off."""
+    form = SamplingProfilerForm()
+    if form.validate_on_submit():
+        update_profiler_config(app=current_app, enabled=form.enabled.data)
+        flash('Sampling profiler {}!'.format(
+            'enabled' if form.enabled.data else 'disabled'), 'success')
+    else:
+        flash_errors(form)
+    return render_template('admin/sampling_profiler.html',
+                           sampling_profiler_form=form,
+                           enabled=sampling_profiler.enabled,
+                           directory=current_app.config['SAMPLING_DIR'])
+
+
 @blueprint.route('/')
 @admin_required
 def settings():
@@ -84,6 +110,13 @@ def settings():
     return render_template('admin/settings.html')
 
 
+@blueprint.route('/cache_stats/', methods=['GET'])
+@admin_required
+def cache_stats():
+    """Get hits and misses of cached pages in this worker."""
+    return jsonify(fragment_stats.as_dict())
+
+
 @blueprint.route('/site_settings/', methods=['GET', 'POST'])
 @admin_required
 def manage_site_settings():
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar league statistics backend.
+
+Games are loaded once per league cache generation into NumPy column arrays and
+every statistic is computed with vectorized counting. Select it with
+``STATS_BACKEND = 'numpy'``; NumPy is an optional dependency only needed by
+this backend.
+"""
+from sqlalchemy import case, select
+
+from league.caching import generation
+from league.database import on_commit, session
+from league.models import BlackPlayerGame, Color, Game, Player, WhitePlayerGame
+from league.stats import Leaderboards, joined_games
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+#: Codes used for the ``winner`` column.
+WINNER_CODES = {None: 0, Color.white: 1, Color.black: 2}
+
+_cache = {}
+
+
+class ColumnarLeague(object):
+    """
+    Games of a league held as column arrays.
+
+    Ranks are the players' ranks when the games were loaded. Rank changes are
+    commits that load the games again, and that rebuild the episode totals of
+    the SQL backend, so both backends count with current ranks.
+    """
+
+    columns = ('white', 'black', 'winner', 'handicap', 'komi', 'season',
+               'episode', 'white_rank', 'black_rank')
+    dtypes = ('int32', 'int32', 'int8', 'int8', 'int8', 'int16', 'int16',
+              'int8', 'int8')
+
+    def __init__(self, white, black, winner, handicap, komi, season, episode,
+                 white_rank, black_rank):
+        """Hold game columns; ``winner`` uses ``WINNER_CODES``."""
+        if np is None:
+            raise RuntimeError('The numpy statistics backend requires NumPy')
+        values = (white, black, winner, handicap, komi, season, episode,
+                  white_rank, black_rank)
+        for name, dtype, column in zip(self.columns, self.dtypes, values):
+            setattr(self, name, np.asarray(column, dtype=dtype))
+        self.size = 1
+        if len(self.white) > 0:
+            self.size = int(max(self.white.max(), self.black.max())) + 1
+
+    def __len__(self):
+        """Get number of games."""
+        return len(self.white)
+
+    @classmethod
+    def from_database(cls):
+        """Load every game with a single query."""
+        joined, white, black = joined_games()
+        games = Game.__table__
+        winner = case([(games.c.winner == Color.white, 1),
+                       (games.c.winner == Color.black, 2)], else_=0)
+        rows = session.execute(select([
+            WhitePlayerGame.__table__.c.player_id,
+            BlackPlayerGame.__table__.c.player_id,
+            winner, games.c.handicap, games.c.komi, games.c.season,
+            games.c.episode, white.c.aga_rank, black.c.aga_rank
+        ]).select_from(joined)).fetchall()
+
+        columns = list(zip(*rows)) or [()] * len(cls.columns)
+        return cls(*columns)
+
+    def _counters(self, mask):
+        """Sum per-player counters over the games selected by mask."""
+        white, black = self.white[mask], self.black[mask]
+        white_won = self.winner[mask] == WINNER_CODES[Color.white]
+        black_won = self.winner[mask] == WINNER_CODES[Color.black]
+        white_rank, black_rank = self.white_rank[mask], self.black_rank[mask]
+
+        def count(white_weights=None, black_weights=None):
+            return (np.bincount(white, white_weights, self.size) +
+                    np.bincount(black, black_weights, self.size)
+                    ).astype(np.int64)
+
+        return {
+            'games': count(),
+            'wins': count(white_won, ~white_won),
+            'stones_given': np.bincount(white, self.handicap[mask],
+                                        self.size).astype(np.int64),
+            'dans_slain': count(
+                white_won & (black_rank > 0) & (white_rank < 0),
+                black_won & (white_rank > 0) & (black_rank < 0)),
+            'kyus_killed': count(
+                white_won & (white_rank > 0) & (black_rank < 0),
+                black_won & (black_rank > 0) & (white_rank < 0)),
+            'games_against_weaker': count(white_rank > black_rank,
+                                          black_rank > white_rank),
+        }
+
+    def _per_episode(self, mask, num_episodes):
+        """Count games and wins per player per episode, for episodes 1..n."""
+        white = self.white[mask].astype(np.int64)
+        black = self.black[mask].astype(np.int64)
+        episode = self.episode[mask].astype(np.int64)
+        white_won = self.winner[mask] == WINNER_CODES[Color.white]
+        width = num_episodes + 1
+        shape = (self.size, width)
+
+        def count(white_weights=None, black_weights=None):
+            counts = (
+                np.bincount(white * width + episode, white_weights,
+                            self.size * width) +
+                np.bincount(black * width + episode, black_weights,
+                            self.size * width))
+            return counts.astype(np.int64).reshape(shape)[:, 1:]
+
+        return count(), count(white_won, ~white_won)
+
+    @staticmethod
+    def _top(values, candidates, num_players):
+        """Map the IDs of the best candidates to their values."""
+        order = np.lexsort((candidates, -values[candidates]))[:num_players]
+        return {int(candidates[i]): values[candidates[i]].item()
+                for i in order}
+
+    def episode_stats(self, season, episode, num_players=5):
+        """Get statistics for an episode."""
+        counters = self._counters((self.season == season) &
+                                  (self.episode == episode))
+        games = counters.pop('games')
+        played = np.flatnonzero(games)
+
+        leaderboards = Leaderboards(num_players)
+        for name in ('wins', 'stones_given', 'dans_slain', 'kyus_killed'):
+            leaderboards.add(name, self._top(counters[name], played,
+                                             num_players))
+        leaderboards.add('games_played', self._top(games, played,
+                                                   num_players))
+        win_ratios = np.zeros(self.size)
+        win_ratios[played] = counters['wins'][played] / games[played]
+        leaderboards.add('win_ratios', self._top(win_ratios, played,
+                                                 num_players), fill=False)
+        return leaderboards.build()
+
+    def season_stats(self, season, num_players=5):
+        """Get statistics for a season."""
+        mask = self.season == season
+        counters = self._counters(mask)
+        del counters['stones_given']
+        games = counters.pop('games')
+        played = np.flatnonzero(games)
+        counters['games_played'] = games
+        counters['losses'] = games - counters['wins']
+
+        num_episodes = int(self.episode[mask].max()) if mask.any() else 0
+        episode_games, episode_wins = self._per_episode(mask, num_episodes)
+        episode_losses = episode_games - episode_wins
+        counters['games_played_one_ep'] = (
+            episode_games.max(axis=1) if num_episodes > 0
+            else np.zeros(self.size, dtype=np.int64))
+
+        leaderboards = Leaderboards(num_players)
+        for name, values in counters.items():
+            leaderboards.add(name, self._top(values, played, num_players))
+        leaderboards.add('wins_minus_losses', self._top(
+            counters['wins'] - counters['losses'], played, num_players),
+            fill=False)
+
+        steady = (episode_games > 0).all(axis=1)
+        fame = ((episode_wins >= 3) & (episode_losses == 0)).any(axis=1)
+        rock = ((episode_losses >= 3) & (episode_wins == 0)).any(axis=1)
+        for name, qualifies in (('steady_freddy', steady),
+                                ('fifteen_min_fame', fame),
+                                ('rock_bottom', rock)):
+            leaderboards.add_players(name, np.flatnonzero(
+                qualifies & (games > 0)).tolist())
+        return leaderboards.build()
+
+
+def get_league():
+    """
+    Get the columnar league, loading it on first use.
+
+    The league is loaded again once the shared ``league`` cache generation
+    changes, which every process sees after another commits games.
+    """
+    token = generation('league')
+    if _cache.get('generation') != token:
+        _cache['league'] = ColumnarLeague.from_database()
+        _cache['generation'] = token
+    return _cache['league']
+
+
+@on_commit(Game, WhitePlayerGame, BlackPlayerGame, Player)
+def forget_league():
+    """Drop the loaded league after games or players change."""
+    _cache.pop('league', None)
+    _cache.pop('generation', None)
+
+
+def episode_stats(season, episode, num_players=5):
+    """Get statistics for an episode."""
+    return get_league().episode_stats(season, episode,
+                                      num_players=num_players)
+
+
+def season_stats(season, num_players=5):
+    """Get statistics for a season."""
+    return get_league().season_stats(season, num_players=num_players)
@@ -4,16 +4,20 @@ from flask_wtf import FlaskForm
 from wtforms import DateTimeField, IntegerField, SelectField, ValidationError
 from wtforms.validators import NumberRange
 
-from league.models import Color, Game
+from league.models import Color, Game, Player, league_clock
 
 
-class GameCreateForm(FlaskForm):
-    """Game creation form."""
+class _GameForm(FlaskForm):
+    """
+    Fields and validation shared by game forms.
+
+    Unlike the dashboard forms, there are no choices to build: both players
+    are checked with one query and season and episode are bounded by the
+    league clock.
+    """
 
-    white_id = SelectField('white_id', coerce=int,
-                           validators=[NumberRange(0, 50000)])
-    black_id = SelectField('black_id', coerce=int,
-                           validators=[NumberRange(0, 50000)])
+    white_id = IntegerField('white_id', validators=[NumberRange(0, 50000)])
+    black_id = IntegerField('black_id', validators=[NumberRange(0, 50000)])
     winner = SelectField(
         'winner', choices=[(name, name) for name, member
                            in Color.__members__.items()])
@@ -22,51 +26,81 @@ class GameCreateForm(FlaskForm):
                                          in [0, 2, 3, 4, 5, 6, 7, 8, 9]])
     komi = SelectField(
         'komi', coerce=int, choices=[(komi, komi) for komi in [0, 5, 6, 7]])
-    season = SelectField('season', coerce=int,
-                         validators=[NumberRange(0, 10000)])
-    episode = SelectField('episode', coerce=int,
-                          validators=[NumberRange(0, 10000)])
+    season = IntegerField('season', validators=[NumberRange(0, 10000)])
+    episode = IntegerField('episode', validators=[NumberRange(0, 10000)])
     played_at = DateTimeField(format='%Y-%m-%d %H:%M:%S %z')
 
+    def _players(self):
+        """Load the submitted players that exist, by ID, with one query."""
+        if not hasattr(self, '_loaded_players'):
+            ids = {self.white_id.data, self.black_id.data} - {None}
+            self._loaded_players = {}
+            if ids:
+                self._loaded_players = {
+                    player.id: player for player
+                    in Player.query.filter(Player.id.in_(ids))}
+        return self._loaded_players
+
+    @staticmethod
+    def _check_player(form, field):
+        """Check that the player exists."""
+        if field.data is not None and field.data not in form._players():
+            raise ValidationError('Player {} does not exist'.format(
+                field.data))
+
+    @staticmethod
+    def _check_bound(field, index, name):
+        """
+        Check that a season or episode is at most one past the latest.
+
+        The league clock may be stale when games were added without the
+        commit hooks, as bulk inserts do, so it is refreshed before rejecting
+        a value.
+        """
+        if field.data is None:
+            return
+        if field.data > league_clock.max_season_episode()[index] + 1:
+            league_clock.forget()
+        maximum = league_clock.max_season_episode()[index] + 1
+        if not 1 <= field.data <= maximum:
+            raise ValidationError('{} must be between 1 and {}'.format(
+                name, maximum))
+
+    @staticmethod
+    def validate_white_id(form, field):
+        """Check that white exists."""
+        form._check_player(form, field)
+
     @staticmethod
     def validate_black_id(form, field):
-        """Check that IDs are different."""
+        """Check that IDs are different and that black exists."""
         if form.black_id.data == form.white_id.data:
             raise ValidationError('Players cannot play themselves')
+        form._check_player(form, field)
+
+    @staticmethod
+    def validate_season(form, field):
+        """Check that the season is at most one past the latest."""
+        form._check_bound(field, 0, 'Season')
+
+    @staticmethod
+    def validate_episode(form, field):
+        """Check that the episode is at most one past the latest."""
+        form._check_bound(field, 1, 'Episode')
+
+
+class GameCreateForm(_GameForm):
+    """Game creation form."""
 
 
-class GameUpdateForm(FlaskForm):
+class GameUpdateForm(_GameForm):
     """Game update form."""
 
     game_id = IntegerField('game_id', validators=[NumberRange(0, 50000)])
 
-    white_id = SelectField('white_id', coerce=int,
-                           validators=[NumberRange(0, 50000)])
-    black_id = SelectField('black_id', coerce=int,
-                           validators=[NumberRange(0, 50000)])
-    winner = SelectField(
-        'winner', choices=[(name, name) for name, member
-                           in Color.__members__.items()])
-    handicap = SelectField(
-        'handicap', coerce=int, choices=[(handi, handi) for handi
-                                         in [0, 2, 3, 4, 5, 6, 7, 8, 9]])
-    komi = SelectField(
-        'komi', coerce=int, choices=[(komi, komi) for komi in [0, 5, 6, 7]])
-    season = SelectField('season', coerce=int,
-                         validators=[NumberRange(0, 10000)])
-    episode = SelectField('episode', coerce=int,
-                          validators=[NumberRange(0, 10000)])
-    played_at = DateTimeField(format='%Y-%m-%d %H:%M:%S %z')
-
     @staticmethod
     def validate_game_id(form, field):
         """Check that game exists."""
         game_id = form.game_id.data
         if Game.get_by_id(game_id) is None:
             raise ValidationError('Game {} does not exist'.format(game_id))
-
-    @staticmethod
-    def validate_black_id(form, field):
-        """Check that IDs are different."""
-        if form.black_id.data == form.white_id.data:
-            raise ValidationError('Players cannot play themselves')
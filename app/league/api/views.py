@@ -2,45 +2,65 @@
 """API."""
 from datetime import timezone
 
-from flask import Blueprint, jsonify, request, url_for
+from flask import (Blueprint, Response, json, jsonify, request,
+                   stream_with_context, url_for)
 from flask_login import login_required
 
 from league.api.forms import GameCreateForm, GameUpdateForm
-from league.extensions import csrf_protect, messenger
+from league.extensions import csrf_protect, db, messenger
 from league.models import Color, Game, Player
 
 blueprint = Blueprint('api', __name__, url_prefix='/api/v1.0',
                       static_folder='../static')
 
+#: Most games returned in one page.
+MAX_PAGE_SIZE = 1000
 
-def _set_game_create_choices(game_create_form):
-    """
-    Calculate choices for season and episode and update form.
-
-    Should allow up to one more than current maxima.
-    """
-    max_season, max_episode = Game.get_max_season_ep()
-    game_create_form.season.choices = [(s, s) for s in range(1, max_season + 2)]
-    game_create_form.episode.choices = [(e, e) for e in
-                                        range(1, max_episode + 2)]
-
-    player_choices = [
-        (player.id, '{} ({})'.format(player.full_name, player.aga_id))
-        for player in Player.get_players()
-    ]
-    game_create_form.white_id.choices = player_choices
-    game_create_form.black_id.choices = player_choices
+NDJSON_MIMETYPE = 'application/x-ndjson'
 
 
 @blueprint.route('/games/all', methods=['GET'])
 @login_required
 def get_games():
-    """Get all games."""
-    form = GameCreateForm(request.form, csrf_enabled=False)
-    _set_game_create_choices(form)
+    """
+    Get all games, in game ID order.
 
-    games = Game.query.all()
-    return jsonify([game.to_dict() for game in games]), 200
+    ``after_id`` and ``limit`` select a page of games, and a ``Link`` header
+    points to the next page when this one is full. Without ``limit``, the
+    array is streamed a game at a time. With ``format=ndjson``, or when NDJSON
+    is the accepted type, games are streamed one JSON object per line instead.
+    """
+    after_id = request.args.get('after_id', type=int)
+    limit = request.args.get('limit', type=int)
+    if limit is not None:
+        limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    games = Game.iter_dicts(after_id=after_id, limit=limit)
+
+    if (request.args.get('format') == 'ndjson' or
+            request.accept_mimetypes.best == NDJSON_MIMETYPE):
+        lines = (json.dumps(game) + '\n' for game in games)
+        return Response(stream_with_context(lines), 200,
+                        mimetype=NDJSON_MIMETYPE)
+
+    if limit is None:
+        return Response(stream_with_context(_json_array(games)), 200,
+                        mimetype='application/json')
+
+    games = list(games)
+    response = jsonify(games)
+    if limit is not None and len(games) == limit:
+        next_url = url_for('api.get_games', after_id=games[-1]['game_id'],
+                           limit=limit, _external=True)
+        response.headers['Link'] = '<{}>; rel="next"'.format(next_url)
+    return response, 200
+
+
+def _json_array(items):
+    """Encode items as a JSON array, an item at a time."""
+    yield '['
+    for index, item in enumerate(items):
+        yield (',\n' if index else '') + json.dumps(item)
+    yield ']\n'
 
 
 @blueprint.route('/games/', methods=['POST'])
@@ -48,14 +68,13 @@ def get_games():
 def create_game():
     """Create a new game."""
     form = GameCreateForm(request.form)
-    _set_game_create_choices(form)
     if form.validate_on_submit():
         white = Player.get_by_id(form.white_id.data)
         black = Player.get_by_id(form.black_id.data)
         played_at = None
         if form.played_at.data is not None:
             played_at = form.played_at.data.astimezone(timezone.utc)
-        game = Game.create(
+        game = Game(
             white=white,
             black=black,
             winner=form.winner.data,
@@ -64,8 +83,11 @@ def create_game():
             season=form.season.data,
             episode=form.episode.data,
             played_at=played_at
-        )
+        ).save(commit=False)
+        # Queue the notification in the game's transaction.
+        db.session.flush()
         messenger.notify_slack(_slack_game_msg(game))
+        db.session.commit()
         return jsonify(game.to_dict()), 201
     else:
         return jsonify(**form.errors), 404
@@ -103,7 +125,6 @@ def _slack_game_msg(game):
 def update_game():
     """Update an existing game."""
     form = GameUpdateForm(request.form)
-    _set_game_create_choices(form)
     if form.validate_on_submit():
         white = Player.get_by_id(form.white_id.data)
         black = Player.get_by_id(form.black_id.data)
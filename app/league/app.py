@@ -8,7 +8,9 @@ from flask import Flask, render_template, request
 from league import admin, api, commands, dashboard, public
 from league.assets import assets
 from league.extensions import (bcrypt, cache, csrf_protect, db, debug_toolbar,
-                               login_manager, messenger, migrate)
+                               login_manager, messenger, metrics, migrate,
+                               passwords, sampling_profiler,
+                               sql_instrumentation)
 from league.public.forms import LoginForm
 from league.settings import ProdConfig
 
@@ -28,7 +30,7 @@ def create_app(config_object=ProdConfig):
     register_errorhandlers(app)
     register_shellcontext(app)
     register_commands(app)
-    register_before_first(app)
+    register_before_request(app)
     return app
 
 
@@ -36,6 +38,7 @@ def register_extensions(app):
     """Register Flask extensions."""
     assets.init_app(app)
     bcrypt.init_app(app)
+    passwords.init_app(app)
     cache.init_app(app)
     db.init_app(app)
     csrf_protect.init_app(app)
@@ -43,6 +46,9 @@ def register_extensions(app):
     debug_toolbar.init_app(app)
     migrate.init_app(app, db)
     messenger.init_app(app)
+    sql_instrumentation.init_app(app)
+    metrics.init_app(app)  # After SQL instrumentation, to read its counts
+    sampling_profiler.init_app(app)
     return None
 
 
@@ -87,13 +93,15 @@ def register_commands(app):
     app.cli.add_command(commands.lint)
     app.cli.add_command(commands.clean)
     app.cli.add_command(commands.urls)
-
-
-def register_before_first(app):
-    """Register functions to run before first request."""
-    app.before_first_request_funcs.append(
-        partial(admin.utils.create_root_user, app))
-    app.before_first_request_funcs.append(
-        partial(admin.utils.load_messenger_config, app))
-    app.before_first_request_funcs.append(
-        partial(admin.utils.load_site_config, app))
+    app.cli.add_command(commands.profile)
+    app.cli.add_command(commands.rebuild_stats)
+    app.cli.add_command(commands.drain_slack)
+    app.cli.add_command(commands.generate_reports)
+    app.cli.add_command(commands.seed)
+    app.cli.add_command(commands.bench)
+    app.cli.add_command(commands.warm_up)
+
+
+def register_before_request(app):
+    """Register functions to run before every request."""
+    app.before_request(partial(admin.utils.refresh_settings, app))
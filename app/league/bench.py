@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the paths whose cost grows with the number of games.
+
+Each benchmark runs against synthetic leagues of increasing size, each in a
+fresh SQLite database seeded by ``league.seeding``. Page renders go through
+the test client with caching disabled, so they measure rendering rather than
+cache hits. For every league size and benchmark, the latency percentiles of
+the timed runs, the SQL queries of one run and the peak memory allocated by
+one run are recorded.
+
+Results can be compared against a baseline from an earlier run: a benchmark
+regresses when its median latency grows by more than a tolerance, or when it
+makes more queries.
+"""
+import json
+import math
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict
+
+from flask import url_for
+from sqlalchemy import event
+
+from league.dashboard.reports import Report
+from league.database import db
+from league.models import Game, Player, WhitePlayerGame
+from league.seeding import seed_league
+
+#: Benchmark names, in the order they run.
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(function):
+    """Register a benchmark, called with the app's test client."""
+    BENCHMARKS[function.__name__] = function
+    return function
+
+
+def _busiest_player():
+    """Get the player with the most games as white."""
+    player_id = (db.session.query(WhitePlayerGame.player_id)
+                 .group_by(WhitePlayerGame.player_id)
+                 .order_by(db.func.count().desc(), WhitePlayerGame.player_id)
+                 .limit(1).scalar())
+    return Player.get_by_id(player_id)
+
+
+@benchmark
+def episode_stats(client):
+    """Leaderboards of the latest episode."""
+    Game.episode_stats()
+
+
+@benchmark
+def season_stats(client):
+    """Leaderboards of the latest season."""
+    Game.season_stats()
+
+
+@benchmark
+def player_stats(client):
+    """Episode, season and league statistics of the busiest player."""
+    player = _busiest_player()
+    player.episode_stats()
+    player.season_stats()
+    player.league_stats()
+
+
+@benchmark
+def episode_report(client):
+    """AGA report of the latest episode."""
+    for _ in Report(*Game.latest_season_episode()):
+        pass
+
+
+@benchmark
+def season_report(client):
+    """AGA report of the latest season."""
+    for _ in Report(Game.latest_season_episode()[0], 0):
+        pass
+
+
+def _get(client, url):
+    """Get a page, raising unless it is served."""
+    response = client.get(url)
+    response.get_data()  # Streamed bodies are only generated when read
+    response.close()
+    if response.status_code != 200:
+        raise RuntimeError('{} answered {}'.format(url, response.status))
+    return response
+
+
+@benchmark
+def dashboard(client):
+    """Dashboard page."""
+    _get(client, url_for('dashboard.dashboard'))
+
+
+@benchmark
+def prizes(client):
+    """Prizes page."""
+    _get(client, url_for('dashboard.prizes'))
+
+
+@benchmark
+def get_player(client):
+    """Page of the busiest player."""
+    _get(client, url_for('dashboard.get_player',
+                         player_id=_busiest_player().id))
+
+
+@benchmark
+def api_games(client):
+    """Every game from the API."""
+    _get(client, url_for('api.get_games'))
+
+
+def percentile(values, percent):
+    """Get a nearest-rank percentile of values."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(len(ordered) * percent / 100) - 1)]
+
+
+def _measure(app, function, repeat):
+    """Run a benchmark, returning its latencies, queries and peak memory."""
+    client = app.test_client()
+
+    def run():
+        with app.test_request_context():
+            try:
+                function(client)
+            finally:
+                db.session.remove()
+
+    queries = []
+
+    def count(*args):
+        queries.append(args[2])
+
+    run()  # Warm up
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        run()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - started)
+    return latencies, len(queries), peak
+
+
+def run_benchmarks(create_app, sizes, repeat=5, names=None, progress=None):
+    """
+    Run benchmarks against leagues of each size, returning the results.
+
+    ``create_app`` is called without arguments for each size, and returns an
+    app whose database is then replaced by a fresh one. ``progress`` is
+    called with each size and benchmark name before it runs.
+    """
+    names = names or list(BENCHMARKS)
+    results = OrderedDict()
+    for size in sizes:
+        app = create_app()
+        with tempfile.TemporaryDirectory() as directory:
+            app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///{}'.format(
+                os.path.join(directory, 'bench.sqlite'))
+            with app.app_context():
+                db.create_all()
+                seed_league(db.session, players=max(20, size // 50),
+                            seasons=max(1, size // 5000), episodes=12,
+                            games=size)
+                db.session.remove()
+
+                results[str(size)] = by_name = OrderedDict()
+                for name in names:
+                    if progress:
+                        progress(size, name)
+                    latencies, queries, peak = _measure(
+                        app, BENCHMARKS[name], repeat)
+                    by_name[name] = OrderedDict([
+                        ('p50_ms', round(percentile(latencies, 50) * 1000, 3)),
+                        ('p90_ms', round(percentile(latencies, 90) * 1000, 3)),
+                        ('p99_ms', round(percentile(latencies, 99) * 1000, 3)),
+                        ('queries', queries),
+                        ('peak_kib', round(peak / 1024))])
+                db.session.remove()
+                db.get_engine(app).dispose()
+    return OrderedDict([
+        ('python', platform.python_version()),
+        ('created_at', time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())),
+        ('repeat', repeat),
+        ('results', results)])
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results against a baseline, returning the regressions found.
+
+    Each regression is a (size, name, message) tuple. Benchmarks missing from
+    either side are ignored.
+    """
+    regressions = []
+    for size, by_name in results['results'].items():
+        for name, result in by_name.items():
+            base = baseline['results'].get(size, {}).get(name)
+            if base is None:
+                continue
+            if result['p50_ms'] > base['p50_ms'] * (1 + tolerance):
+                regressions.append((size, name, 'p50 {} ms, was {} ms'.format(
+                    result['p50_ms'], base['p50_ms'])))
+            if result['queries'] > base['queries']:
+                regressions.append((size, name, '{} queries, was {}'.format(
+                    result['queries'], base['queries'])))
+    return regressions
+
+
+def save(results, path):
+    """Write results to a JSON file."""
+    with open(path, 'w') as output:
+        json.dump(results, output, indent=2)
+        output.write('\n')
+
+
+def load(path):
+    """Read results from a JSON file."""
+    with open(path) as source:
+        return json.load(source, object_pairs_hook=OrderedDict)
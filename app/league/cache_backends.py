@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Cache backends.
+
+``SQLiteCache`` keeps entries in a SQLite database file, so every process on
+a host (e.g. every uwsgi worker) shares one cache. Select it with
+``CACHE_TYPE = 'league.cache_backends.sqlite'``; the file is
+``CACHE_SQLITE_PATH``.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from werkzeug.contrib.cache import BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache_entries ('
+    ' key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL,'
+    ' accessed REAL NOT NULL, generation INTEGER NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS ix_cache_entries_accessed'
+    ' ON cache_entries (accessed)',
+    'CREATE TABLE IF NOT EXISTS cache_meta ('
+    ' name TEXT PRIMARY KEY, value INTEGER NOT NULL)',
+    "INSERT OR IGNORE INTO cache_meta VALUES ('generation', 0)",
+)
+
+#: Condition selecting entries that are neither expired nor cleared.
+LIVE = ('(expires = 0 OR expires > ?) AND generation = '
+        "(SELECT value FROM cache_meta WHERE name = 'generation')")
+
+#: Statement storing an entry in the current generation.
+INSERT = ('INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?, '
+          "(SELECT value FROM cache_meta WHERE name = 'generation'))")
+
+
+class SQLiteCache(BaseCache):
+    """
+    A cache shared by processes through a SQLite database file.
+
+    Entries expire after their timeout, and the least recently used entries
+    are evicted once there are more than ``threshold``. Clearing the cache
+    bumps a global generation counter instead of deleting every entry, so it
+    is a single write; entries of old generations are dropped lazily.
+    """
+
+    #: Seconds between recording accesses to the same entry, which bounds the
+    #: writes made by reads at the cost of a coarser LRU order.
+    access_resolution = 1
+
+    def __init__(self, path, threshold=500, default_timeout=300):
+        """Use the database at ``path``, creating it if needed."""
+        super(SQLiteCache, self).__init__(default_timeout)
+        self.path = path
+        self.threshold = threshold
+        self._local = threading.local()
+        with self._transaction() as connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+
+    def _connect(self):
+        """Get this thread's connection, reconnecting in forked processes."""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = sqlite3.connect(self.path, timeout=30,
+                                               isolation_level=None)
+            local.connection.execute('PRAGMA journal_mode = WAL')
+            local.connection.execute('PRAGMA synchronous = NORMAL')
+            local.pid = os.getpid()
+        return local.connection
+
+    def _transaction(self):
+        """Get a context manager for an immediate write transaction."""
+        return _Transaction(self._connect())
+
+    def _expires(self, timeout):
+        """Get the expiry time of an entry set now with timeout."""
+        timeout = self._normalize_timeout(timeout)
+        return 0 if timeout == 0 else time.time() + timeout
+
+    @property
+    def generation(self):
+        """Get the global generation counter."""
+        return self._connect().execute(
+            "SELECT value FROM cache_meta WHERE name = 'generation'"
+        ).fetchone()[0]
+
+    def get(self, key):
+        """Look up key, returning None when it is missing."""
+        return self.get_many(key)[0]
+
+    def get_many(self, *keys):
+        """Look up several keys with a single query."""
+        if not keys:
+            return []
+        now = time.time()
+        connection = self._connect()
+        rows = connection.execute(
+            'SELECT key, value, accessed FROM cache_entries '
+            'WHERE key IN ({}) AND {}'.format(','.join('?' * len(keys)), LIVE),
+            keys + (now,)).fetchall()
+
+        stale = [key for key, _, accessed in rows
+                 if accessed < now - self.access_resolution]
+        if stale:
+            connection.execute(
+                'UPDATE cache_entries SET accessed = ? WHERE key IN ({})'
+                .format(','.join('?' * len(stale))), [now] + stale)
+        values = {key: pickle.loads(value) for key, value, _ in rows}
+        return [values.get(key) for key in keys]
+
+    def has(self, key):
+        """Check whether key is in the cache."""
+        return self._connect().execute(
+            'SELECT 1 FROM cache_entries WHERE key = ? AND ' + LIVE,
+            (key, time.time())).fetchone() is not None
+
+    def set(self, key, value, timeout=None):
+        """Store value under key, replacing any previous value."""
+        return self.set_many({key: value}, timeout)
+
+    def set_many(self, mapping, timeout=None):
+        """Store several values in one transaction."""
+        now = time.time()
+        expires = self._expires(timeout)
+        rows = [(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires,
+                 now) for key, value in mapping.items()]
+        with self._transaction() as connection:
+            connection.executemany(INSERT, rows)
+            self._prune(connection, now)
+        return True
+
+    def add(self, key, value, timeout=None):
+        """Store value under key unless a live value is already there."""
+        now = time.time()
+        with self._transaction() as connection:
+            if connection.execute(
+                    'SELECT 1 FROM cache_entries WHERE key = ? AND ' + LIVE,
+                    (key, now)).fetchone() is not None:
+                return False
+            connection.execute(
+                INSERT,
+                (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                 self._expires(timeout), now))
+            self._prune(connection, now)
+        return True
+
+    def inc(self, key, delta=1):
+        """Atomically add delta to an integer value, starting from zero."""
+        with self._transaction() as connection:
+            row = connection.execute(
+                'SELECT value, expires FROM cache_entries WHERE key = ? AND ' +
+                LIVE, (key, time.time())).fetchone()
+            if row is None:
+                value, expires = delta, self._expires(None)
+            else:
+                value, expires = pickle.loads(row[0]) + delta, row[1]
+            connection.execute(
+                INSERT,
+                (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires,
+                 time.time()))
+        return value
+
+    def dec(self, key, delta=1):
+        """Atomically subtract delta from an integer value."""
+        return self.inc(key, -delta)
+
+    def delete(self, key):
+        """Delete key."""
+        return self.delete_many(key)
+
+    def delete_many(self, *keys):
+        """Delete several keys with a single statement."""
+        if keys:
+            self._connect().execute(
+                'DELETE FROM cache_entries WHERE key IN ({})'.format(
+                    ','.join('?' * len(keys))), keys)
+        return True
+
+    def clear(self):
+        """Invalidate every entry by bumping the generation counter."""
+        with self._transaction() as connection:
+            connection.execute(
+                'UPDATE cache_meta SET value = value + 1 '
+                "WHERE name = 'generation'")
+        return True
+
+    def _prune(self, connection, now):
+        """Drop dead entries, then evict the least recently used ones."""
+        count = connection.execute(
+            'SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+        if count <= self.threshold:
+            return
+        connection.execute(
+            'DELETE FROM cache_entries WHERE NOT ({})'.format(LIVE), (now,))
+        connection.execute(
+            'DELETE FROM cache_entries WHERE key IN ('
+            ' SELECT key FROM cache_entries ORDER BY accessed'
+            ' LIMIT max(0, (SELECT COUNT(*) FROM cache_entries) - ?))',
+            (self.threshold,))
+
+
+class _Transaction(object):
+    """Run statements in an immediate transaction, committing on success."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+def sqlite(app, config, args, kwargs):
+    """Create a ``SQLiteCache`` for Flask-Caching."""
+    args.insert(0, config['CACHE_SQLITE_PATH'])
+    kwargs.update(dict(threshold=config['CACHE_THRESHOLD']))
+    return SQLiteCache(*args, **kwargs)
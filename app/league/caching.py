@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Cached rendering of public pages.
+
+Only the user-independent part of a page is cached. The layout around it
+(navigation, login form, flashed messages) is still rendered per request.
+
+Fragments are keyed by the league's latest season and episode, by the site
+settings version and by a league data generation. The generation is replaced
+after any commit that writes games or players. Entries keyed by an old
+generation are never read again and age out of the cache. The generation lives
+in the cache too, so every worker sharing a cache backend sees it.
+
+Other values derived from league data, such as form choices, are cached the
+same way with ``cached_value``.
+"""
+import uuid
+from collections import Counter
+
+from flask import current_app, g, has_app_context, has_request_context
+from markupsafe import Markup
+
+from league.database import on_commit
+from league.extensions import cache
+from league.models import (BlackPlayerGame, Game, Player, PlayerEpisodeStats,
+                           WhitePlayerGame, league_clock)
+
+
+class FragmentStats(object):
+    """Per-worker hit and miss counts of cached fragments and values."""
+
+    def __init__(self):
+        """Start with no hits or misses."""
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def as_dict(self):
+        """Get hits and misses by fragment or value name."""
+        names = sorted(set(self.hits) | set(self.misses))
+        return {name: {'hits': self.hits[name], 'misses': self.misses[name]}
+                for name in names}
+
+    def reset(self):
+        """Forget every hit and miss."""
+        self.hits.clear()
+        self.misses.clear()
+
+
+fragment_stats = FragmentStats()
+
+
+def _count_lookup(name, hit):
+    """Count a cache lookup for this worker and for the current request."""
+    if hit:
+        fragment_stats.hits[name] += 1
+    else:
+        fragment_stats.misses[name] += 1
+    if has_request_context():
+        key = 'cache_hits' if hit else 'cache_misses'
+        setattr(g, key, g.get(key, 0) + 1)
+
+
+def generation(name):
+    """Get the current generation token of ``name``."""
+    key = 'generation/{}'.format(name)
+    token = cache.get(key)
+    if token is None:
+        # Never fall back to a fixed default: entries of a generation evicted
+        # from the cache could otherwise be served again.
+        cache.add(key, uuid.uuid4().hex, timeout=0)
+        token = cache.get(key)
+    return token
+
+
+def bump_generation(name):
+    """Replace the generation token of ``name``, orphaning its entries."""
+    cache.set('generation/{}'.format(name), uuid.uuid4().hex, timeout=0)
+
+
+def fragment_key(name):
+    """Get the cache key of fragment ``name`` for the current league state."""
+    season, episode = league_clock.latest_season_episode()
+    return 'fragment/{}/{}/{}/{}/{}'.format(
+        name, season, episode, generation('league'),
+        current_app.extensions.get('settings_version'))
+
+
+def cached_fragment(name, render):
+    """
+    Get fragment ``name`` from the cache, rendering it on a miss.
+
+    ``render`` is called without arguments and returns HTML. Whether the
+    fragment was a hit is recorded on ``g.fragment_cache`` for the response.
+    """
+    key = fragment_key(name)
+    html = cache.get(key)
+    _count_lookup(name, html is not None)
+    if html is None:
+        g.fragment_cache = 'MISS'
+        html = render()
+        cache.set(key, html)
+    else:
+        g.fragment_cache = 'HIT'
+    return Markup(html)
+
+
+def cached_value(name, compute):
+    """
+    Get value ``name`` for the current league data, computing it on a miss.
+
+    ``compute`` is called without arguments and returns a picklable value
+    other than None.
+    """
+    key = 'value/{}/{}'.format(name, generation('league'))
+    value = cache.get(key)
+    _count_lookup(name, value is not None)
+    if value is None:
+        value = compute()
+        cache.set(key, value)
+    return value
+
+
+def add_cache_header(response):
+    """Tell clients whether the page content came from the cache."""
+    status = g.pop('fragment_cache', None)
+    if status is not None:
+        response.headers['X-Cache'] = status
+    return response
+
+
+def _can_bump():
+    """Check whether the application's cache is available."""
+    return has_app_context() and 'cache' in current_app.extensions
+
+
+@on_commit(Game, WhitePlayerGame, BlackPlayerGame, Player, PlayerEpisodeStats)
+def _bump_league_generation():
+    """Orphan cached fragments after games or players change."""
+    if _can_bump():
+        bump_generation('league')
@@ -9,6 +9,18 @@ from flask import current_app
 from flask.cli import with_appcontext
 from werkzeug.exceptions import MethodNotAllowed, NotFound
 
+from league import bench as benchmarks
+from league.admin.utils import load_settings
+from league.caching import bump_generation
+from league.dashboard.reports import stale_reports, store_reports
+from league.database import db
+from league.extensions import messenger
+from league.models import league_clock
+from league.profiling import profile_route
+from league.seeding import seed_league
+from league.stats import refresh_player_episode_stats
+from league.warmup import warm_deploy
+
 HERE = os.path.abspath(os.path.dirname(__file__))
 FLASK_ROOT = os.path.join(HERE, os.pardir)
 PROJECT_ROOT = os.path.join(FLASK_ROOT, os.pardir)
@@ -128,3 +140,166 @@ def urls(url, order):
 
     for row in rows:
         click.echo(str_template.format(*row[:column_length]))
+
+
+@click.command()
+@click.argument('path')
+@click.option('-n', '--repeat', default=10, type=click.IntRange(1),
+              show_default=True, help='Number of requests to profile')
+@click.option('--database', default=None,
+              help='Database URI to profile against [default: configured]')
+@click.option('--cached', default=False, is_flag=True,
+              help='Serve cached fragments rather than rendering them again')
+@click.option('-s', '--sort', default='cumulative', show_default=True,
+              type=click.Choice(['cumulative', 'tottime', 'ncalls']),
+              help='Column to sort hotspots by')
+@click.option('-l', '--limit', default=30, type=click.IntRange(1),
+              show_default=True, help='Number of hotspots to list')
+@click.option('-o', '--output', default='callgrind.out.profile',
+              show_default=True, type=click.Path(dir_okay=False),
+              help='File to write the callgrind profile to')
+@click.option('--stats', 'stats_output', default=None,
+              type=click.Path(dir_okay=False),
+              help='File to write the pstats profile to, for snakeviz etc.')
+@with_appcontext
+def profile(path, repeat, database, cached, sort, limit, output,
+            stats_output):
+    """Profile requests to a route, such as /dashboard/players/1."""
+    app = current_app._get_current_object()
+    if database:
+        app.config['SQLALCHEMY_DATABASE_URI'] = database
+    try:
+        result = profile_route(app, path, repeat, cached=cached)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    click.echo('Mean time of {} requests to {}:'.format(repeat, path))
+    total = result.split.total
+    for part, seconds in result.split.as_dict().items():
+        click.echo('{:>8} {:9.2f} ms {:5.1f}%'.format(
+            part, seconds / repeat * 1000, seconds / total * 100))
+    click.echo()
+    click.echo(result.hotspots(sort, limit))
+
+    with open(output, 'w') as callgrind:
+        result.write_callgrind(callgrind)
+    click.echo('Wrote callgrind profile to {}.'.format(output))
+    if stats_output:
+        result.dump_stats(stats_output)
+        click.echo('Wrote pstats profile to {}.'.format(stats_output))
+
+
+@click.command()
+@with_appcontext
+def warm_up():
+    """Create the root user and default settings, and fill the page cache."""
+    try:
+        urls = warm_deploy(current_app._get_current_object())
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    for url in urls:
+        click.echo('Cached {}.'.format(url))
+    click.echo('Warmed up.')
+
+
+@click.command()
+@with_appcontext
+def rebuild_stats():
+    """Rebuild player episode statistics from all games."""
+    refresh_player_episode_stats(db.session)
+    db.session.commit()
+    click.echo('Rebuilt player episode stats.')
+
+
+@click.command()
+@click.option('--flush', default=False, is_flag=True,
+              help='Send digests without waiting for their window to close')
+@with_appcontext
+def drain_slack(flush):
+    """Deliver every due Slack notification in the outbox."""
+    load_settings(current_app)
+    sent, failed = messenger.deliver_pending(flush=flush)
+    click.echo('Sent {} Slack messages, {} failed.'.format(sent, failed))
+
+
+@click.command()
+@click.option('-p', '--processes', default=None, type=int,
+              help='Number of worker processes [default: one per CPU]')
+@with_appcontext
+def generate_reports(processes):
+    """Generate the AGA reports of every episode and season."""
+    reports = stale_reports()
+    for season, episode in store_reports(current_app._get_current_object(),
+                                         reports, processes):
+        click.echo('Generated report of season {}, episode {}.'.format(
+            season, episode))
+    click.echo('Generated {} reports.'.format(len(reports)))
+
+
+@click.command()
+@click.option('--players', default=200, type=click.IntRange(2),
+              show_default=True, help='Number of players to add')
+@click.option('--seasons', default=3, type=click.IntRange(1),
+              show_default=True, help='Number of seasons to add')
+@click.option('--episodes', default=12, type=click.IntRange(1),
+              show_default=True, help='Number of episodes per season')
+@click.option('--games', default=10000, type=click.IntRange(0),
+              show_default=True, help='Number of games to add')
+@click.option('--seed', default=0, show_default=True,
+              help='Seed of the random generator')
+@with_appcontext
+def seed(players, seasons, episodes, games, seed):
+    """Add a synthetic league for scale testing."""
+    seed_league(db.session, players, seasons, episodes, games, seed=seed)
+    # Bulk inserts bypass the hooks that keep these up to date.
+    league_clock.forget()
+    bump_generation('league')
+    click.echo('Added {} players and {} games.'.format(players, games))
+
+
+@click.command()
+@click.option('--sizes', default='1000,10000', show_default=True,
+              help='Comma separated numbers of games of the leagues')
+@click.option('-n', '--repeat', default=5, type=click.IntRange(1),
+              show_default=True, help='Timed runs of each benchmark')
+@click.option('-b', '--benchmark', 'names', multiple=True,
+              type=click.Choice(list(benchmarks.BENCHMARKS)),
+              help='Benchmark to run, repeatable [default: all]')
+@click.option('-o', '--output', default='bench.json', show_default=True,
+              type=click.Path(dir_okay=False), help='File to write results to')
+@click.option('--baseline', default=None,
+              type=click.Path(exists=True, dir_okay=False),
+              help='Results to compare against')
+@click.option('--tolerance', default=0.2, show_default=True,
+              help='Median latency growth tolerated against the baseline')
+def bench(sizes, repeat, names, output, baseline, tolerance):
+    """Benchmark stats, reports, pages and the API on synthetic leagues."""
+    from league.app import create_app
+    from league.settings import BenchConfig
+
+    sizes = [int(size) for size in sizes.split(',')]
+    results = benchmarks.run_benchmarks(
+        lambda: create_app(BenchConfig), sizes, repeat, names,
+        progress=lambda size, name: click.echo(
+            '{} games: {}'.format(size, name), err=True))
+    benchmarks.save(results, output)
+
+    click.echo('{:>8} {:<16} {:>9} {:>9} {:>9} {:>7} {:>9}'.format(
+        'games', 'benchmark', 'p50 ms', 'p90 ms', 'p99 ms', 'queries',
+        'peak KiB'))
+    for size, by_name in results['results'].items():
+        for name, result in by_name.items():
+            click.echo('{:>8} {:<16} {p50_ms:>9} {p90_ms:>9} {p99_ms:>9} '
+                       '{queries:>7} {peak_kib:>9}'.format(size, name,
+                                                           **result))
+
+    if baseline:
+        regressions = benchmarks.compare(results, benchmarks.load(baseline),
+                                         tolerance)
+        for size, name, message in regressions:
+            click.echo('Regression: {} games, {}: {}'.format(size, name,
+                                                             message))
+        if regressions:
+            raise click.ClickException(
+                '{} regressions against {}'.format(len(regressions), baseline))
+        click.echo('No regressions against {}.'.format(baseline))
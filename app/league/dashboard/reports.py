@@ -1,21 +1,195 @@
 # -*- coding: utf-8 -*-
-"""Dashboard reports."""
-from league.models import Game
+"""
+Dashboard reports.
+
+Generated reports are stored, keyed by a digest of the games they cover and
+of their players, and served again until one of those games is added, deleted
+or modified (which updates its ``last_modified_at``), or one of the players
+listed changes. ``flask generate-reports`` pre-generates the reports of every
+episode and season in a pool of processes.
+"""
+import hashlib
+import multiprocessing
+import tempfile
+
+from sqlalchemy.orm import aliased
+
+from league.database import db, func, session
+from league.models import (BlackPlayerGame, Game, Player, StoredReport,
+                           WhitePlayerGame)
 
 
 class Report(object):
-    """A convenience class for generating AGA results reports."""
+    """
+    An AGA results report, iterated over as lines of text.
+
+    The report lists the players of the selected games, then the games. Both
+    come from a single query joining every game with its two players, read a
+    batch of rows at a time without building game or player objects. Game
+    lines are spooled to a temporary file while the players are collected,
+    so memory use does not grow with the number of games.
+    """
 
-    def __init__(self, season, episode):
-        """Build a report."""
+    #: Bytes of game lines kept in memory before spooling to disk.
+    spool_size = 1024 * 1024
+
+    def __init__(self, season, episode, batch_size=1000):
+        """Build a report of an episode, or of a season if episode is 0."""
         self.season = season
         self.episode = episode
+        self.batch_size = batch_size
+
+    @property
+    def filename(self):
+        """Get the file name of the report."""
+        if self.episode > 0:
+            return 'results-s{}-e{}.txt'.format(self.season, self.episode)
+        return 'results-s{}.txt'.format(self.season)
 
-        self.games = []
+    def _games(self, query):
+        """Filter a query to the games of the report."""
+        query = query.filter(Game.season == self.season)
         if self.episode > 0:
-            self.games = Game.get_by_season_ep(season, episode)
-        elif self.episode == 0:
-            self.games = Game.get_by_season(season)
+            query = query.filter(Game.episode == self.episode)
+        return query
+
+    def digest(self):
+        """Get a digest identifying the current state of the report's games."""
+        state = self._games(session.query(
+            func.count(Game.id), func.sum(Game.id),
+            func.max(Game.last_modified_at))).one()
+        digest = hashlib.sha1(repr(tuple(state)).encode())
+        # Players are listed with their current names and ranks.
+        for player in self._players().yield_per(self.batch_size):
+            digest.update(repr(tuple(player)).encode())
+        return digest.hexdigest()
+
+    def _players(self):
+        """Query what the report lists of its players, in ID order."""
+        white_ids = self._games(session.query(WhitePlayerGame.player_id)
+                                .join(Game,
+                                      Game.id == WhitePlayerGame.game_id))
+        black_ids = self._games(session.query(BlackPlayerGame.player_id)
+                                .join(Game,
+                                      Game.id == BlackPlayerGame.game_id))
+        return (session.query(Player.aga_id, Player.last_name,
+                              Player.first_name, Player.aga_rank)
+                .filter(Player.id.in_(white_ids.union(black_ids)))
+                .order_by(Player.id))
+
+    def rows(self):
+        """Get the players and results of each game, in game order."""
+        white = aliased(Player)
+        black = aliased(Player)
+        query = (session.query(white.aga_id, white.last_name,
+                               white.first_name, white.aga_rank,
+                               black.aga_id, black.last_name,
+                               black.first_name, black.aga_rank,
+                               Game.winner, Game.handicap, Game.komi)
+                 .select_from(Game)
+                 .join(WhitePlayerGame, WhitePlayerGame.game_id == Game.id)
+                 .join(white, white.id == WhitePlayerGame.player_id)
+                 .join(BlackPlayerGame, BlackPlayerGame.game_id == Game.id)
+                 .join(black, black.id == BlackPlayerGame.player_id)
+                 .order_by(Game.id))
+        return self._games(query).yield_per(self.batch_size)
+
+    def __iter__(self):
+        """Iterate over the lines of the report."""
+        players = {}
+        with tempfile.SpooledTemporaryFile(self.spool_size, 'w+') as games:
+            for row in self.rows():
+                players[row[0]] = row[1:4]
+                players[row[4]] = row[5:8]
+                winner, handicap, komi = row[8:]
+                games.write('{} {} {} {} {}\n'.format(
+                    row[0], row[4], winner.abbr, handicap, komi))
+
+            yield 'PLAYERS\n'
+            for aga_id in sorted(players):
+                last_name, first_name, aga_rank = players[aga_id]
+                yield '{} {}, {} {}\n'.format(aga_id, last_name, first_name,
+                                              aga_rank)
+            yield 'GAMES\n'
+            games.seek(0)
+            for line in games:
+                yield line
+
+    def stored_lines(self):
+        """
+        Iterate over the lines of the report, reusing a stored copy.
+
+        A report generated here is stored once it has been iterated over
+        completely.
+        """
+        digest = self.digest()
+        stored = StoredReport.get_current(self.season, self.episode, digest)
+        if stored is not None:
+            yield stored.content
+            return
+
+        lines = []
+        for line in self:
+            lines.append(line)
+            yield line
+        StoredReport.replace(self.season, self.episode, digest,
+                             ''.join(lines))
+
+
+def stale_reports():
+    """Get (season, episode, digest) of reports to generate again."""
+    season_episodes = (session.query(Game.season, Game.episode).distinct()
+                       .order_by(Game.season, Game.episode).all())
+    seasons = sorted({season for season, _ in season_episodes})
+    stale = []
+    for season, episode in ([(season, 0) for season in seasons] +
+                            season_episodes):
+        digest = Report(season, episode).digest()
+        if StoredReport.get_current(season, episode, digest) is None:
+            stale.append((season, episode, digest))
+    return stale
+
+
+_worker_app = None
+
+
+def _init_worker():
+    """Run report generation in an app context of the forked app."""
+    _worker_app.app_context().push()
+
+
+def _generate(season_episode_digest):
+    """Generate a report in a worker process."""
+    season, episode, digest = season_episode_digest
+    return season, episode, digest, ''.join(Report(season, episode))
+
+
+def store_reports(app, reports, processes=None):
+    """
+    Generate and store reports in a pool of processes.
+
+    ``reports`` are (season, episode, digest) tuples, as returned by
+    ``stale_reports``. Reports are generated by the workers and stored by
+    this process as they complete. Yields the (season, episode) of each.
+    """
+    global _worker_app
 
-        player_sets = [game.players for game in self.games]
-        self.players = frozenset().union(*player_sets)
+    if processes == 1:
+        results = map(_generate, reports)
+    else:
+        # Workers open their own connections, rather than sharing this
+        # process's pooled ones over fork.
+        db.session.remove()
+        db.engine.dispose()
+        _worker_app = app
+        pool = multiprocessing.get_context('fork').Pool(
+            processes, initializer=_init_worker)
+        results = pool.imap_unordered(_generate, reports)
+    try:
+        for season, episode, digest, content in results:
+            StoredReport.replace(season, episode, digest, content)
+            yield season, episode
+    finally:
+        if processes != 1:
+            pool.terminate()
+            pool.join()
@@ -1,9 +1,10 @@
 # -*- coding: utf-8 -*-
 """Dashboard."""
-from flask import (Blueprint, current_app, flash, redirect, render_template,
-                   request, url_for)
+from flask import (Blueprint, Response, current_app, flash, redirect,
+                   render_template, request, stream_with_context, url_for)
 from flask_login import login_required, login_user
 
+from league.caching import add_cache_header, cached_fragment, cached_value
 from league.dashboard.forms import (GameCreateForm, PlayerCreateForm,
                                     PlayerDeleteForm, ReportGenerateForm)
 from league.dashboard.reports import Report
@@ -14,6 +15,7 @@ from league.utils import flash_errors
 
 blueprint = Blueprint('dashboard', __name__, url_prefix='/dashboard',
                       static_folder='../static')
+blueprint.after_request(add_cache_header)
 
 
 @blueprint.route('/', methods=['GET', 'POST'])
@@ -31,24 +33,23 @@ def dashboard():
             return redirect(redirect_url)
         else:
             flash_errors(form)
-    players = Player.query.all()
-    games = Game.query.all()
-    return render_template('dashboard/dashboard.html',
-                           site_settings=site_settings,
-                           login_form=form,
-                           players=players, games=games,
-                           episode_stats=Game.episode_stats())
+    content = cached_fragment('dashboard', lambda: render_template(
+        'dashboard/dashboard_content.html',
+        site_settings=site_settings,
+        players=Player.query.all(), games=Game.with_players().all(),
+        episode_stats=Game.episode_stats()))
+    return render_template('dashboard/dashboard.html', content=content,
+                           login_form=form)
 
 
 @blueprint.route('/prizes/', methods=['GET', 'POST'])
 def prizes():
     """Prizes and achievements."""
     site_settings = current_app.config['SITE_SETTINGS']
-    players = Player.query.all()
-    games = Game.query.all()
-    return render_template('dashboard/prizes.html', site_settings=site_settings,
-                           players=players, games=games,
-                           season_stats=Game.season_stats())
+    content = cached_fragment('prizes', lambda: render_template(
+        'dashboard/prizes_content.html', site_settings=site_settings,
+        season_stats=Game.season_stats()))
+    return render_template('dashboard/prizes.html', content=content)
 
 
 @blueprint.route('/players/', methods=['GET'])
@@ -96,13 +97,14 @@ def get_player(player_id):
             flash_errors(form)
 
     player = Player.get_by_id(player_id)
+    stats = player.history().stats(Game.latest_season_episode())
 
     return render_template(
         'dashboard/player.html',
         player=player,
-        episode_stats=player.episode_stats(),
-        season_stats=player.season_stats(),
-        league_stats=player.league_stats(),
+        episode_stats=stats['episode'],
+        season_stats=stats['season'],
+        league_stats=stats['league'],
         login_form=form
     )
 
@@ -124,17 +126,18 @@ def _set_game_create_choices(game_create_form):
     """
     Calculate choices for season and episode and update form.
 
-    Should allow up to one more than current maxima.
+    Should allow up to one more than current maxima. Player choices are cached
+    until players or games change.
     """
     max_season, max_episode = Game.get_max_season_ep()
     game_create_form.season.choices = [(s, s) for s in range(1, max_season + 2)]
     game_create_form.episode.choices = [(e, e) for e in
                                         range(1, max_episode + 2)]
 
-    player_choices = [
+    player_choices = cached_value('player_choices', lambda: [
         (player.id, '{} ({})'.format(player.full_name, player.aga_id))
         for player in Player.get_players()
-    ]
+    ])
     game_create_form.white_id.choices = player_choices
     game_create_form.black_id.choices = player_choices
 
@@ -146,7 +149,7 @@ def list_games():
     form = GameCreateForm(request.form, csrf_enabled=False)
     _set_game_create_choices(form)
 
-    games = Game.query.all()
+    games = Game.with_players().all()
     return render_template('dashboard/games.html', games=games,
                            game_create_form=form)
 
@@ -175,12 +178,15 @@ def get_reports():
 @blueprint.route('/reports/', methods=['POST'])
 @login_required
 def generate_report():
-    """Generate results report for submission to AGA."""
+    """Download results report for submission to AGA."""
     form = ReportGenerateForm(request.form, csrf_enabled=False)
-    report = None
     if form.validate_on_submit():
         report = Report(form.season.data, form.episode.data)
-    else:
-        flash_errors(form)
-    return render_template('dashboard/reports.html', report=report,
+        return Response(
+            stream_with_context(report.stored_lines()), 200,
+            mimetype='text/plain',
+            headers={'Content-Disposition':
+                     'attachment; filename={}'.format(report.filename)})
+    flash_errors(form)
+    return render_template('dashboard/reports.html',
                            report_generate_form=form)
@@ -4,9 +4,9 @@ Database module.
 
 Includes the SQLAlchemy database object and DB-related utilities
 """
-from sqlalchemy import func
+from sqlalchemy import event, func
 from sqlalchemy.ext.associationproxy import association_proxy
-from sqlalchemy.orm import backref, relationship
+from sqlalchemy.orm import backref, joinedload, relationship
 
 from .extensions import db
 
@@ -14,11 +14,55 @@ from .extensions import db
 Column = db.Column
 association_proxy = association_proxy
 backref = backref
+event = event
 func = func
+joinedload = joinedload
 relationship = relationship
 session = db.session
 
 
+_commit_callbacks = []
+
+
+def on_commit(*models):
+    """Register a function to call after commits that wrote any of models.
+
+    Usage: ::
+
+        @on_commit(Game)
+        def forget_games():
+            ...
+    """
+    def decorator(callback):
+        _commit_callbacks.append((models, callback))
+        return callback
+    return decorator
+
+
+@event.listens_for(session, 'before_flush')
+def _record_written_models(flushing_session, flush_context, instances):
+    """Remember which models a transaction writes to."""
+    written = flushing_session.info.setdefault('written_models', set())
+    for instance in (flushing_session.new | flushing_session.dirty |
+                     flushing_session.deleted):
+        written.add(type(instance))
+
+
+@event.listens_for(session, 'after_commit')
+def _run_commit_callbacks(committed_session):
+    """Call commit callbacks registered for the models written."""
+    written = committed_session.info.pop('written_models', set())
+    for models, callback in _commit_callbacks:
+        if any(issubclass(model, models) for model in written):
+            callback()
+
+
+@event.listens_for(session, 'after_rollback')
+def _forget_written_models(rolled_back_session):
+    """Forget models written by a rolled back transaction."""
+    rolled_back_session.info.pop('written_models', None)
+
+
 class CRUDMixin(object):
     """Mixin that adds convenience methods for CRUD."""
 
@@ -12,6 +12,10 @@ from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf.csrf import CsrfProtect
 
+from league.instrumentation import SQLInstrumentation
+from league.metrics import Metrics
+from league.passwords import PasswordHasher
+from league.sampling import SamplingProfiler
 from league.slack_messenger import SlackMessenger
 
 bcrypt = Bcrypt()
@@ -22,3 +26,7 @@ migrate = Migrate()
 cache = Cache()
 debug_toolbar = DebugToolbarExtension()
 messenger = SlackMessenger()
+passwords = PasswordHasher()
+sql_instrumentation = SQLInstrumentation()
+metrics = Metrics()
+sampling_profiler = SamplingProfiler()
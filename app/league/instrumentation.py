@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Per-request SQL instrumentation.
+
+While a request is handled, every statement its thread executes is counted
+and timed through SQLAlchemy engine events, and grouped by shape: the
+statement text, with lists of bound parameters collapsed, so that the same
+query run for different rows has one shape. Responses then carry
+``X-Query-Count`` and ``Server-Timing`` headers, and a JSON log line records
+the request's statements and times.
+
+A shape executed more than ``SQL_REPEAT_THRESHOLD`` times in one request is
+logged as a warning. That is the signature of an N+1 query pattern, such as
+lazy loading a relationship of each row of a list.
+
+Statements run while a streamed response body is sent come after the
+response headers, so they are not counted.
+"""
+import json
+import re
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#: Parameter lists, such as those of IN clauses, of any length.
+PARAMETER_LIST = re.compile(r'\((?:\s*(?:\?|%\(\w+\)s|:\w+)\s*,?)+\)')
+
+
+def statement_shape(statement):
+    """Get the shape of a statement, with parameter lists collapsed."""
+    return ' '.join(PARAMETER_LIST.sub('(?)', statement).split())
+
+
+class RequestQueries(object):
+    """The statements executed by a request."""
+
+    def __init__(self):
+        """Start counting."""
+        self.started = time.perf_counter()
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, duration):
+        """Record an executed statement."""
+        self.count += 1
+        self.duration += duration
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold):
+        """Get (shape, count) of shapes executed more than threshold times."""
+        return [(shape, count) for shape, count in self.shapes.most_common()
+                if count > threshold]
+
+
+def _current_queries():
+    """Get the statements recorded for the current request, or None."""
+    return g.get('sql_queries') if has_request_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    """Note when a statement of a request starts."""
+    if _current_queries() is not None:
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    """Record a statement of a request once it completes."""
+    queries = _current_queries()
+    started = conn.info.get('query_started')
+    if queries is not None and started:
+        queries.record(statement, time.perf_counter() - started.pop())
+
+
+def _handle_error(exception_context):
+    """Forget the start of a failed statement."""
+    started = exception_context.connection.info.get('query_started')
+    if started and _current_queries() is not None:
+        started.pop()
+
+
+class SQLInstrumentation(object):
+    """Count and time the SQL statements of each request."""
+
+    def __init__(self, app=None):
+        """Initialize instrumentation."""
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize SQL Instrumentation."""
+        self.app = app
+        app.extensions['sql_instrumentation'] = self
+        if not app.config['SQL_INSTRUMENTATION']:
+            return
+        for name, listener in (('before_cursor_execute',
+                                _before_cursor_execute),
+                               ('after_cursor_execute', _after_cursor_execute),
+                               ('handle_error', _handle_error)):
+            if not event.contains(Engine, name, listener):
+                event.listen(Engine, name, listener)
+        app.before_request(self.start)
+        app.after_request(self.finish)
+
+    def start(self):
+        """Start recording the statements of a request."""
+        g.sql_queries = RequestQueries()
+
+    def finish(self, response):
+        """Report the statements of a request on the response and the log."""
+        queries = g.pop('sql_queries', None)
+        if queries is None:
+            return response
+        total = time.perf_counter() - queries.started
+        response.headers['X-Query-Count'] = str(queries.count)
+        response.headers['Server-Timing'] = (
+            'db;dur={:.1f};desc="{} queries", total;dur={:.1f}'.format(
+                queries.duration * 1000, queries.count, total * 1000))
+
+        self.app.logger.info(json.dumps({
+            'event': 'request',
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': queries.count,
+            'db_ms': round(queries.duration * 1000, 1),
+            'total_ms': round(total * 1000, 1)}, sort_keys=True))
+        for shape, count in queries.repeated(
+                self.app.config['SQL_REPEAT_THRESHOLD']):
+            self.app.logger.warning(json.dumps({
+                'event': 'repeated_query',
+                'method': request.method,
+                'path': request.path,
+                'count': count,
+                'statement': shape}, sort_keys=True))
+        return response
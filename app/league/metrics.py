@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Request metrics, served at ``/metrics`` in the Prometheus text format.
+
+Each worker process counts its requests by endpoint: their latency in a
+histogram, their statuses, the SQL statements they executed and the time
+those took, and their lookups of cached fragments and values. Counts are kept
+in memory and written to a file of the worker's own in ``METRICS_DIR`` by its
+next request once ``METRICS_FLUSH_INTERVAL`` seconds have passed. ``/metrics``
+adds up the files of every worker, so whichever worker answers reports them
+all. Without ``METRICS_DIR``, each process reports only its own counts.
+
+Files of exited workers are kept, so that totals do not drop when uwsgi
+replaces a worker. The directory is emptied when the server starts.
+
+Latency runs up to the end of the view, so it leaves out sending streamed
+response bodies. SQL statements are counted by ``league.instrumentation``,
+and only while ``SQL_INSTRUMENTATION`` is enabled.
+"""
+import atexit
+import bisect
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, abort, g, request
+
+#: Upper bounds of the latency histogram buckets, in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+#: Type, help and label names of each metric.
+FAMILIES = OrderedDict([
+    ('league_requests_total',
+     ('counter', 'Requests handled.', ('endpoint', 'method', 'status'))),
+    ('league_request_duration_seconds',
+     ('histogram', 'Time taken to handle requests.', ('endpoint', 'method'))),
+    ('league_request_queries_total',
+     ('counter', 'SQL statements executed by requests.', ('endpoint',))),
+    ('league_request_db_seconds_total',
+     ('counter', 'Time requests spent executing SQL statements.',
+      ('endpoint',))),
+    ('league_cache_lookups_total',
+     ('counter', 'Cached fragment and value lookups by requests.',
+      ('endpoint', 'result'))),
+])
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _number(value):
+    """Format a sample value."""
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def _labels(names, values):
+    """Format a label set."""
+    return ','.join('{}="{}"'.format(name, str(value).replace('\\', r'\\')
+                                     .replace('"', r'\"')
+                                     .replace('\n', r'\n'))
+                    for name, value in zip(names, values))
+
+
+class MetricStore(object):
+    """
+    Metric values by name and label values.
+
+    Counters hold a number. Histograms hold the count of each bucket, then
+    of the ``+Inf`` bucket, then the sum of observed values.
+    """
+
+    def __init__(self):
+        """Start with no values."""
+        self.values = {name: {} for name in FAMILIES}
+
+    def inc(self, name, labels, amount=1):
+        """Add amount to a counter."""
+        values = self.values[name]
+        values[labels] = values.get(labels, 0) + amount
+
+    def observe(self, name, labels, value):
+        """Add a value to a histogram."""
+        values = self.values[name]
+        if labels not in values:
+            values[labels] = [0] * (len(LATENCY_BUCKETS) + 2)
+        values[labels][bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        values[labels][-1] += value
+
+    def dump(self):
+        """Get the values as JSON-serializable data."""
+        return {name: [[list(labels), value]
+                       for labels, value in values.items()]
+                for name, values in self.values.items()}
+
+    def load(self, data):
+        """Add values from data returned by ``dump``."""
+        for name, entries in data.items():
+            if name not in self.values:
+                continue  # Written by another version
+            values = self.values[name]
+            for labels, value in entries:
+                labels = tuple(labels)
+                if isinstance(value, list):
+                    if labels not in values:
+                        values[labels] = [0] * len(value)
+                    values[labels] = [a + b for a, b in
+                                      zip(values[labels], value)]
+                else:
+                    values[labels] = values.get(labels, 0) + value
+
+    def render(self):
+        """Get the values in the Prometheus text format."""
+        lines = []
+        for name, (kind, description, label_names) in FAMILIES.items():
+            lines.append('# HELP {} {}'.format(name, description))
+            lines.append('# TYPE {} {}'.format(name, kind))
+            for labels, value in sorted(self.values[name].items()):
+                if kind == 'counter':
+                    lines.append('{}{{{}}} {}'.format(
+                        name, _labels(label_names, labels), _number(value)))
+                    continue
+                count = 0
+                for bound, bucket in zip(LATENCY_BUCKETS + ('+Inf',), value):
+                    count += bucket
+                    lines.append('{}_bucket{{{}}} {}'.format(
+                        name, _labels(label_names + ('le',),
+                                      labels + (bound,)), count))
+                lines.append('{}_sum{{{}}} {}'.format(
+                    name, _labels(label_names, labels), _number(value[-1])))
+                lines.append('{}_count{{{}}} {}'.format(
+                    name, _labels(label_names, labels), count))
+        return '\n'.join(lines) + '\n'
+
+
+class Metrics(object):
+    """Count requests per endpoint and serve the counts of every worker."""
+
+    def __init__(self, app=None):
+        """Initialize metrics."""
+        self._store = MetricStore()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._flushed_at = time.monotonic()
+        self._flush_at_exit = False
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize Metrics."""
+        self.app = app
+        self._store = MetricStore()
+        app.extensions['metrics'] = self
+        if not app.config['METRICS']:
+            return
+        app.before_request(self.start)
+        app.after_request(self.record)
+        app.add_url_rule('/metrics', 'metrics', self.serve)
+        if app.config['METRICS_DIR'] and not self._flush_at_exit:
+            atexit.register(self.flush)
+            self._flush_at_exit = True
+
+    @property
+    def store(self):
+        """Get this process's values, dropping any inherited over fork."""
+        if self._pid != os.getpid():
+            self._store = MetricStore()
+            self._pid = os.getpid()
+        return self._store
+
+    def start(self):
+        """Note when a request started."""
+        g.metrics_started = time.perf_counter()
+
+    def record(self, response):
+        """Count a request."""
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        duration = time.perf_counter() - started
+        endpoint = request.url_rule.endpoint if request.url_rule else 'none'
+        # Metrics are initialized after SQL instrumentation, so this runs
+        # before it reports and forgets the request's statements.
+        queries = g.get('sql_queries')
+        hits = g.pop('cache_hits', 0)
+        misses = g.pop('cache_misses', 0)
+
+        with self._lock:
+            store = self.store
+            store.inc('league_requests_total',
+                      (endpoint, request.method, str(response.status_code)))
+            store.observe('league_request_duration_seconds',
+                          (endpoint, request.method), duration)
+            if queries is not None:
+                store.inc('league_request_queries_total', (endpoint,),
+                          queries.count)
+                store.inc('league_request_db_seconds_total', (endpoint,),
+                          queries.duration)
+            if hits:
+                store.inc('league_cache_lookups_total', (endpoint, 'hit'),
+                          hits)
+            if misses:
+                store.inc('league_cache_lookups_total', (endpoint, 'miss'),
+                          misses)
+        if (time.monotonic() - self._flushed_at >=
+                self.app.config['METRICS_FLUSH_INTERVAL']):
+            self.flush()
+        return response
+
+    def _path(self, pid):
+        """Get the file of a worker's values."""
+        return os.path.join(self.app.config['METRICS_DIR'],
+                            'worker-{}.json'.format(pid))
+
+    def flush(self):
+        """Write this process's values to its file, replacing it at once."""
+        directory = self.app.config['METRICS_DIR']
+        if not directory:
+            return
+        with self._lock:
+            self._flushed_at = time.monotonic()
+            data = self.store.dump()
+            os.makedirs(directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', dir=directory,
+                                             suffix='.tmp',
+                                             delete=False) as output:
+                json.dump(data, output)
+            os.replace(output.name, self._path(self._pid))
+
+    def collect(self):
+        """Get the values of every worker."""
+        if not self.app.config['METRICS_DIR']:
+            with self._lock:
+                total = MetricStore()
+                total.load(self.store.dump())
+            return total
+
+        self.flush()
+        total = MetricStore()
+        for path in glob.glob(self._path('*')):
+            try:
+                with open(path) as source:
+                    total.load(json.load(source))
+            except (OSError, ValueError):
+                continue  # Removed since listed
+        return total
+
+    def serve(self):
+        """Serve the values of every worker to allowed addresses."""
+        if request.remote_addr not in self.app.config['METRICS_ADDRESSES']:
+            abort(404)
+        return Response(self.collect().render(), content_type=CONTENT_TYPE)
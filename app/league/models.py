@@ -4,8 +4,11 @@
 import datetime as dt
 from enum import Enum
 
+from flask import current_app, g, has_app_context
+
 from league.database import (Column, Model, SurrogatePK, association_proxy, db,
-                             func, reference_col, relationship, session)
+                             event, func, joinedload, on_commit, reference_col,
+                             relationship, session)
 
 Color = Enum('Color', 'white black')
 Color.white.abbr = 'w'
@@ -43,8 +46,17 @@ class Player(SurrogatePK, Model):
 
     @property
     def games(self):
-        """All games that player has played."""
-        return self.black_games + self.white_games
+        """All games that player has played, in the order they were played."""
+        return self.history().games
+
+    def history(self):
+        """Get player's game history, loaded at most once per request."""
+        if not has_app_context():
+            return GameHistory(self)
+        histories = g.setdefault('game_histories', {})
+        if self.id not in histories:
+            histories[self.id] = GameHistory(self)
+        return histories[self.id]
 
     @property
     def full_name(self):
@@ -63,61 +75,82 @@ class Player(SurrogatePK, Model):
 
     def latest_season(self):
         """Get latest season player has played in."""
-        return sorted([game.season for game in self.games])[-1]
+        return self.latest_season_episode()[0]
 
     def season_stats(self, season=None):
         """Get player statistics for a season."""
         if season is None:
             season = Game.latest_season_episode()[0]
 
-        wins, losses = 0, 0
-        for game in ([game for game in self.games if game.season == season]):
-            if ((game.winner == Color.white and game.white == self) or
-                    (game.winner == Color.black and game.black == self)):
-                wins += 1
-            else:
-                losses += 1
-
-        return {'wins': wins, 'losses': losses}
+        return PlayerEpisodeStats.totals(
+            PlayerEpisodeStats.player_id == self.id,
+            PlayerEpisodeStats.season == season)
 
     def latest_season_episode(self):
         """Get latest season and episode player has played in."""
-        games = self.games
-        if len(games) > 0:
-            return sorted([(game.season, game.episode)
-                           for game in games])[-1]
-        else:
-            return (0, 0)
+        return max([(game.season, game.episode) for game in self.games],
+                   default=(0, 0))
 
     def episode_stats(self, season_episode=None):
         """Get player statistics for an episode."""
-        latest_season_episode = Game.latest_season_episode()
         if season_episode is None:
-            season_episode = latest_season_episode
-        wins, losses = 0, 0
-
-        for game in ([game for game in self.games
-                      if game.season == season_episode[0] and
-                      game.episode == season_episode[1]]):
-            if ((game.winner == Color.white and game.white == self) or
-                    (game.winner == Color.black and game.black == self)):
-                wins += 1
-            else:
-                losses += 1
+            season_episode = Game.latest_season_episode()
 
-        return {'wins': wins, 'losses': losses}
+        return PlayerEpisodeStats.totals(
+            PlayerEpisodeStats.player_id == self.id,
+            PlayerEpisodeStats.season == season_episode[0],
+            PlayerEpisodeStats.episode == season_episode[1])
 
     def league_stats(self):
         """Get player statistics for the whole league."""
-        wins, losses = 0, 0
+        return PlayerEpisodeStats.totals(
+            PlayerEpisodeStats.player_id == self.id)
+
+
+class GameHistory(object):
+    """A player's games, loaded with their players in a single query."""
+
+    def __init__(self, player):
+        """Load games of player."""
+        self.player = player
+        white_ids = (session.query(WhitePlayerGame.game_id)
+                     .filter_by(player_id=player.id))
+        black_ids = (session.query(BlackPlayerGame.game_id)
+                     .filter_by(player_id=player.id))
+        self.games = (Game.query
+                      .filter(Game.id.in_(white_ids.union(black_ids)))
+                      .options(joinedload(Game.white_player_game)
+                               .joinedload(WhitePlayerGame.player),
+                               joinedload(Game.black_player_game)
+                               .joinedload(BlackPlayerGame.player))
+                      .order_by(Game.played_at, Game.id)
+                      .all())
+
+    def won(self, game):
+        """Check whether player won game."""
+        if game.winner is Color.white:
+            return game.white_player_game.player_id == self.player.id
+        elif game.winner is Color.black:
+            return game.black_player_game.player_id == self.player.id
+        return False
+
+    def stats(self, season_episode):
+        """
+        Get player statistics for an episode, its season and the league.
+
+        All three are tallied in a single pass over the games.
+        """
+        season, episode = season_episode
+        stats = {block: {'wins': 0, 'losses': 0}
+                 for block in ('episode', 'season', 'league')}
         for game in self.games:
-            if ((game.winner == Color.white and game.white == self) or
-                    (game.winner == Color.black and game.black == self)):
-                wins += 1
-            else:
-                losses += 1
-
-        return {'wins': wins, 'losses': losses}
+            result = 'wins' if self.won(game) else 'losses'
+            stats['league'][result] += 1
+            if game.season == season:
+                stats['season'][result] += 1
+                if game.episode == episode:
+                    stats['episode'][result] += 1
+        return stats
 
 
 class Game(SurrogatePK, Model):
@@ -148,7 +181,10 @@ class Game(SurrogatePK, Model):
     last_modified_at = Column(db.DateTime, nullable=False,
                               default=dt.datetime.utcnow)
 
-    db.Index('ix_games_season_episode', 'season', 'episode')
+    __table_args__ = (
+        db.Index('ix_games_season_episode', 'season', 'episode'),
+        {'extend_existing': True}
+    )
 
     def __init__(self, white, black, winner, handicap, komi, season, episode,
                  created_at=None, played_at=None, last_modified_at=None):
@@ -172,25 +208,68 @@ class Game(SurrogatePK, Model):
 
     def to_dict(self):
         """Return game as dictionary."""
+        return self._as_dict(
+            self.id, self.white.id, self.black.id, self.winner, self.handicap,
+            self.komi, self.season, self.episode, self.created_at,
+            self.played_at, self.last_modified_at)
+
+    @staticmethod
+    def _as_dict(game_id, white_id, black_id, winner, handicap, komi, season,
+                 episode, created_at, played_at, last_modified_at):
+        """Format game fields the way ``to_dict`` returns them."""
         return {
-            'game_id': self.id,
-            'white_id': self.white.id,
-            'black_id': self.black.id,
-            'winner': self.winner.name,
-            'handicap': self.handicap,
-            'komi': self.komi,
-            'season': self.season,
-            'episode': self.episode,
-            'created_at': str(self.created_at),
-            'played_at': str(self.played_at),
-            'last_modified_at': str(self.last_modified_at)
+            'game_id': game_id,
+            'white_id': white_id,
+            'black_id': black_id,
+            'winner': winner.name,
+            'handicap': handicap,
+            'komi': komi,
+            'season': season,
+            'episode': episode,
+            'created_at': str(created_at),
+            'played_at': str(played_at),
+            'last_modified_at': str(last_modified_at)
         }
 
+    @classmethod
+    def iter_dicts(cls, after_id=None, limit=None, batch_size=500):
+        """
+        Iterate over games as dictionaries, in game ID order.
+
+        Games come from a single query joining both players' IDs, fetched
+        ``batch_size`` rows at a time, so no game or player objects are loaded
+        and memory use does not grow with the number of games. Only games
+        after ``after_id`` are included, at most ``limit`` of them.
+        """
+        query = (session.query(cls.id, WhitePlayerGame.player_id,
+                               BlackPlayerGame.player_id, cls.winner,
+                               cls.handicap, cls.komi, cls.season, cls.episode,
+                               cls.created_at, cls.played_at,
+                               cls.last_modified_at)
+                 .join(WhitePlayerGame, WhitePlayerGame.game_id == cls.id)
+                 .join(BlackPlayerGame, BlackPlayerGame.game_id == cls.id)
+                 .order_by(cls.id))
+        if after_id is not None:
+            query = query.filter(cls.id > after_id)
+        if limit is not None:
+            query = query.limit(limit)
+        for row in query.yield_per(batch_size):
+            yield cls._as_dict(*row)
+
     def update(self, **kwargs):
         """Override update method to reset last_modified_at."""
         self.last_modified_at = dt.datetime.utcnow()
         super().update(**kwargs)
 
+    @classmethod
+    def with_players(cls):
+        """Query games, loading both players in the same query."""
+        return cls.query.options(
+            joinedload(cls.white_player_game).joinedload(
+                WhitePlayerGame.player),
+            joinedload(cls.black_player_game).joinedload(
+                BlackPlayerGame.player))
+
     @classmethod
     def get_by_season_ep(cls, season, episode):
         """Get games by season and episode."""
@@ -204,13 +283,7 @@ class Game(SurrogatePK, Model):
     @classmethod
     def get_max_season_ep(cls):
         """Get maximum season and episode."""
-        max_season, max_episode = session.query(func.max(cls.season),
-                                                func.max(cls.episode)).one()
-
-        max_season = 0 if max_season is None else max_season
-        max_episode = 0 if max_episode is None else max_episode
-
-        return (max_season, max_episode)
+        return league_clock.max_season_episode()
 
     @property
     def players(self):
@@ -220,296 +293,83 @@ class Game(SurrogatePK, Model):
     @classmethod
     def latest_season_episode(cls):
         """Get latest episode and season."""
-        games = cls.query.all()
-        if len(games) > 0:
-            return sorted([(game.season, game.episode) for game in games])[-1]
-        else:
-            return (0, 0)
+        return league_clock.latest_season_episode()
 
     @classmethod
     def episode_stats(cls, episode=None, season=None, num_players=5):
         """Get statistics for an episode."""
+        from league.stats import get_backend
+
         latest_season_episode = cls.latest_season_episode()
         if episode is None:
             episode = latest_season_episode[1]
         if season is None:
             season = latest_season_episode[0]
 
-        players = Player.query.all()
-        wins = {p.id: 0 for p in players}
-        games_played = {p.id: 0 for p in players}
-        stones_given = {p.id: 0 for p in players}
-        dans_slain = {p.id: 0 for p in players}
-        kyus_killed = {p.id: 0 for p in players}
-
-        games = [game for game in cls.query.all()
-                 if game.season == season and
-                 game.episode == episode]
-        for game in games:
-            if game.winner is Color.white:
-                wins[game.white.id] = wins.get(game.white.id, 0) + 1
-            else:
-                wins[game.black.id] = wins.get(game.black.id, 0) + 1
-
-            games_played[game.white.id] = games_played.get(game.white.id, 0) + 1
-            games_played[game.black.id] = games_played.get(game.black.id, 0) + 1
-
-            stones_given[game.white.id] = \
-                stones_given[game.white.id] + (game.handicap)
-
-            black_player = Player.get_by_id(game.black.id)
-            white_player = Player.get_by_id(game.white.id)
-            if (white_player.aga_rank > 0 and black_player.aga_rank < 0 and
-                    game.winner is Color.black):
-                dans_slain[game.black.id] = \
-                    dans_slain.get(game.black.id, 0) + 1
-            elif (black_player.aga_rank > 0 and white_player.aga_rank < 0 and
-                  game.winner is Color.white):
-                dans_slain[game.white.id] = \
-                    dans_slain.get(game.white.id, 0) + 1
-
-            if (white_player.aga_rank > 0 and black_player.aga_rank < 0 and
-                    game.winner is Color.white):
-                kyus_killed[game.white.id] = \
-                    kyus_killed.get(game.white.id, 0) + 1
-            elif (black_player.aga_rank > 0 and white_player.aga_rank < 0 and
-                  game.winner is Color.black):
-                kyus_killed[game.black.id] = \
-                    kyus_killed.get(game.black.id, 0) + 1
-
-        win_ratios = {p.id: wins[p.id] / games_played[p.id]
-                      for p in players if games_played[p.id] > 0}
-
-        wins_list = enumerate(sorted(
-            [(Player.get_by_id(player_id), player_wins)
-             for player_id, player_wins in wins.items()],
-            key=lambda stat: stat[1],
-            reverse=True
-        )[0:num_players])
-
-        games_played_list = enumerate(sorted(
-            [(Player.get_by_id(player_id), player_games_played)
-             for player_id, player_games_played in games_played.items()],
-            key=lambda stat: stat[1],
-            reverse=True
-        )[0:num_players])
-
-        win_ratios_list = enumerate(sorted(
-            [(Player.get_by_id(player_id), player_win_ratio)
-             for player_id, player_win_ratio in win_ratios.items()],
-            key=lambda stat: stat[1],
-            reverse=True
-        )[0:num_players])
-
-        stones_given_list = enumerate(sorted(
-            [(Player.get_by_id(player_id), player_stones_given)
-             for player_id, player_stones_given in stones_given.items()],
-            key=lambda stat: stat[1],
-            reverse=True
-        )[0:num_players])
-
-        dans_slain_list = enumerate(sorted(
-            [(Player.get_by_id(player_id), player_dans_slain)
-             for player_id, player_dans_slain in dans_slain.items()],
-            key=lambda stat: stat[1],
-            reverse=True
-        )[0:num_players])
-
-        kyus_killed_list = enumerate(sorted(
-            [(Player.get_by_id(player_id), player_kyus_killed)
-             for player_id, player_kyus_killed in kyus_killed.items()],
-            key=lambda stat: stat[1],
-            reverse=True
-        )[0:num_players])
-
-        return {'wins': wins_list,
-                'games_played': games_played_list,
-                'win_ratios': win_ratios_list,
-                'stones_given': stones_given_list,
-                'dans_slain': dans_slain_list,
-                'kyus_killed': kyus_killed_list}
+        return get_backend().episode_stats(season, episode,
+                                           num_players=num_players)
 
     @classmethod
     def season_stats(cls, season=None, num_players=5):
         """Get statistics for a season."""
-        latest_season_episode = cls.latest_season_episode()
+        from league.stats import get_backend
+
         if season is None:
-            season = latest_season_episode[0]
+            season = cls.latest_season_episode()[0]
+
+        return get_backend().season_stats(season, num_players=num_players)
 
-        players = Player.query.all()
-        wins_minus_losses = {p.id: 0 for p in players}
-        wins = {p.id: 0 for p in players}
-        games_played = {p.id: 0 for p in players}
-        games_played_one_ep = {p.id: 0 for p in players}
-        dans_slain = {p.id: 0 for p in players}
-        kyus_killed = {p.id: 0 for p in players}
-        games_against_weaker = {p.id: 0 for p in players}
-        losses = {p.id: 0 for p in players}
-
-        games_per_ep = {p.id: {ep: 0 for ep
-                               in range(1, latest_season_episode[1] + 1)}
-                        for p in players}
-        wins_per_ep = {p.id: {ep: 0 for ep
-                              in range(1, latest_season_episode[1] + 1)}
-                       for p in players}
-        losses_per_ep = {p.id: {ep: 0 for ep
-                                in range(1, latest_season_episode[1] + 1)}
-                         for p in players}
-
-        games = [game for game in cls.query.all()
-                 if game.season == season]
-        for game in games:
-            if game.winner is Color.white:
-                wins[game.white.id] = wins.get(game.white.id, 0) + 1
-                wins_per_ep[game.white.id][game.episode] = \
-                    wins_per_ep[game.white.id][game.episode] + 1
-
-                losses[game.black.id] = losses.get(game.black.id, 0) + 1
-                losses_per_ep[game.black.id][game.episode] = \
-                    losses_per_ep[game.black.id][game.episode] + 1
-            else:
-                wins[game.black.id] = wins.get(game.black.id, 0) + 1
-                wins_per_ep[game.black.id][game.episode] = \
-                    wins_per_ep[game.black.id][game.episode] + 1
-
-                losses[game.white.id] = losses.get(game.white.id, 0) + 1
-                losses_per_ep[game.white.id][game.episode] = \
-                    losses_per_ep[game.white.id][game.episode] + 1
-
-            games_played[game.white.id] = games_played.get(game.white.id, 0) + 1
-            games_played[game.black.id] = games_played.get(game.black.id, 0) + 1
-
-            games_per_ep[game.white.id][game.episode] = \
-                games_per_ep[game.white.id][game.episode] + 1
-            games_per_ep[game.black.id][game.episode] = \
-                games_per_ep[game.black.id][game.episode] + 1
-
-            black_player = Player.get_by_id(game.black.id)
-            white_player = Player.get_by_id(game.white.id)
-            if (white_player.aga_rank > 0 and black_player.aga_rank < 0 and
-                    game.winner is Color.black):
-                dans_slain[game.black.id] = \
-                    dans_slain.get(game.black.id, 0) + 1
-            elif (black_player.aga_rank > 0 and white_player.aga_rank < 0 and
-                  game.winner is Color.white):
-                dans_slain[game.white.id] = \
-                    dans_slain.get(game.white.id, 0) + 1
-
-            if (white_player.aga_rank > 0 and black_player.aga_rank < 0 and
-                    game.winner is Color.white):
-                kyus_killed[game.white.id] = \
-                    kyus_killed.get(game.white.id, 0) + 1
-            elif (black_player.aga_rank > 0 and white_player.aga_rank < 0 and
-                  game.winner is Color.black):
-                kyus_killed[game.black.id] = \
-                    kyus_killed.get(game.black.id, 0) + 1
-
-            if (white_player.aga_rank > black_player.aga_rank):
-                games_against_weaker[game.white.id] = \
-                    games_against_weaker[game.white.id] + 1
-
-            if (black_player.aga_rank > white_player.aga_rank):
-                games_against_weaker[game.black.id] = \
-                    games_against_weaker[game.black.id] + 1
-
-        games_played_one_ep = {p.id: max([g for (d, g)
-                                          in games_per_ep[p.id].items()])
-                               for p in players}
-
-        wins_minus_losses = {p.id: 2 * wins[p.id] - games_played[p.id]
-                             for p in players if games_played[p.id] > 0}
-
-        wins_list = enumerate(sorted(
-            [(Player.get_by_id(player_id), player_wins)
-             for player_id, player_wins in wins.items()],
-            key=lambda stat: stat[1],
-            reverse=True
-        )[0:num_players])
-
-        games_played_list = enumerate(sorted(
-            [(Player.get_by_id(player_id), player_games_played)
-             for player_id, player_games_played in games_played.items()],
-            key=lambda stat: stat[1],
-            reverse=True
-        )[0:num_players])
-
-        games_played_one_ep_list = enumerate(sorted(
-            [(Player.get_by_id(player_id), player_games_played_one_ep)
-             for player_id, player_games_played_one_ep
-             in games_played_one_ep.items()],
-            key=lambda stat: stat[1],
-            reverse=True
-        )[0:num_players])
-
-        wins_minus_losses_list = enumerate(sorted(
-            [(Player.get_by_id(player_id), player_wins_minus_losses)
-             for player_id, player_wins_minus_losses
-             in wins_minus_losses.items()],
-            key=lambda stat: stat[1],
-            reverse=True
-        )[0:num_players])
-
-        games_against_weaker_list = enumerate(sorted(
-            [(Player.get_by_id(player_id), player_games_against_weaker)
-             for player_id, player_games_against_weaker
-             in games_against_weaker.items()],
-            key=lambda stat: stat[1],
-            reverse=True
-        )[0:num_players])
-
-        dans_slain_list = enumerate(sorted(
-            [(Player.get_by_id(player_id), player_dans_slain)
-             for player_id, player_dans_slain in dans_slain.items()],
-            key=lambda stat: stat[1],
-            reverse=True
-        )[0:num_players])
-
-        kyus_killed_list = enumerate(sorted(
-            [(Player.get_by_id(player_id), player_kyus_killed)
-             for player_id, player_kyus_killed in kyus_killed.items()],
-            key=lambda stat: stat[1],
-            reverse=True
-        )[0:num_players])
-
-        losses_list = enumerate(sorted(
-            [(Player.get_by_id(player_id), player_losses)
-             for player_id, player_losses in losses.items()],
-            key=lambda stat: stat[1],
-            reverse=True
-        )[0:num_players])
-
-        steady_freddy = [
-            p for p in players
-            if min([g for (d, g) in games_per_ep[p.id].items()]) > 0
-        ]
-
-        fifteen_min_fame = [
-            p for p in players
-            if len([g for (d, g)
-                    in games_per_ep[p.id].items()
-                    if (wins_per_ep[p.id][d] >= 3 and
-                        losses_per_ep[p.id][d] == 0)]) > 0
-        ]
-
-        rock_bottom = [
-            p for p in players
-            if len([g for (d, g)
-                    in games_per_ep[p.id].items()
-                    if (losses_per_ep[p.id][d] >= 3 and
-                        wins_per_ep[p.id][d] == 0)]) > 0
-        ]
-
-        return {'wins': wins_list,
-                'games_played': games_played_list,
-                'games_played_one_ep': games_played_one_ep_list,
-                'wins_minus_losses': wins_minus_losses_list,
-                'games_against_weaker': games_against_weaker_list,
-                'dans_slain': dans_slain_list,
-                'kyus_killed': kyus_killed_list,
-                'losses': losses_list,
-                'steady_freddy': steady_freddy,
-                'fifteen_min_fame': fifteen_min_fame,
-                'rock_bottom': rock_bottom}
+
+class LeagueClock(object):
+    """
+    The league's latest season and episode.
+
+    Answers are memoized per application under the shared ``league`` cache
+    generation, so they are forgotten in every process once another commits
+    games, and at once after a commit in this one.
+    """
+
+    @staticmethod
+    def _memo():
+        """Get memoized answers for the current application."""
+        from league.caching import generation
+
+        token = generation('league')
+        memo = current_app.extensions.get('league_clock')
+        if memo is None or memo['generation'] != token:
+            memo = current_app.extensions['league_clock'] = {
+                'generation': token}
+        return memo
+
+    def latest_season_episode(self):
+        """Get latest (season, episode), using ``ix_games_season_episode``."""
+        memo = self._memo()
+        if 'latest' not in memo:
+            latest = (session.query(Game.season, Game.episode)
+                      .filter(Game.season.isnot(None),
+                              Game.episode.isnot(None))
+                      .order_by(Game.season.desc(), Game.episode.desc())
+                      .first())
+            memo['latest'] = (0, 0) if latest is None else tuple(latest)
+        return memo['latest']
+
+    def max_season_episode(self):
+        """Get maximum season and maximum episode, independently."""
+        memo = self._memo()
+        if 'max' not in memo:
+            max_season, max_episode = session.query(
+                func.max(Game.season), func.max(Game.episode)).one()
+            memo['max'] = (0 if max_season is None else max_season,
+                           0 if max_episode is None else max_episode)
+        return memo['max']
+
+    def forget(self):
+        """Forget memoized answers for the current application."""
+        if has_app_context():
+            current_app.extensions.pop('league_clock', None)
+
+
+league_clock = LeagueClock()
 
 
 class WhitePlayerGame(Model):
@@ -528,3 +388,238 @@ class BlackPlayerGame(Model):
 
     player_id = reference_col('players', primary_key=True)
     game_id = reference_col('games', primary_key=True)
+
+
+class PlayerEpisodeStats(Model):
+    """
+    Running totals of a player's results in an episode.
+
+    Rows are kept up to date whenever games, or players' ranks, are flushed to
+    the database, see ``_refresh_player_episode_stats``.
+    """
+
+    __tablename__ = 'player_episode_stats'
+    __table_args__ = (
+        db.Index('ix_player_episode_stats_season_episode', 'season',
+                 'episode'),
+    )
+
+    player_id = reference_col('players', primary_key=True)
+    season = Column(db.Integer, primary_key=True, autoincrement=False)
+    episode = Column(db.Integer, primary_key=True, autoincrement=False)
+    games = Column(db.Integer, nullable=False, default=0)
+    wins = Column(db.Integer, nullable=False, default=0)
+    losses = Column(db.Integer, nullable=False, default=0)
+    stones_given = Column(db.Integer, nullable=False, default=0)
+    dans_slain = Column(db.Integer, nullable=False, default=0)
+    kyus_killed = Column(db.Integer, nullable=False, default=0)
+    games_against_weaker = Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        """Represent instance as a unique string."""
+        return ('<PlayerEpisodeStats({player_id}, {season}, {episode})>'.
+                format(player_id=self.player_id, season=self.season,
+                       episode=self.episode))
+
+    @classmethod
+    def totals(cls, *criteria):
+        """Sum wins and losses over rows matching criteria."""
+        wins, losses = session.query(
+            func.coalesce(func.sum(cls.wins), 0),
+            func.coalesce(func.sum(cls.losses), 0)).filter(*criteria).one()
+        return {'wins': wins, 'losses': losses}
+
+
+class SlackMessage(SurrogatePK, Model):
+    """
+    A Slack notification in the outbox.
+
+    Messages are added in the same transaction as the change they announce
+    and delivered later by the messenger. A message is pending until it is
+    sent or has used up its attempts. While a worker sends it, the message is
+    claimed until its lease runs out, and other workers skip it.
+    """
+
+    __tablename__ = 'slack_outbox'
+
+    text = Column(db.Text, nullable=False)
+    created_at = Column(db.DateTime, nullable=False, default=dt.datetime.utcnow)
+    attempts = Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = Column(db.DateTime, nullable=False,
+                             default=dt.datetime.utcnow)
+    sent_at = Column(db.DateTime)
+    last_error = Column(db.Text)
+    claimed_until = Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_slack_outbox_pending', 'sent_at', 'next_attempt_at'),
+        {'extend_existing': True}
+    )
+
+    def __init__(self, text):
+        """Queue a message."""
+        self.text = text
+
+    def __repr__(self):
+        """Represent instance as a unique string."""
+        return '<SlackMessage({id}, {text!r})>'.format(id=self.id,
+                                                       text=self.text)
+
+    @classmethod
+    def pending(cls, max_attempts):
+        """Query messages not sent yet with attempts left, oldest first."""
+        return (cls.query
+                .filter(cls.sent_at.is_(None), cls.attempts < max_attempts)
+                .order_by(cls.id))
+
+    @classmethod
+    def unclaimed(cls, now):
+        """Get the criterion of messages no worker holds a lease on."""
+        return db.or_(cls.claimed_until.is_(None), cls.claimed_until <= now)
+
+    @classmethod
+    def due(cls, max_attempts, now=None):
+        """Query unclaimed messages whose next attempt is due, oldest first."""
+        now = now or dt.datetime.utcnow()
+        return cls.pending(max_attempts).filter(cls.next_attempt_at <= now,
+                                                cls.unclaimed(now))
+
+    @classmethod
+    def waiting(cls, max_attempts, now=None):
+        """
+        Query unclaimed messages that are due or were never attempted.
+
+        Messages never attempted may be sent early as part of a digest, while
+        failed messages wait for their backoff.
+        """
+        now = now or dt.datetime.utcnow()
+        return cls.pending(max_attempts).filter(db.or_(
+            cls.next_attempt_at <= now, cls.attempts == 0),
+            cls.unclaimed(now))
+
+    @classmethod
+    def next_due_at(cls, max_attempts):
+        """Get when the next pending message is due, or None."""
+        # Claimed messages are due again only if their lease runs out.
+        due_at = db.case([(cls.claimed_until > cls.next_attempt_at,
+                           cls.claimed_until)], else_=cls.next_attempt_at)
+        return (session.query(func.min(due_at))
+                .filter(cls.sent_at.is_(None), cls.attempts < max_attempts)
+                .scalar())
+
+
+class StoredReport(SurrogatePK, Model):
+    """
+    A generated AGA results report.
+
+    Reports are stored with a digest of the games they were generated from,
+    and reused for as long as those games' digest is unchanged. Only the
+    latest report of each season and episode is kept.
+    """
+
+    __tablename__ = 'reports'
+
+    season = Column(db.Integer, nullable=False)
+    episode = Column(db.Integer, nullable=False)
+    digest = Column(db.String(40), nullable=False)
+    content = Column(db.Text, nullable=False)
+    created_at = Column(db.DateTime, nullable=False, default=dt.datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_reports_season_episode', 'season', 'episode'),
+        {'extend_existing': True}
+    )
+
+    def __init__(self, season, episode, digest, content):
+        """Create instance."""
+        self.season = season
+        self.episode = episode
+        self.digest = digest
+        self.content = content
+
+    def __repr__(self):
+        """Represent instance as a unique string."""
+        return '<StoredReport({season}, {episode}, {digest})>'.format(
+            season=self.season, episode=self.episode, digest=self.digest)
+
+    @classmethod
+    def get_current(cls, season, episode, digest):
+        """Get the report of an episode generated from games with digest."""
+        return cls.query.filter_by(season=season, episode=episode,
+                                   digest=digest).first()
+
+    @classmethod
+    def replace(cls, season, episode, digest, content):
+        """Store the report of an episode in place of older ones."""
+        (cls.query.filter_by(season=season, episode=episode)
+         .delete(synchronize_session=False))
+        return cls(season, episode, digest, content).save()
+
+
+def _touched_season_episodes(flushing_session, instance):
+    """Get (season, episode) pairs a pending change to instance affects."""
+    if isinstance(instance, Player):
+        return _ranked_season_episodes(flushing_session, instance)
+    if isinstance(instance, (WhitePlayerGame, BlackPlayerGame)):
+        instance = instance.game
+    if not isinstance(instance, Game):
+        return set()
+
+    state = db.inspect(instance)
+    seasons = set(state.attrs.season.history.sum())
+    episodes = set(state.attrs.episode.history.sum())
+    return {(season, episode) for season in seasons for episode in episodes}
+
+
+def _ranked_season_episodes(flushing_session, player):
+    """
+    Get (season, episode) pairs of a player's games if their rank changed.
+
+    Slain dans, killed kyus and games against weaker players are counted with
+    current ranks, so every episode the player has played is affected.
+    """
+    state = db.inspect(player)
+    if state.pending or not state.attrs.aga_rank.history.has_changes():
+        return set()
+    white_ids = (flushing_session.query(WhitePlayerGame.game_id)
+                 .filter_by(player_id=player.id))
+    black_ids = (flushing_session.query(BlackPlayerGame.game_id)
+                 .filter_by(player_id=player.id))
+    return set(flushing_session.query(Game.season, Game.episode)
+               .filter(Game.id.in_(white_ids.union(black_ids)))
+               .distinct())
+
+
+@event.listens_for(session, 'after_flush')
+def _refresh_player_episode_stats(flushing_session, flush_context):
+    """Recompute player episode stats for episodes touched by a flush."""
+    from league.stats import refresh_player_episode_stats
+
+    season_episodes = set()
+    for instance in (flushing_session.new | flushing_session.dirty |
+                     flushing_session.deleted):
+        season_episodes |= _touched_season_episodes(flushing_session,
+                                                    instance)
+
+    if season_episodes:
+        refresh_player_episode_stats(flushing_session, season_episodes)
+
+
+@on_commit(Game)
+def _forget_league_clock():
+    """Forget the latest season and episode after games change."""
+    league_clock.forget()
+
+
+@on_commit(Game, WhitePlayerGame, BlackPlayerGame)
+def _forget_game_histories():
+    """Drop game histories loaded in this request after games change."""
+    if has_app_context():
+        g.pop('game_histories', None)
+
+
+@on_commit(SlackMessage)
+def _wake_slack_messenger():
+    """Deliver Slack messages queued by a commit."""
+    if has_app_context():
+        current_app.extensions['messenger'].wake()
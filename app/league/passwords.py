@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Password hashing and login attempt limiting.
+
+bcrypt is slow on purpose, and a worker computing a hash serves nothing else
+meanwhile. At most ``PASSWORD_HASH_SLOTS`` hashes are computed at once by the
+workers sharing the cache, each holding a slot in the cache while it hashes.
+When every slot is taken, hashing is refused at once rather than tying up
+more workers. Slots of workers killed while hashing are freed after
+``PASSWORD_HASH_TIMEOUT`` seconds.
+
+Hashes made with a cost other than ``BCRYPT_LOG_ROUNDS`` are reported by
+``needs_rehash``, so that they can be upgraded when their user next logs in.
+
+Failed login attempts are counted in the cache per client address, and per
+username from each address, so that nobody can lock others out of their
+account. Once ``LOGIN_ADDRESS_ATTEMPT_LIMIT`` attempts from an address, or
+``LOGIN_ATTEMPT_LIMIT`` for a username from an address, failed within
+``LOGIN_ATTEMPT_WINDOW`` seconds, further ones are refused before any hashing.
+"""
+import os
+import time
+
+from flask import current_app
+
+
+class HashingBusy(RuntimeError):
+    """Raised when every hashing slot is taken."""
+
+
+class PasswordHasher(object):
+    """Compute bcrypt hashes in a bounded number of slots per host."""
+
+    def __init__(self, app=None):
+        """Initialize hasher."""
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize Password Hasher."""
+        self.app = app
+        app.extensions['passwords'] = self
+
+    def _acquire(self):
+        """Take a free slot, returning its cache key, or None when busy."""
+        from league.extensions import cache
+
+        slots = self.app.config['PASSWORD_HASH_SLOTS']
+        first = os.getpid() % slots  # Spread workers over the slots
+        for index in range(slots):
+            key = 'password-hash-slots/{}'.format((first + index) % slots)
+            if cache.add(key, os.getpid(),
+                         timeout=self.app.config['PASSWORD_HASH_TIMEOUT']):
+                return key
+        return None
+
+    def _run(self, function, *args):
+        """Call function while holding a slot."""
+        from league.extensions import cache
+
+        key = self._acquire()
+        if key is None:
+            raise HashingBusy('Too many passwords are being hashed')
+        try:
+            return function(*args)
+        finally:
+            cache.delete(key)
+
+    def hash(self, password):
+        """Hash password with the configured cost."""
+        from league.extensions import bcrypt
+
+        return self._run(bcrypt.generate_password_hash, password,
+                         self.app.config['BCRYPT_LOG_ROUNDS'])
+
+    def check(self, pw_hash, password):
+        """Check password against a hash."""
+        from league.extensions import bcrypt
+
+        return self._run(bcrypt.check_password_hash, pw_hash, password)
+
+    def needs_rehash(self, pw_hash):
+        """Check whether a hash was made with another cost."""
+        if isinstance(pw_hash, bytes):
+            pw_hash = pw_hash.decode('ascii')
+        # Hashes look like $2b$<cost>$<salt and checksum>
+        cost = pw_hash.split('$')[2]
+        return int(cost) != self.app.config['BCRYPT_LOG_ROUNDS']
+
+
+def _attempt_keys(address, username):
+    """Get the cache keys counting failed attempts in the current window."""
+    window = int(time.time() // current_app.config['LOGIN_ATTEMPT_WINDOW'])
+    return ['login-failures/address/{}/{}'.format(address, window),
+            'login-failures/username/{}/{}/{}'.format(address, username,
+                                                      window)]
+
+
+def login_attempts_exceeded(address, username):
+    """Check whether too many attempts from address failed to log in."""
+    from league.extensions import cache
+
+    config = current_app.config
+    limits = (config['LOGIN_ADDRESS_ATTEMPT_LIMIT'],
+              config['LOGIN_ATTEMPT_LIMIT'])
+    counts = cache.get_many(*_attempt_keys(address, username))
+    return any(count is not None and count >= limit
+               for count, limit in zip(counts, limits))
+
+
+def record_failed_login(address, username):
+    """Count a failed attempt from address to log in as username."""
+    from league.extensions import cache
+
+    for key in _attempt_keys(address, username):
+        cache.add(key, 0, timeout=current_app.config['LOGIN_ATTEMPT_WINDOW'])
+        # Flask-Caching does not expose the backend's counters.
+        cache.cache.inc(key)
+
+
+def forget_login_attempts(address, username):
+    """Reset the failed attempts for username once it logged in."""
+    from league.extensions import cache
+
+    cache.delete(_attempt_keys(address, username)[1])
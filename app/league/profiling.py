@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Profiles of requests to a route.
+
+``profile_route`` replays a request through the test client. After a warm-up
+request, it times a number of runs to split their time between executing SQL,
+rendering Jinja templates and the rest of Python, then profiles as many again
+under cProfile. The split comes from runs without the profiler, whose overhead
+would inflate the Python share.
+
+SQL time is that of cursor executions, wherever they happen; statements run
+while rendering, such as lazy loads, count as SQL rather than Jinja.
+
+Profiles can be written in the callgrind format read by KCachegrind and
+QCachegrind, or as pstats dumps read by tools such as snakeviz and
+flameprof.
+"""
+import cProfile
+import io
+import pstats
+import time
+from collections import OrderedDict, defaultdict
+
+from flask import before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from league.caching import bump_generation
+from league.database import db
+
+
+class TimeSplit(object):
+    """Time of requests spent executing SQL and rendering templates."""
+
+    def __init__(self):
+        """Start with no time recorded."""
+        self.total = 0.0
+        self.sql = 0.0
+        self.jinja = 0.0
+        self._sql_started = []
+        self._render_started = []
+        self._sql_in_render = 0.0
+
+    @property
+    def python(self):
+        """Get the time spent neither in SQL nor in templates."""
+        return self.total - self.sql - self.jinja
+
+    def as_dict(self):
+        """Get seconds by part, in a fixed order."""
+        return OrderedDict([('sql', self.sql), ('jinja', self.jinja),
+                            ('python', self.python), ('total', self.total)])
+
+    def _before_execute(self, *args):
+        """Note when a statement starts."""
+        self._sql_started.append(time.perf_counter())
+
+    def _after_execute(self, *args):
+        """Record a statement once it completes."""
+        duration = time.perf_counter() - self._sql_started.pop()
+        self.sql += duration
+        if self._render_started:
+            self._sql_in_render += duration
+
+    def _handle_error(self, exception_context):
+        """Forget the start of a failed statement."""
+        self._sql_started.pop()
+
+    def _before_render(self, app, template, context):
+        """Note when a template starts rendering."""
+        self._render_started.append((time.perf_counter(),
+                                     self._sql_in_render))
+
+    def _rendered(self, app, template, context):
+        """Record a template once rendered."""
+        started, sql_before = self._render_started.pop()
+        # Outer templates include the time of templates rendered inside them.
+        if not self._render_started:
+            self.jinja += (time.perf_counter() - started -
+                           (self._sql_in_render - sql_before))
+
+    def __enter__(self):
+        """Start recording."""
+        event.listen(Engine, 'before_cursor_execute', self._before_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_execute)
+        event.listen(Engine, 'handle_error', self._handle_error)
+        before_render_template.connect(self._before_render)
+        template_rendered.connect(self._rendered)
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop recording."""
+        event.remove(Engine, 'before_cursor_execute', self._before_execute)
+        event.remove(Engine, 'after_cursor_execute', self._after_execute)
+        event.remove(Engine, 'handle_error', self._handle_error)
+        before_render_template.disconnect(self._before_render)
+        template_rendered.disconnect(self._rendered)
+
+
+class RouteProfile(object):
+    """The time split and cProfile statistics of runs of a request."""
+
+    def __init__(self, path, repeat, split, stats):
+        """Build a profile from its runs."""
+        self.path = path
+        self.repeat = repeat
+        self.split = split
+        self.stats = stats
+
+    def hotspots(self, sort='cumulative', limit=30):
+        """Get the table of the functions taking the most time."""
+        output = io.StringIO()
+        stats = pstats.Stats(stream=output)
+        stats.add(self.stats)  # A copy, as stripping directories alters it
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+    def dump_stats(self, path):
+        """Write the statistics in the pstats format."""
+        self.stats.dump_stats(path)
+
+    def write_callgrind(self, output):
+        """Write the statistics in the callgrind format, in microseconds."""
+        write_callgrind(self.stats, output)
+
+
+def profile_route(app, path, repeat=10, method='GET', cached=False):
+    """
+    Profile requests to path, returning a ``RouteProfile``.
+
+    Unless ``cached``, the league's cache generation is replaced before each
+    request, so that cached fragments and values are computed again.
+
+    Raises ``ValueError`` if a request is not answered with a 200.
+    """
+    client = app.test_client()
+
+    def prepare():
+        """Make the next request compute cached values again."""
+        if not cached:
+            with app.app_context():
+                bump_generation('league')
+
+    def run():
+        """Make a request."""
+        response = client.open(path, method=method)
+        response.get_data()  # Streamed bodies are only generated when read
+        response.close()
+        db.session.remove()
+        if response.status_code != 200:
+            raise ValueError('{} {} answered {}'.format(
+                method, path, response.status))
+
+    prepare()
+    run()  # Warm up
+
+    with TimeSplit() as split:
+        for _ in range(repeat):
+            prepare()
+            started = time.perf_counter()
+            run()
+            split.total += time.perf_counter() - started
+
+    profiler = cProfile.Profile()
+    for _ in range(repeat):
+        prepare()
+        profiler.enable()
+        try:
+            run()
+        finally:
+            profiler.disable()
+    return RouteProfile(path, repeat, split, pstats.Stats(profiler))
+
+
+def _label(function):
+    """Get the callgrind file and function names of a pstats function."""
+    filename, line, name = function
+    if filename == '~':  # Built in
+        return '~', name
+    return filename, '{}:{}'.format(name, line)
+
+
+def write_callgrind(stats, output):
+    """Write pstats statistics to a text file in the callgrind format."""
+    callees = defaultdict(dict)
+    for function, (_, _, _, _, callers) in stats.stats.items():
+        for caller, call_stats in callers.items():
+            callees[caller][function] = call_stats
+
+    output.write('# callgrind format\nversion: 1\ncreator: flask profile\n'
+                 'events: Microseconds\nsummary: {}\n'.format(
+                     int(stats.total_tt * 1e6)))
+    for function, (_, _, own_time, _, _) in sorted(stats.stats.items()):
+        filename, name = _label(function)
+        line = function[1]
+        output.write('\nfl={}\nfn={}\n{} {}\n'.format(
+            filename, name, line, int(own_time * 1e6)))
+        for callee, (calls, _, _, inclusive) in sorted(
+                callees[function].items()):
+            callee_filename, callee_name = _label(callee)
+            output.write('cfl={}\ncfn={}\ncalls={} {}\n{} {}\n'.format(
+                callee_filename, callee_name, calls, callee[1], line,
+                int(inclusive * 1e6)))
@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
 """Public forms."""
+from flask import request
 from flask_wtf import Form
 from wtforms import PasswordField, StringField
 from wtforms.validators import DataRequired
 
 from league.admin.models import User
+from league.passwords import (HashingBusy, forget_login_attempts,
+                              login_attempts_exceeded, record_failed_login)
 
 
 class LoginForm(Form):
@@ -24,16 +27,37 @@ class LoginForm(Form):
         if not initial_validation:
             return False
 
+        address = request.remote_addr
+        if login_attempts_exceeded(address, self.username.data):
+            self.username.errors.append(
+                'Too many login attempts, try again later')
+            return False
+
         self.user = User.query.filter_by(username=self.username.data).first()
         if not self.user:
+            record_failed_login(address, self.username.data)
             self.username.errors.append('Unknown username')
             return False
 
-        if not self.user.check_password(self.password.data):
-            self.password.errors.append('Invalid password')
+        try:
+            if not self.user.check_password(self.password.data):
+                record_failed_login(address, self.username.data)
+                self.password.errors.append('Invalid password')
+                return False
+        except HashingBusy:
+            self.password.errors.append('Too many logins, try again shortly')
             return False
 
         if not self.user.active:
             self.username.errors.append('User not activated')
             return False
+
+        forget_login_attempts(address, self.username.data)
+        if self.user.password_needs_rehash:
+            try:
+                self.user.set_password(self.password.data)
+            except HashingBusy:
+                pass  # Upgraded at a later login instead
+            else:
+                self.user.save()
         return True
@@ -4,7 +4,7 @@ from flask import (Blueprint, current_app, flash, redirect, render_template,
                    request, url_for)
 from flask_login import login_required, logout_user
 
-from league.admin.models import User
+from league.admin.models import user_cache
 from league.extensions import login_manager
 from league.public.forms import LoginForm
 
@@ -14,7 +14,7 @@ blueprint = Blueprint('public', __name__, static_folder='../static')
 @login_manager.user_loader
 def load_user(user_id):
     """Load user by ID."""
-    return User.get_by_id(int(user_id))
+    return user_cache.load(int(user_id))
 
 
 @blueprint.route('/', methods=['GET'])
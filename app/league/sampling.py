@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+A sampling profiler for production workers.
+
+While enabled, a thread in each worker process takes the Python stack of every
+thread handling a request, ``SAMPLING_INTERVAL`` seconds apart. Identical
+stacks are counted together, under the endpoint of their request as the
+outermost frame. Every ``SAMPLING_DUMP_INTERVAL`` seconds, and when sampling
+is switched off, the counts are appended to a file in ``SAMPLING_DIR`` in the
+collapsed stack format read by flamegraph.pl and speedscope, one line per
+stack: ``endpoint;outer;...;inner count``.
+
+Taking a sample holds the interpreter lock, so each sample's cost is measured
+and the next one waits long enough to keep sampling under
+``SAMPLING_MAX_OVERHEAD`` of the time.
+
+Sampling is switched on and off from the admin settings, which every worker
+picks up before its next request. ``SAMPLING_PROFILER`` is the default until
+then.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import request
+
+
+def _frame_name(frame):
+    """Get the name of a stack frame."""
+    return '{}:{}'.format(frame.f_globals.get('__name__', '?'),
+                          frame.f_code.co_name)
+
+
+class SamplingProfiler(object):
+    """Sample the stacks of requests from a thread per worker process."""
+
+    def __init__(self, app=None):
+        """Initialize profiler."""
+        self.enabled = False
+        self._endpoints = {}
+        self._samples = Counter()
+        self._thread = None
+        self._thread_pid = None
+        self._thread_lock = threading.Lock()
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize Sampling Profiler."""
+        self.app = app
+        self.enabled = app.config['SAMPLING_PROFILER']
+        app.extensions['sampling_profiler'] = self
+        app.before_request(self.start_request)
+        app.teardown_request(self.finish_request)
+
+    def update_configuration(self, enabled):
+        """Switch sampling on or off."""
+        self.enabled = enabled
+
+    def start_request(self):
+        """Sample the current thread while it handles this request."""
+        if not self.enabled:
+            return
+        self._ensure_running()
+        self._endpoints[threading.get_ident()] = (
+            request.url_rule.endpoint if request.url_rule else 'none')
+
+    def finish_request(self, exception=None):
+        """Stop sampling the current thread."""
+        self._endpoints.pop(threading.get_ident(), None)
+
+    def _ensure_running(self):
+        """Start the sampling thread, also in processes forked since."""
+        with self._thread_lock:
+            if (self._thread_pid == os.getpid() and
+                    self._thread.is_alive()):
+                return
+            self._samples = Counter()  # Any inherited over fork
+            self._thread = threading.Thread(target=self._run,
+                                            name='sampling-profiler')
+            self._thread.daemon = True
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        """Sample until switched off, dumping samples periodically."""
+        dumped_at = time.monotonic()
+        while self.enabled:
+            started = time.perf_counter()
+            self.sample()
+            time.sleep(self.delay(time.perf_counter() - started))
+            if (time.monotonic() - dumped_at >=
+                    self.app.config['SAMPLING_DUMP_INTERVAL']):
+                self.dump()
+                dumped_at = time.monotonic()
+        self.dump()
+
+    def delay(self, cost):
+        """Get the time to wait after a sample that took cost seconds."""
+        return max(self.app.config['SAMPLING_INTERVAL'],
+                   cost * (1 / self.app.config['SAMPLING_MAX_OVERHEAD'] - 1))
+
+    def sample(self):
+        """Count the current stack of each thread handling a request."""
+        frames = sys._current_frames()
+        for ident, endpoint in list(self._endpoints.items()):
+            frame = frames.get(ident)
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            if names:
+                names.append(endpoint)
+                self._samples[';'.join(reversed(names))] += 1
+
+    def dump(self):
+        """Append the samples counted so far to a file, returning its path."""
+        samples, self._samples = self._samples, Counter()
+        if not samples:
+            return None
+        directory = self.app.config['SAMPLING_DIR']
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, 'samples-{}-{}.collapsed'.format(
+            os.getpid(), time.strftime('%Y%m%dT%H%M%S', time.gmtime())))
+        with open(path, 'a') as output:
+            for stack, count in sorted(samples.items()):
+                output.write('{} {}\n'.format(stack, count))
+        return path
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic league data for scale testing.
+
+``seed_league`` adds players and games drawn from a seeded random generator,
+so the same arguments always produce the same data. Rows are added with bulk
+inserts of ``batch_size`` rows, bypassing the ORM, and player episode stats
+are rebuilt once at the end.
+
+Player strengths follow a normal distribution centred on a mid-kyu player.
+Each game pairs two players of one episode; the stronger takes white, gives
+the handicap their rank difference calls for, and wins with a probability
+that the handicap keeps close to even.
+"""
+import datetime as dt
+import math
+import random
+
+from league.database import func
+from league.models import BlackPlayerGame, Color, Game, Player, WhitePlayerGame
+from league.stats import refresh_player_episode_stats
+
+FIRST_NAMES = ('Akira', 'Bea', 'Chen', 'Dana', 'Eli', 'Fumiko', 'Gus',
+               'Hana', 'Ivan', 'Jun', 'Kim', 'Lee', 'Mara', 'Noa', 'Omar',
+               'Pia', 'Quinn', 'Rui', 'Sam', 'Toru', 'Uma', 'Vic', 'Wen',
+               'Yuki', 'Zoe')
+LAST_NAMES = ('Abe', 'Baker', 'Cho', 'Diaz', 'Evans', 'Fujita', 'Garcia',
+              'Huang', 'Ito', 'Jones', 'Kang', 'Lin', 'Mori', 'Nguyen',
+              'Park', 'Rossi', 'Sato', 'Tanaka', 'Wang', 'Yamada')
+#: Mean and standard deviation of player strength, in stones above 1 dan.
+STRENGTH = (-6, 6)
+#: Date of the first episode; episodes are a week apart.
+FIRST_EPISODE = dt.datetime(2017, 1, 7, 19)
+#: First AGA ID given out, when no player has a higher one.
+FIRST_AGA_ID = 10000
+
+
+def rank(strength):
+    """Get the AGA rank of a strength: 1 to 9 for dans, -1 to -30 for kyus."""
+    stones = math.floor(strength)
+    return min(stones + 1, 9) if stones >= 0 else max(stones, -30)
+
+
+def _play(rand, white_strength, black_strength):
+    """Get the winner, handicap and komi of a game."""
+    stones = round(white_strength - black_strength)
+    if stones >= 2:
+        handicap, komi = min(stones, 9), 0
+    else:
+        handicap, komi = 0, 0 if stones == 1 else 7
+    # The odds depend on what the handicap does not make up for.
+    edge = white_strength - black_strength - max(handicap, stones)
+    won = rand.random() < 1 / (1 + math.exp(-edge))
+    return (Color.white if won else Color.black), handicap, komi
+
+
+def _next_id(session, column, start=1):
+    """Get the value after the greatest of column, or start."""
+    greatest = session.query(func.max(column)).scalar()
+    return start if greatest is None else max(start, greatest + 1)
+
+
+def _insert(session, table, rows, batch_size):
+    """Insert rows with one statement per batch."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            session.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        session.execute(table.insert(), batch)
+
+
+def _reset_sequences(session, *tables):
+    """Move PostgreSQL ID sequences past explicitly inserted IDs."""
+    if session.bind.dialect.name != 'postgresql':
+        return
+    for table in tables:
+        session.execute(
+            "SELECT setval(pg_get_serial_sequence('{0}', 'id'), "
+            'coalesce(max(id), 1)) FROM {0}'.format(table.name))
+
+
+def seed_league(session, players, seasons, episodes, games, seed=0,
+                batch_size=10000):
+    """
+    Add synthetic players and games, committing them.
+
+    ``games`` are spread evenly over ``episodes`` episodes of each of
+    ``seasons`` seasons, after any existing ones.
+    """
+    rand = random.Random(seed)
+    player_table = Player.__table__
+    game_table = Game.__table__
+
+    first_player_id = _next_id(session, Player.id)
+    first_aga_id = _next_id(session, Player.aga_id, FIRST_AGA_ID)
+    first_game_id = _next_id(session, Game.id)
+    first_season = _next_id(session, Game.season)
+
+    strengths = [min(max(rand.gauss(*STRENGTH), -30), 8.99)
+                 for _ in range(players)]
+    _insert(session, player_table, (
+        {'id': first_player_id + number,
+         'first_name': rand.choice(FIRST_NAMES),
+         'last_name': rand.choice(LAST_NAMES),
+         'aga_id': first_aga_id + number,
+         'aga_rank': rank(strength)}
+        for number, strength in enumerate(strengths)), batch_size)
+
+    def game_rows():
+        """Generate each game with its white and black player."""
+        slots = seasons * episodes
+        for number in range(games):
+            slot = number * slots // games
+            season, episode = divmod(slot, episodes)
+            played_at = FIRST_EPISODE + dt.timedelta(weeks=slot)
+            white, black = rand.sample(range(players), 2)
+            if strengths[white] < strengths[black]:
+                white, black = black, white
+            winner, handicap, komi = _play(rand, strengths[white],
+                                           strengths[black])
+            game_id = first_game_id + number
+            yield ({'id': game_id, 'winner': winner, 'handicap': handicap,
+                    'komi': komi, 'season': first_season + season,
+                    'episode': episode + 1, 'created_at': played_at,
+                    'played_at': played_at, 'last_modified_at': played_at},
+                   {'game_id': game_id, 'player_id': first_player_id + white},
+                   {'game_id': game_id, 'player_id': first_player_id + black})
+
+    batch = []
+    for row in game_rows():
+        batch.append(row)
+        if len(batch) == batch_size:
+            _insert_games(session, batch)
+            batch = []
+    if batch:
+        _insert_games(session, batch)
+
+    _reset_sequences(session, player_table, game_table)
+    refresh_player_episode_stats(session)
+    session.commit()
+
+
+def _insert_games(session, rows):
+    """Insert games and their player links, three statements in all."""
+    games, whites, blacks = zip(*rows)
+    session.execute(Game.__table__.insert(), games)
+    session.execute(WhitePlayerGame.__table__.insert(), whites)
+    session.execute(BlackPlayerGame.__table__.insert(), blacks)
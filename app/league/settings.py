@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 """Application configuration."""
 import os
+import tempfile
 
 
 class Config(object):
@@ -10,13 +11,46 @@ class Config(object):
     SECRET_KEY = os.environ.get('LEAGUE_SECRET', 'secret-key')
     APP_DIR = os.path.abspath(os.path.dirname(__file__))  # This directory
     PROJECT_ROOT = os.path.abspath(os.path.join(APP_DIR, os.pardir))
-    BCRYPT_LOG_ROUNDS = 13
+    BCRYPT_LOG_ROUNDS = 13  # Older hashes are upgraded at their next login
+    PASSWORD_HASH_SLOTS = 2  # Hashes computed at once by workers on a cache
+    PASSWORD_HASH_TIMEOUT = 10  # Seconds before a dead worker's slot is freed
+    LOGIN_ATTEMPT_LIMIT = 10  # Failed logins per username from an address
+    LOGIN_ADDRESS_ATTEMPT_LIMIT = 50  # Failed logins per address, maybe shared
+    LOGIN_ATTEMPT_WINDOW = 300  # Seconds
     ASSETS_DEBUG = False
     DEBUG_TB_ENABLED = False  # Disable Debug toolbar
     DEBUG_TB_INTERCEPT_REDIRECTS = False
     CACHE_TYPE = 'simple'  # Can be "memcached", "redis", etc.
+    # Used by CACHE_TYPE = 'league.cache_backends.sqlite', shared by processes
+    CACHE_SQLITE_PATH = os.environ.get(
+        'LEAGUE_CACHE_PATH',
+        os.path.join(tempfile.gettempdir(), 'league-cache.sqlite'))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    STATS_BACKEND = 'sql'  # Or "numpy" for columnar in-memory statistics
     LEAGUE_ROOT_PASS = os.environ.get('LEAGUE_ROOT_PASS', 'root')
+    SLACK_TIMEOUT = (3.05, 10)  # Connect and read timeouts, in seconds
+    SLACK_MAX_ATTEMPTS = 8
+    SLACK_RETRY_DELAY = 2  # Seconds before the first retry, doubling after
+    SLACK_RETRY_MAX_DELAY = 3600
+    SLACK_POLL_INTERVAL = 30  # Seconds between checks for due retries
+    SLACK_DELIVERY_THREAD = True  # Or deliver with "flask drain-slack"
+    SQL_INSTRUMENTATION = True  # Query counts and timings on every response
+    SQL_REPEAT_THRESHOLD = 10  # Warn when one statement runs more often
+    USER_CACHE_TIMEOUT = 30  # Seconds a worker reuses a logged in user
+    METRICS = True  # Request metrics at /metrics, in the Prometheus format
+    # Shared by uwsgi workers; None keeps each process's metrics to itself
+    METRICS_DIR = os.environ.get(
+        'LEAGUE_METRICS_DIR',
+        os.path.join(tempfile.gettempdir(), 'league-metrics'))
+    METRICS_FLUSH_INTERVAL = 5  # Seconds between writes of worker metrics
+    METRICS_ADDRESSES = ('127.0.0.1', '::1')  # Clients allowed /metrics
+    SAMPLING_PROFILER = False  # Until switched in the admin settings
+    SAMPLING_INTERVAL = 0.05  # Seconds between stack samples, at least
+    SAMPLING_MAX_OVERHEAD = 0.02  # Share of time spent sampling, at most
+    SAMPLING_DUMP_INTERVAL = 60  # Seconds between writes of samples
+    SAMPLING_DIR = os.environ.get(
+        'LEAGUE_SAMPLES_DIR',
+        os.path.join(tempfile.gettempdir(), 'league-samples'))
     SITE_SETTINGS = {
         'dashboard_title': 'Dashboard',
         'this_episode_phrase': 'in Current Episode',
@@ -44,6 +78,7 @@ class ProdConfig(Config):
         POSTGRES_DB
     )
     DEBUG_TB_ENABLED = False  # Disable Debug toolbar
+    CACHE_TYPE = 'league.cache_backends.sqlite'  # Shared by uwsgi workers
 
 
 class DevConfig(Config):
@@ -75,3 +110,12 @@ class TestConfig(Config):
     WTF_CSRF_ENABLED = False  # Allows form testing
 
     SLACK_NOTIFICATIONS_ENABLED = False
+    SLACK_DELIVERY_THREAD = False  # Tests deliver explicitly
+    METRICS_DIR = None  # Tests share no files
+
+
+class BenchConfig(TestConfig):
+    """Benchmark configuration, used by "flask bench"."""
+
+    DEBUG = False
+    CACHE_TYPE = 'null'  # Measure rendering, not cache hits
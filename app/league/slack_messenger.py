@@ -1,13 +1,36 @@
 # -*- coding: utf-8 -*-
-"""Slack integration."""
+"""
+Slack integration.
+
+Notifications go through an outbox table. ``notify_slack`` adds a message to
+the current database transaction, so it is only sent if the change it
+announces is committed. Messages are delivered after the commit by a
+background thread, or by ``flask drain-slack``, over pooled connections with
+timeouts. Failed deliveries are retried with exponential backoff. Workers
+start the thread once forked, see ``league.warmup``, so that messages still
+pending are delivered without waiting for a new one.
+
+In digest mode, enabled by a positive ``digest_window``, messages are held for
+up to that many seconds and sent together as one summary, or as soon as
+``digest_size`` of them are waiting.
+"""
+import datetime as dt
+import os
+import threading
+
 import requests
+from requests.adapters import HTTPAdapter
 
 DEFAULT_CONFIG = {'enabled': False,
                   'webhook': '',
                   'channel': '',
                   'username': 'leaguebot',
-                  'icon_emoji': ':robot_face:'}
+                  'icon_emoji': ':robot_face:',
+                  'digest_window': 0,
+                  'digest_size': 10}
 SLACK_ENABLED = 'slack_enabled'
+#: Configuration holding integers.
+INTEGER_KEYS = ('digest_window', 'digest_size')
 
 
 class SlackMessenger(object):
@@ -15,13 +38,18 @@ class SlackMessenger(object):
 
     def __init__(self, app=None):
         """Initialize messenger."""
+        self._http = None
+        self._http_pid = None
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._wakeup = threading.Event()
         if app:
             self.init_app(app)
 
     def init_app(self, app):
         """Initialize Slack Messenger."""
         self.app = app
-        self.config = DEFAULT_CONFIG
+        self.config = dict(DEFAULT_CONFIG)
         app.extensions['messenger'] = self
 
     def update_configuration(self, config):
@@ -29,18 +57,210 @@ class SlackMessenger(object):
         assert 'enabled' in config
         if type(config['enabled']) == str:
             config['enabled'] = (config['enabled'] == 'True')
+        for key in INTEGER_KEYS:
+            if key in config:
+                config[key] = int(config[key])
         self.config.update(config)
 
     def notify_slack(self, msg):
-        """Send a simple notification to Slack."""
+        """Queue a notification, sent once the current transaction commits."""
+        from league.models import SlackMessage
+
         if self.config['enabled']:
-            payload = {'username': self.config['username'],
-                       'icon_emoji': self.config['icon_emoji'],
-                       'channel': self.config['channel'],
-                       'text': msg}
-            requests.post(self.config['webhook'], json=payload)
+            message = SlackMessage(msg)
+            if self.config['digest_window'] > 0:
+                message.next_attempt_at = (
+                    dt.datetime.utcnow() +
+                    dt.timedelta(seconds=self.config['digest_window']))
+            message.save(commit=False)
             self.app.logger.debug(
-                'Sent "{}" to {}'.format(msg,
-                                         self.config['channel']))
+                'Queued "{}" for {}'.format(msg, self.config['channel']))
         else:
             self.app.logger.debug('Ignoring message request: webhook disabled.')
+
+    @property
+    def http(self):
+        """Get the HTTP session, reconnecting in forked processes."""
+        if self._http_pid != os.getpid():
+            self._http = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+            self._http.mount('http://', adapter)
+            self._http.mount('https://', adapter)
+            self._http_pid = os.getpid()
+        return self._http
+
+    def send(self, text):
+        """Post text to the webhook, raising on any failure."""
+        payload = {'username': self.config['username'],
+                   'icon_emoji': self.config['icon_emoji'],
+                   'channel': self.config['channel'],
+                   'text': text}
+        response = self.http.post(self.config['webhook'], json=payload,
+                                  timeout=self.app.config['SLACK_TIMEOUT'])
+        response.raise_for_status()
+
+    def _retry_delay(self, attempts, error):
+        """Get seconds to wait before the next attempt."""
+        delay = min(self.app.config['SLACK_RETRY_DELAY'] * 2 ** (attempts - 1),
+                    self.app.config['SLACK_RETRY_MAX_DELAY'])
+        response = getattr(error, 'response', None)
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+        return delay
+
+    def _claim(self, messages):
+        """
+        Lease messages so other workers skip them while they are sent.
+
+        Returns the messages whose lease was taken; the others were claimed,
+        or attempted since they were read, by another worker first.
+        """
+        from league.database import session
+        from league.models import SlackMessage
+
+        connect, read = self.app.config['SLACK_TIMEOUT']
+        now = dt.datetime.utcnow()
+        lease_until = now + dt.timedelta(seconds=2 * (connect + read))
+        claimed = [message for message in messages if (
+            SlackMessage.query
+            .filter_by(id=message.id, sent_at=None,
+                       next_attempt_at=message.next_attempt_at)
+            .filter(SlackMessage.unclaimed(now))
+            .update({'claimed_until': lease_until},
+                    synchronize_session=False)) == 1]
+        session.commit()
+        return claimed
+
+    @staticmethod
+    def digest(messages):
+        """Summarize messages as a single text."""
+        if len(messages) == 1:
+            return messages[0].text
+        lines = ['\u2022 ' + message.text for message in messages]
+        return '{} updates:\n{}'.format(len(messages), '\n'.join(lines))
+
+    def deliver(self, messages):
+        """
+        Deliver claimed messages as one post, recording the outcome.
+
+        Returns whether the post succeeded.
+        """
+        from league.database import session
+
+        text = self.digest(messages)
+        for message in messages:
+            message.claimed_until = None  # Released with the outcome
+        try:
+            self.send(text)
+        except requests.RequestException as error:
+            now = dt.datetime.utcnow()
+            for message in messages:
+                message.attempts += 1
+                message.last_error = str(error)
+                message.next_attempt_at = now + dt.timedelta(
+                    seconds=self._retry_delay(message.attempts, error))
+            self.app.logger.warning(
+                'Slack delivery of messages {} failed: {}'.format(
+                    [message.id for message in messages], error))
+            delivered = False
+        else:
+            now = dt.datetime.utcnow()
+            for message in messages:
+                message.attempts += 1
+                message.sent_at = now
+                message.last_error = None
+            self.app.logger.debug(
+                'Sent "{}" to {}'.format(text, self.config['channel']))
+            delivered = True
+        session.commit()
+        return delivered
+
+    def _next_posts(self, flush):
+        """
+        Get the messages to send in the next post, or None when done.
+
+        Without a digest window every due message is posted alone. With one,
+        messages still inside their window are held back until the oldest
+        is due, ``digest_size`` are waiting or ``flush`` is set; then up to
+        ``digest_size`` of them are posted together.
+        """
+        from league.models import SlackMessage
+
+        max_attempts = self.app.config['SLACK_MAX_ATTEMPTS']
+        now = dt.datetime.utcnow()
+        if self.config['digest_window'] <= 0:
+            message = SlackMessage.due(max_attempts, now).first()
+            return message and [message]
+
+        size = self.config['digest_size']
+        waiting = SlackMessage.waiting(max_attempts, now).limit(size).all()
+        if (flush or len(waiting) >= size or
+                any(message.next_attempt_at <= now for message in waiting)):
+            return waiting or None
+        return None
+
+    def deliver_pending(self, flush=False):
+        """
+        Deliver every message that is due.
+
+        Returns the numbers of messages sent and of messages whose delivery
+        failed. Failed messages are due again only after their backoff, so
+        this returns even while Slack is unreachable. ``flush`` sends digests
+        without waiting for their window to close.
+        """
+        sent = failed = 0
+        while True:
+            messages = self._next_posts(flush)
+            if not messages:
+                return sent, failed
+            messages = self._claim(messages)
+            if not messages:
+                # Another worker is delivering them, and will go on.
+                return sent, failed
+            if self.deliver(messages):
+                sent += len(messages)
+            else:
+                failed += len(messages)
+
+    def seconds_until_due(self):
+        """Get seconds until the next message is due, or None."""
+        from league.models import SlackMessage
+
+        next_attempt_at = SlackMessage.next_due_at(
+            self.app.config['SLACK_MAX_ATTEMPTS'])
+        if next_attempt_at is None:
+            return None
+        return max(0, (next_attempt_at -
+                       dt.datetime.utcnow()).total_seconds())
+
+    def wake(self):
+        """Deliver pending messages soon, starting the delivery thread."""
+        if not self.app.config['SLACK_DELIVERY_THREAD']:
+            return
+        with self._worker_lock:
+            # Threads do not survive forking, e.g. into uwsgi workers.
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._deliver_forever, name='slack-delivery',
+                    daemon=True)
+                self._worker.start()
+        self._wakeup.set()
+
+    def _deliver_forever(self):
+        """Deliver messages when woken, or when the next one is due."""
+        app = self.app
+        timeout = app.config['SLACK_POLL_INTERVAL']
+        while True:
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            timeout = app.config['SLACK_POLL_INTERVAL']
+            with app.app_context():
+                try:
+                    self.deliver_pending()
+                    until_due = self.seconds_until_due()
+                    if until_due is not None:
+                        timeout = min(timeout, until_due)
+                except Exception:
+                    app.logger.exception('Slack delivery failed')
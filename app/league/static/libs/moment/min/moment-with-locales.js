@@ -0,0 +1 @@
+/* placeholder */
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""League statistics computed with aggregate queries."""
+import heapq
+from importlib import import_module
+
+from flask import current_app
+from sqlalchemy import and_, case, literal_column, or_, select, union_all
+
+from league.database import func, session
+from league.models import (BlackPlayerGame, Color, Game, Player,
+                           PlayerEpisodeStats, WhitePlayerGame)
+
+#: Modules implementing ``episode_stats`` and ``season_stats``, by name.
+BACKENDS = {'sql': 'league.stats', 'numpy': 'league.analytics'}
+
+
+def _flag(condition):
+    """Return 1 where condition holds and 0 otherwise."""
+    return case([(condition, 1)], else_=0)
+
+
+def get_backend():
+    """Get the statistics backend module chosen by ``STATS_BACKEND``."""
+    return import_module(BACKENDS[current_app.config['STATS_BACKEND']])
+
+
+def joined_games():
+    """
+    Join games to their players.
+
+    Returns the join along with the white and black player table aliases.
+    """
+    games = Game.__table__
+    white_games = WhitePlayerGame.__table__
+    black_games = BlackPlayerGame.__table__
+    white = Player.__table__.alias('white_player')
+    black = Player.__table__.alias('black_player')
+
+    joined = (games
+              .join(white_games, white_games.c.game_id == games.c.id)
+              .join(black_games, black_games.c.game_id == games.c.id)
+              .join(white, white.c.id == white_games.c.player_id)
+              .join(black, black.c.id == black_games.c.player_id))
+    return joined, white, black
+
+
+def participations(*criteria):
+    """
+    Select one row per player per game, holding that player's contributions.
+
+    Each row has ``player_id``, ``season``, ``episode``, ``won``,
+    ``stones_given``, ``dans_slain``, ``kyus_killed`` and
+    ``games_against_weaker`` columns. ``criteria`` filter the games table.
+    """
+    joined, white, black = joined_games()
+    games = Game.__table__
+    white_games = WhitePlayerGame.__table__
+    black_games = BlackPlayerGame.__table__
+    white_won = games.c.winner == Color.white
+    black_won = games.c.winner == Color.black
+
+    white_side = select([
+        white_games.c.player_id.label('player_id'),
+        games.c.season.label('season'),
+        games.c.episode.label('episode'),
+        _flag(white_won).label('won'),
+        games.c.handicap.label('stones_given'),
+        _flag(and_(black.c.aga_rank > 0, white.c.aga_rank < 0,
+                   white_won)).label('dans_slain'),
+        _flag(and_(white.c.aga_rank > 0, black.c.aga_rank < 0,
+                   white_won)).label('kyus_killed'),
+        _flag(white.c.aga_rank > black.c.aga_rank).label(
+            'games_against_weaker')
+    ]).select_from(joined)
+
+    black_side = select([
+        black_games.c.player_id.label('player_id'),
+        games.c.season.label('season'),
+        games.c.episode.label('episode'),
+        _flag(~white_won).label('won'),
+        literal_column('0').label('stones_given'),
+        _flag(and_(white.c.aga_rank > 0, black.c.aga_rank < 0,
+                   black_won)).label('dans_slain'),
+        _flag(and_(black.c.aga_rank > 0, white.c.aga_rank < 0,
+                   black_won)).label('kyus_killed'),
+        _flag(black.c.aga_rank > white.c.aga_rank).label(
+            'games_against_weaker')
+    ]).select_from(joined)
+
+    if criteria:
+        white_side = white_side.where(and_(*criteria))
+        black_side = black_side.where(and_(*criteria))
+
+    return union_all(white_side, black_side).alias('participations')
+
+
+def aggregate(*criteria, group_by=('player_id',)):
+    """
+    Select per-player sums of contributions of games matching criteria.
+
+    Rows have the ``group_by`` columns followed by ``games``, ``wins``,
+    ``losses``, ``stones_given``, ``dans_slain``, ``kyus_killed`` and
+    ``games_against_weaker``.
+    """
+    p = participations(*criteria)
+    keys = [p.c[name] for name in group_by]
+    return select(keys + [
+        func.count().label('games'),
+        func.sum(p.c.won).label('wins'),
+        (func.count() - func.sum(p.c.won)).label('losses'),
+        func.sum(p.c.stones_given).label('stones_given'),
+        func.sum(p.c.dans_slain).label('dans_slain'),
+        func.sum(p.c.kyus_killed).label('kyus_killed'),
+        func.sum(p.c.games_against_weaker).label('games_against_weaker')
+    ]).group_by(*keys)
+
+
+def refresh_player_episode_stats(db_session, season_episodes=None):
+    """
+    Recompute player episode stats from games.
+
+    Only rows for the given (season, episode) pairs are rebuilt, or every row
+    when ``season_episodes`` is None. Statements run on ``db_session`` so the
+    refresh is part of its transaction.
+    """
+    table = PlayerEpisodeStats.__table__
+    game_criteria = []
+    delete = table.delete()
+    if season_episodes is not None:
+        game_criteria.append(or_(*[
+            and_(Game.season == season, Game.episode == episode)
+            for season, episode in season_episodes]))
+        delete = delete.where(or_(*[
+            and_(table.c.season == season, table.c.episode == episode)
+            for season, episode in season_episodes]))
+    query = aggregate(*game_criteria,
+                      group_by=('player_id', 'season', 'episode'))
+
+    db_session.execute(delete)
+    db_session.execute(table.insert().from_select(
+        [column.name for column in query.c], query))
+
+
+def _player_episode_rows(*criteria):
+    """Get player episode stats rows matching criteria."""
+    return session.execute(
+        PlayerEpisodeStats.__table__.select().where(and_(*criteria))
+    ).fetchall()
+
+
+class Leaderboards(object):
+    """
+    Top players for several metrics at once.
+
+    Each metric is ranked by value, highest first, with ties broken by player
+    ID. Only the players that make it onto a leaderboard are loaded, with a
+    single query shared by every metric.
+    """
+
+    def __init__(self, num_players):
+        """Start building leaderboards of ``num_players`` places."""
+        self.num_players = num_players
+        self.rankings = {}
+        self.player_lists = {}
+
+    def add(self, name, values, fill=True):
+        """
+        Add a leaderboard for a metric.
+
+        ``values`` maps player IDs to non-negative values. When ``fill`` is
+        set, players missing from ``values`` count as zero, otherwise they
+        are left off the leaderboard.
+        """
+        self.rankings[name] = (values, fill)
+
+    def add_players(self, name, player_ids):
+        """Add a plain list of players, in player ID order."""
+        self.player_lists[name] = sorted(player_ids)
+
+    def _fill_ids(self):
+        """
+        Get the lowest player IDs, used to pad leaderboards with zeros.
+
+        Any player ranked by a zero value on a filled leaderboard is among
+        the ``2 * num_players`` lowest IDs, since at most ``num_players - 1``
+        of those can outrank it with a positive value.
+        """
+        if not any(fill for (_, fill) in self.rankings.values()):
+            return []
+        query = session.query(Player.id).order_by(Player.id)
+        return [player_id for (player_id,)
+                in query.limit(2 * self.num_players)]
+
+    def build(self):
+        """Rank every metric and load the players on the leaderboards."""
+        fill_ids = self._fill_ids()
+
+        top = {}
+        for name, (values, fill) in self.rankings.items():
+            candidates = list(values.items())
+            if fill:
+                candidates.extend((player_id, 0) for player_id in fill_ids
+                                  if player_id not in values)
+            top[name] = heapq.nsmallest(
+                self.num_players, candidates,
+                key=lambda stat: (-stat[1], stat[0]))
+
+        player_ids = {player_id for ranking in top.values()
+                      for (player_id, _) in ranking}
+        player_ids.update(*self.player_lists.values())
+        players = {}
+        if player_ids:
+            players = {player.id: player for player in
+                       Player.query.filter(Player.id.in_(player_ids))}
+
+        stats = {name: enumerate([(players[player_id], value)
+                                  for (player_id, value) in ranking])
+                 for name, ranking in top.items()}
+        stats.update({name: [players[player_id] for player_id in player_ids]
+                      for name, player_ids in self.player_lists.items()})
+        return stats
+
+
+def episode_stats(season, episode, num_players=5):
+    """Get statistics for an episode."""
+    rows = _player_episode_rows(PlayerEpisodeStats.season == season,
+                                PlayerEpisodeStats.episode == episode)
+
+    leaderboards = Leaderboards(num_players)
+    for name in ('wins', 'stones_given', 'dans_slain', 'kyus_killed'):
+        leaderboards.add(name, {row.player_id: getattr(row, name)
+                                for row in rows})
+    leaderboards.add('games_played', {row.player_id: row.games
+                                      for row in rows})
+    leaderboards.add('win_ratios', {row.player_id: row.wins / row.games
+                                    for row in rows}, fill=False)
+    return leaderboards.build()
+
+
+def season_stats(season, num_players=5):
+    """Get statistics for a season."""
+    rows = _player_episode_rows(PlayerEpisodeStats.season == season)
+
+    counters = ('wins', 'losses', 'games', 'dans_slain', 'kyus_killed',
+                'games_against_weaker')
+    totals = {}
+    per_episode = {}
+    for row in rows:
+        total = totals.setdefault(
+            row.player_id, dict.fromkeys(counters + ('games_one_ep',), 0))
+        for counter in counters:
+            total[counter] += getattr(row, counter)
+        total['games_one_ep'] = max(total['games_one_ep'], row.games)
+        per_episode.setdefault(row.player_id, {})[row.episode] = (
+            row.wins, row.losses)
+
+    episodes = range(1, max([row.episode for row in rows], default=0) + 1)
+
+    steady_freddy, fifteen_min_fame, rock_bottom = [], [], []
+    for player_id, results_by_episode in per_episode.items():
+        results = [results_by_episode.get(ep, (0, 0)) for ep in episodes]
+        if all(won + lost > 0 for (won, lost) in results):
+            steady_freddy.append(player_id)
+        if any(won >= 3 and lost == 0 for (won, lost) in results):
+            fifteen_min_fame.append(player_id)
+        if any(lost >= 3 and won == 0 for (won, lost) in results):
+            rock_bottom.append(player_id)
+
+    def metric(name):
+        return {player_id: total[name] for player_id, total in totals.items()}
+
+    leaderboards = Leaderboards(num_players)
+    for name in ('wins', 'dans_slain', 'kyus_killed', 'games_against_weaker',
+                 'losses'):
+        leaderboards.add(name, metric(name))
+    leaderboards.add('games_played', metric('games'))
+    leaderboards.add('games_played_one_ep', metric('games_one_ep'))
+    leaderboards.add('wins_minus_losses',
+                     {player_id: total['wins'] - total['losses']
+                      for player_id, total in totals.items()}, fill=False)
+    leaderboards.add_players('steady_freddy', steady_freddy)
+    leaderboards.add_players('fifteen_min_fame', fifteen_min_fame)
+    leaderboards.add_players('rock_bottom', rock_bottom)
+    return leaderboards.build()
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Warm-up before serving requests.
+
+``flask warm-up`` runs ``warm_deploy`` once per deploy, after migrations and
+before uwsgi starts. It creates the root user, which hashes its password at
+full cost, saves default settings, and renders the cached pages into the cache
+that workers share.
+
+uwsgi then runs ``warm_worker`` in each worker as soon as it is forked. It
+loads settings and the league clock with a query each and compiles the
+templates, so that the first request a worker serves costs no more than the
+next. It also starts the Slack delivery thread, which delivers messages left
+pending by the workers it replaces and polls every ``SLACK_POLL_INTERVAL``
+seconds for retries coming due.
+"""
+from flask import url_for
+
+from league.admin.utils import create_root_user, load_settings
+from league.database import db
+from league.extensions import messenger
+from league.models import league_clock
+
+#: Endpoints of the pages rendered into the shared cache.
+WARM_PAGES = ('dashboard.dashboard', 'dashboard.prizes')
+
+
+def warm_deploy(app):
+    """
+    Prepare the database and the shared cache, returning the URLs rendered.
+
+    Raises ``RuntimeError`` if a page is not served.
+    """
+    with app.test_request_context():
+        create_root_user(app)
+        load_settings(app)
+        urls = [url_for(endpoint) for endpoint in WARM_PAGES]
+        db.session.remove()
+
+    client = app.test_client()
+    for url in urls:
+        response = client.get(url)
+        response.close()
+        db.session.remove()
+        if response.status_code != 200:
+            raise RuntimeError('{} answered {}'.format(url, response.status))
+    return urls
+
+
+def warm_worker(app):
+    """Load what every request needs in a new worker process."""
+    with app.app_context():
+        # Connections opened before forking belong to the parent process.
+        db.engine.dispose()
+        load_settings(app)
+        league_clock.latest_season_episode()
+        league_clock.max_season_episode()
+        db.session.remove()
+    messenger.wake()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
@@ -8,4 +8,9 @@ do
     sleep 1
 done
 
-uwsgi --chmod-socket=666 -s /tmp/uwsgi/uwsgi.sock --plugin python3 --manage-script-name --mount /=autoapp:app
+flask warm-up
+
+# Workers of earlier runs keep their request metrics here
+rm -rf "${LEAGUE_METRICS_DIR:-/tmp/league-metrics}"
+
+uwsgi --master --enable-threads --chmod-socket=666 -s /tmp/uwsgi/uwsgi.sock --plugin python3 --manage-script-name --mount /=autoapp:app
@@ -0,0 +1,89 @@
+"""
+Add player_episode_stats table.
+
+Revision ID: 4c1f7d2e9a3b
+Revises: 83b13b4b5717
+Create Date: 2026-10-18 20:40:12.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '4c1f7d2e9a3b'
+down_revision = '83b13b4b5717'
+branch_labels = None
+depends_on = None
+
+# One row per player per game, with that player's contributions to the stats.
+PARTICIPATIONS = """
+SELECT wpg.player_id AS player_id, g.season AS season, g.episode AS episode,
+       CASE WHEN g.winner = 'white' THEN 1 ELSE 0 END AS won,
+       g.handicap AS stones_given,
+       CASE WHEN b.aga_rank > 0 AND w.aga_rank < 0 AND g.winner = 'white'
+            THEN 1 ELSE 0 END AS dans_slain,
+       CASE WHEN w.aga_rank > 0 AND b.aga_rank < 0 AND g.winner = 'white'
+            THEN 1 ELSE 0 END AS kyus_killed,
+       CASE WHEN w.aga_rank > b.aga_rank THEN 1 ELSE 0 END
+           AS games_against_weaker
+FROM games g
+JOIN white_player_games wpg ON wpg.game_id = g.id
+JOIN black_player_games bpg ON bpg.game_id = g.id
+JOIN players w ON w.id = wpg.player_id
+JOIN players b ON b.id = bpg.player_id
+UNION ALL
+SELECT bpg.player_id, g.season, g.episode,
+       CASE WHEN g.winner = 'white' THEN 0 ELSE 1 END,
+       0,
+       CASE WHEN w.aga_rank > 0 AND b.aga_rank < 0 AND g.winner = 'black'
+            THEN 1 ELSE 0 END,
+       CASE WHEN b.aga_rank > 0 AND w.aga_rank < 0 AND g.winner = 'black'
+            THEN 1 ELSE 0 END,
+       CASE WHEN b.aga_rank > w.aga_rank THEN 1 ELSE 0 END
+FROM games g
+JOIN white_player_games wpg ON wpg.game_id = g.id
+JOIN black_player_games bpg ON bpg.game_id = g.id
+JOIN players w ON w.id = wpg.player_id
+JOIN players b ON b.id = bpg.player_id
+"""
+
+
+def upgrade():
+    """Upgrade database."""
+    op.create_table(
+        'player_episode_stats',
+        sa.Column('player_id', sa.Integer(), nullable=False),
+        sa.Column('season', sa.Integer(), autoincrement=False,
+                  nullable=False),
+        sa.Column('episode', sa.Integer(), autoincrement=False,
+                  nullable=False),
+        sa.Column('games', sa.Integer(), nullable=False),
+        sa.Column('wins', sa.Integer(), nullable=False),
+        sa.Column('losses', sa.Integer(), nullable=False),
+        sa.Column('stones_given', sa.Integer(), nullable=False),
+        sa.Column('dans_slain', sa.Integer(), nullable=False),
+        sa.Column('kyus_killed', sa.Integer(), nullable=False),
+        sa.Column('games_against_weaker', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['player_id'], ['players.id'], ),
+        sa.PrimaryKeyConstraint('player_id', 'season', 'episode')
+    )
+    op.create_index('ix_player_episode_stats_season_episode',
+                    'player_episode_stats', ['season', 'episode'],
+                    unique=False)
+    op.execute("""
+        INSERT INTO player_episode_stats
+            (player_id, season, episode, games, wins, losses, stones_given,
+             dans_slain, kyus_killed, games_against_weaker)
+        SELECT player_id, season, episode, count(*), sum(won),
+               count(*) - sum(won), sum(stones_given), sum(dans_slain),
+               sum(kyus_killed), sum(games_against_weaker)
+        FROM ({participations}) AS participations
+        GROUP BY player_id, season, episode
+    """.format(participations=PARTICIPATIONS))
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_index('ix_player_episode_stats_season_episode',
+                  table_name='player_episode_stats')
+    op.drop_table('player_episode_stats')
@@ -0,0 +1,39 @@
+"""
+Add Slack notification outbox.
+
+Revision ID: 5b8e0f3c6d21
+Revises: 9e3a51c07d64
+Create Date: 2026-10-18 22:14:05.291377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '5b8e0f3c6d21'
+down_revision = '9e3a51c07d64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.create_table(
+        'slack_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_slack_outbox_pending', 'slack_outbox',
+                    ['sent_at', 'next_attempt_at'], unique=False)
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_index('ix_slack_outbox_pending', table_name='slack_outbox')
+    op.drop_table('slack_outbox')
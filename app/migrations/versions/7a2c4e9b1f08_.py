@@ -0,0 +1,38 @@
+"""
+Add stored AGA reports.
+
+Revision ID: 7a2c4e9b1f08
+Revises: 5b8e0f3c6d21
+Create Date: 2026-10-19 10:02:47.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '7a2c4e9b1f08'
+down_revision = '5b8e0f3c6d21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.create_table(
+        'reports',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('season', sa.Integer(), nullable=False),
+        sa.Column('episode', sa.Integer(), nullable=False),
+        sa.Column('digest', sa.String(length=40), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_reports_season_episode', 'reports',
+                    ['season', 'episode'], unique=False)
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_index('ix_reports_season_episode', table_name='reports')
+    op.drop_table('reports')
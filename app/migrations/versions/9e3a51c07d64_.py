@@ -0,0 +1,26 @@
+"""
+Add season and episode index for games.
+
+Revision ID: 9e3a51c07d64
+Revises: 4c1f7d2e9a3b
+Create Date: 2026-10-18 21:02:47.530918
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '9e3a51c07d64'
+down_revision = '4c1f7d2e9a3b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    op.create_index('ix_games_season_episode', 'games',
+                    ['season', 'episode'], unique=False)
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_index('ix_games_season_episode', table_name='games')
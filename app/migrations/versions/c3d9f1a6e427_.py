@@ -0,0 +1,29 @@
+"""
+Add claimed_until column for Slack outbox messages.
+
+Revision ID: c3d9f1a6e427
+Revises: 7a2c4e9b1f08
+Create Date: 2026-10-20 09:41:18.652391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c3d9f1a6e427'
+down_revision = '7a2c4e9b1f08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Upgrade database."""
+    with op.batch_alter_table('slack_outbox') as batch_op:
+        batch_op.add_column(sa.Column('claimed_until', sa.DateTime(),
+                                      nullable=True))
+
+
+def downgrade():
+    """Downgrade database."""
+    with op.batch_alter_table('slack_outbox') as batch_op:
+        batch_op.drop_column('claimed_until')
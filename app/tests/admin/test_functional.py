@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Functional tests of the admin pages."""
+from flask import url_for
+
+from league.admin.models import User
+from league.extensions import passwords
+from league.passwords import HashingBusy
+
+from ..query_budget import query_budget
+
+
+def _busy(*args):
+    """Refuse to hash, as a full password hashing queue does."""
+    raise HashingBusy('Too many passwords are being hashed')
+
+
+class TestCreateUser:
+    """Creating users."""
+
+    def _submit(self, testapp):
+        """Submit the create user form."""
+        res = testapp.get(url_for('admin.create_user'))
+        form = res.forms[0]
+        form['first_name'] = 'Alice'
+        form['last_name'] = 'Liddell'
+        form['username'] = 'alice'
+        form['email'] = 'alice@example.com'
+        form['password'] = 'rabbit-hole'
+        return form.submit()
+
+    @query_budget(4)
+    def test_create_user(self, testapp, db):
+        """Create a user."""
+        res = self._submit(testapp)
+        assert 'User created!' in res
+        assert User.get_by_username('alice') is not None
+
+    @query_budget(4)
+    def test_hashing_busy(self, testapp, db, monkeypatch):
+        """Show an error rather than failing while hashing is busy."""
+        monkeypatch.setattr(passwords, 'hash', _busy)
+        res = self._submit(testapp)
+        assert res.status_int == 200
+        assert 'try again shortly' in res
+        assert User.get_by_username('alice') is None
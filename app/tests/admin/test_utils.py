@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Test admin utilities."""
+from flask import url_for
+
+from league.admin.models import SiteSettings, User
+from league.admin.utils import (create_root_user, load_settings,
+                                refresh_settings, update_messenger_config,
+                                update_profiler_config, update_site_settings)
+from league.extensions import messenger, passwords, sampling_profiler
+from league.passwords import HashingBusy
+
+
+class TestRootUser:
+    """The root user."""
+
+    def test_create(self, app, db):
+        """Create the root user once."""
+        assert create_root_user(app) is True
+        assert create_root_user(app) is True
+        assert User.query.filter_by(username='root').count() == 1
+
+    def test_hashing_busy(self, app, db, monkeypatch):
+        """Leave the root user for later while hashing is busy."""
+        def busy(*args):
+            raise HashingBusy('Too many passwords are being hashed')
+
+        monkeypatch.setattr(passwords, 'hash', busy)
+        assert create_root_user(app) is False
+        assert User.get_by_username('root') is None
+
+
+class TestSettings:
+    """Site settings and Slack configuration."""
+
+    def test_load_with_one_query(self, app, db, statements):
+        """Load every setting with a single query once defaults exist."""
+        load_settings(app)
+        del statements[:]
+        load_settings(app)
+        assert len(statements) == 1
+
+    def test_update_in_one_transaction(self, app, db):
+        """Save a batch of settings and a new version together."""
+        load_settings(app)
+        version = SiteSettings.get_version()
+        update_site_settings(app, dashboard_title='Ladder',
+                             this_episode_phrase='Tonight')
+
+        assert SiteSettings.get_version() != version
+        assert app.config['SITE_SETTINGS']['dashboard_title'] == 'Ladder'
+        assert SiteSettings.get_values()[
+            'site_settings_this_episode_phrase'] == 'Tonight'
+
+    def test_refresh_unchanged(self, app, db, statements):
+        """Only check the version while nothing changed."""
+        refresh_settings(app)
+        del statements[:]
+        refresh_settings(app)
+        assert len(statements) == 1
+
+    def test_refresh_after_other_worker(self, app, db):
+        """Pick up settings saved by another process."""
+        update_messenger_config(app, channel='#old')
+        SiteSettings.save_values({'slack_channel': '#new',
+                                  'site_settings_dashboard_title': 'Ladder'})
+
+        refresh_settings(app)
+        assert messenger.config['channel'] == '#new'
+        assert app.config['SITE_SETTINGS']['dashboard_title'] == 'Ladder'
+
+    def test_profiler_switch(self, app, db):
+        """Follow the configuration until the profiler is switched."""
+        sampling_profiler.update_configuration(enabled=True)
+        load_settings(app)
+        assert sampling_profiler.enabled
+
+        update_profiler_config(app, enabled=False)
+        assert not sampling_profiler.enabled
+        SiteSettings.save_values({'profiler_enabled': 'True'})
+        refresh_settings(app)
+        assert sampling_profiler.enabled
+        sampling_profiler.update_configuration(enabled=False)
+
+    def test_refreshed_per_request(self, app, testapp, db):
+        """Serve pages with settings saved by another process."""
+        testapp.get(url_for('dashboard.dashboard'))
+        SiteSettings.save_values({'site_settings_dashboard_title': 'Ladder'})
+
+        res = testapp.get(url_for('dashboard.dashboard'))
+        assert 'Ladder' in res
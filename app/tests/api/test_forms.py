@@ -3,7 +3,9 @@
 
 import pytest
 
+from league.api.forms import GameCreateForm as ApiGameCreateForm
 from league.dashboard.forms import GameCreateForm
+from league.models import Game
 
 
 class TestGameCreateForm:
@@ -31,3 +33,42 @@ class TestGameCreateForm:
         form.episode.choices = episode_choices
         assert form.validate() is True, ('Validation failed: {}'
                                          ''.format(form.errors))
+
+
+class TestApiGameCreateForm:
+    """API game create form."""
+
+    @staticmethod
+    def _form(white_id, black_id, season=1, episode=1):
+        return ApiGameCreateForm(white_id=white_id, black_id=black_id,
+                                 winner='white', handicap=0, komi=7,
+                                 season=season, episode=episode)
+
+    def test_validate_success(self, players):
+        """Accept existing players without building choices."""
+        form = self._form(players[0].id, players[1].id)
+        assert form.validate() is True, form.errors
+
+    def test_players_checked_with_one_query(self, players, statements):
+        """Load both players with a single query."""
+        form = self._form(players[0].id, players[1].id)
+        del statements[:]
+        form.validate()
+        assert len([sql for sql in statements if 'FROM players' in sql]) == 1
+
+    def test_unknown_player(self, players):
+        """Reject players that do not exist."""
+        form = self._form(players[0].id, 12345)
+        assert form.validate() is False
+        assert form.errors == {'black_id': ['Player 12345 does not exist']}
+
+    def test_season_and_episode_bounds(self, games):
+        """Allow at most one past the latest season and episode."""
+        max_season, max_episode = Game.get_max_season_ep()
+        white, black = games[0].white, games[0].black
+        assert self._form(white.id, black.id, max_season + 1,
+                          max_episode + 1).validate() is True
+
+        form = self._form(white.id, black.id, max_season + 2, 0)
+        assert form.validate() is False
+        assert set(form.errors) == {'season', 'episode'}
@@ -1,16 +1,19 @@
 # -*- coding: utf-8 -*-
 """API functional tests."""
 import pytest
-from flask import url_for
+from flask import json, url_for
 
+from league.api.views import get_games
 from league.models import Color
 
 from ..factories import GameFactory
+from ..query_budget import query_budget
 
 
 class TestGame:
     """Games."""
 
+    @query_budget(2)
     def test_get_games(self, testapp, db):
         """Check that we can get games."""
         first_game = GameFactory(winner=Color.white, handicap=3, komi=0)
@@ -33,11 +36,58 @@ class TestGame:
         assert int(games[1]['handicap']) == second_game.handicap
         assert int(games[1]['komi']) == second_game.komi
 
+    @query_budget(2)
+    def test_get_games_paginated(self, testapp, db):
+        """Page through games by ID, following the next link."""
+        games = [GameFactory() for _ in range(5)]
+        db.session.commit()
+
+        res = testapp.get(url_for('api.get_games', limit=2))
+        assert [game['game_id'] for game in res.json] == [games[0].id,
+                                                          games[1].id]
+        next_url = url_for('api.get_games', after_id=games[1].id, limit=2,
+                           _external=True)
+        assert res.headers['Link'] == '<{}>; rel="next"'.format(next_url)
+
+        res = testapp.get(url_for('api.get_games', after_id=games[3].id,
+                                  limit=2))
+        assert [game['game_id'] for game in res.json] == [games[4].id]
+        assert 'Link' not in res.headers
+
+    @query_budget(2)
+    def test_get_games_streamed(self, app, testapp, db):
+        """Stream the array of every game when no limit is given."""
+        assert testapp.get(url_for('api.get_games')).json == []
+        games = [GameFactory() for _ in range(3)]
+        db.session.commit()
+
+        res = testapp.get(url_for('api.get_games'))
+        assert res.content_type == 'application/json'
+        assert res.json == [game.to_dict() for game in games]
+        with app.test_request_context(url_for('api.get_games')):
+            response = app.make_response(get_games())
+            assert response.is_streamed
+            assert json.loads(response.get_data(as_text=True)) == res.json
+
+    @query_budget(2)
+    def test_get_games_ndjson(self, testapp, db):
+        """Stream games as newline-delimited JSON."""
+        games = [GameFactory() for _ in range(3)]
+        db.session.commit()
+
+        res = testapp.get(url_for('api.get_games', format='ndjson',
+                                  after_id=games[0].id))
+        assert res.content_type == 'application/x-ndjson'
+        lines = res.text.splitlines()
+        assert [json.loads(line) for line in lines] == [games[1].to_dict(),
+                                                        games[2].to_dict()]
+
     @pytest.mark.parametrize('winner', ['white'])
     @pytest.mark.parametrize('handicap', [0, 8])
     @pytest.mark.parametrize('komi', [0, 7])
     @pytest.mark.parametrize('season', [1])
     @pytest.mark.parametrize('episode', [1])
+    @query_budget(13)
     def test_create_game(self, testapp, players, winner, handicap, komi, season,
                          episode):
         """Check that we can create a game."""
@@ -65,6 +115,16 @@ class TestGame:
         assert game['season'] == season
         assert game['episode'] == episode
 
+    @query_budget(3)
+    def test_create_game_unknown_player(self, testapp, players):
+        """Reject games with players that do not exist."""
+        form = {'white_id': players[0].id, 'black_id': 12345,
+                'winner': 'white', 'handicap': 0, 'komi': 7, 'season': 1,
+                'episode': 1}
+        res = testapp.post(url_for('api.create_game'), form, status=404)
+        assert res.json == {'black_id': ['Player 12345 does not exist']}
+
+    @query_budget(9)
     def test_delete_game(self, testapp, games):
         """Test game deletion."""
         get_res = testapp.get(url_for('api.get_games'))
@@ -3,7 +3,8 @@
 import datetime as dt
 from operator import methodcaller
 
-from league.models import Color, Game, Player
+from league.caching import bump_generation
+from league.models import Color, Game, Player, league_clock
 
 from ..factories import GameFactory, PlayerFactory
 
@@ -49,3 +50,96 @@ class TestGame:
                  for (s, e) in [(1, 1), (1, 2), (2, 1), (3, 1)]]
         map(methodcaller('save'), games)
         assert Game.latest_season_episode() == (3, 1)
+
+    def test_iter_dicts(self, db):
+        """Iterate over games as dictionaries, after an ID, up to a limit."""
+        games = [GameFactory() for _ in range(4)]
+        db.session.commit()
+
+        assert list(Game.iter_dicts()) == [game.to_dict() for game in games]
+        assert list(Game.iter_dicts(after_id=games[0].id, limit=2,
+                                    batch_size=1)) == [games[1].to_dict(),
+                                                       games[2].to_dict()]
+
+
+class TestPlayer:
+    """Player model tests."""
+
+    def test_history(self, db):
+        """Load a player's games in the order they were played."""
+        player, other = PlayerFactory(), PlayerFactory()
+        later = GameFactory(white=player, black=other,
+                            played_at=dt.datetime(2017, 2, 1))
+        earlier = GameFactory(white=other, black=player,
+                              played_at=dt.datetime(2017, 1, 1))
+        GameFactory()
+        db.session.commit()
+
+        assert player.games == [earlier, later]
+        assert player.history() is player.history()
+        assert player.latest_season_episode() == (1, 1)
+
+    def test_history_stats(self, db):
+        """Tally episode, season and league results in one pass."""
+        player, other = PlayerFactory(), PlayerFactory()
+        for (winner, season, episode) in [(Color.white, 1, 1),
+                                          (Color.black, 1, 1),
+                                          (Color.white, 2, 1),
+                                          (Color.white, 2, 2)]:
+            GameFactory(white=player, black=other, winner=winner,
+                        season=season, episode=episode)
+        db.session.commit()
+
+        stats = player.history().stats((2, 2))
+        assert stats['episode'] == {'wins': 1, 'losses': 0}
+        assert stats['season'] == {'wins': 2, 'losses': 0}
+        assert stats['league'] == {'wins': 3, 'losses': 1}
+        assert stats['league'] == player.league_stats()
+
+    def test_history_reloaded_after_commit(self, db):
+        """Reload history after games change."""
+        player = PlayerFactory()
+        db.session.commit()
+        assert player.games == []
+
+        game = GameFactory(white=player)
+        db.session.commit()
+        assert player.games == [game]
+
+
+class TestLeagueClock:
+    """League clock tests."""
+
+    def test_memoized_until_commit(self, db):
+        """Remember the latest season and episode until games change."""
+        GameFactory(season=2, episode=3)
+        db.session.commit()
+        assert league_clock.latest_season_episode() == (2, 3)
+
+        Game.query.update({'episode': 4})
+        assert league_clock.latest_season_episode() == (2, 3)
+
+        db.session.commit()
+        GameFactory(season=3, episode=1)
+        db.session.commit()
+        assert league_clock.latest_season_episode() == (3, 1)
+        assert league_clock.max_season_episode() == (3, 4)
+
+    def test_forgotten_across_processes(self, db):
+        """Forget answers once another process commits games."""
+        GameFactory(season=2, episode=3)
+        db.session.commit()
+        assert league_clock.latest_season_episode() == (2, 3)
+
+        Game.query.update({'episode': 4})  # Bypasses this process's hooks
+        db.session.commit()
+        assert league_clock.latest_season_episode() == (2, 3)
+
+        bump_generation('league')  # As the other process's commit does
+        assert league_clock.latest_season_episode() == (2, 4)
+        assert league_clock.max_season_episode() == (2, 4)
+
+    def test_empty(self, db):
+        """Start at season and episode zero."""
+        assert league_clock.latest_season_episode() == (0, 0)
+        assert league_clock.max_season_episode() == (0, 0)
@@ -3,13 +3,25 @@
 
 import pytest
 from flask import url_for
-from webtest import TestApp
+from flask.cli import ScriptInfo
 
+from league.admin.models import user_cache
+from league.admin.utils import (create_root_user, refresh_settings,
+                                update_messenger_config)
 from league.app import create_app
 from league.database import db as _db
 from league.settings import TestConfig
 
 from .factories import GameFactory, PlayerFactory, UserFactory
+from .query_budget import BudgetedTestApp, recording_statements
+from .slack_stub import SlackStub
+
+
+def pytest_configure(config):
+    """Register markers."""
+    config.addinivalue_line(
+        'markers', 'query_budget(limit): most SQL statements each request of '
+        'the test may execute')
 
 
 @pytest.yield_fixture(scope='function')
@@ -25,9 +37,23 @@ def app():
 
 
 @pytest.fixture(scope='function')
-def testapp(app):
-    """A Webtest app."""
-    return TestApp(app)
+def testapp(app, request):
+    """A Webtest app, holding requests to the test's query budget."""
+    marker = request.node.get_closest_marker('query_budget')
+
+    def warm_up():
+        """Create the root user and default settings, uncounted."""
+        create_root_user(app)
+        refresh_settings(app)
+
+    return BudgetedTestApp(app, budget=marker.args[0] if marker else None,
+                           warm_up=warm_up)
+
+
+@pytest.fixture
+def script_info(app):
+    """Command line information loading the test app, to invoke commands."""
+    return ScriptInfo(create_app=lambda info: app)
 
 
 @pytest.yield_fixture(scope='function')
@@ -42,6 +68,14 @@ def db(app):
     # Explicitly close DB connection
     _db.session.close()
     _db.drop_all()
+    user_cache.forget()
+
+
+@pytest.yield_fixture
+def statements(db):
+    """SQL statements executed from now on, until the test ends."""
+    with recording_statements() as executed:
+        yield executed
 
 
 @pytest.fixture
@@ -89,6 +123,18 @@ def games(db):
     return games
 
 
+@pytest.yield_fixture
+def slack_stub(app, db):
+    """A local Slack webhook the messenger is configured to post to."""
+    stub = SlackStub()
+    update_messenger_config(app, enabled=True, webhook=stub.url,
+                            channel='#league')
+
+    yield stub
+
+    stub.stop()
+
+
 @pytest.fixture
 def season_choices():
     """Season choices to use when testing game create form."""
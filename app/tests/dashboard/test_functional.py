@@ -2,10 +2,17 @@
 """API functional tests."""
 from flask import url_for
 
+from league.admin.utils import update_site_settings
+from league.caching import fragment_stats
+
+from ..factories import GameFactory, PlayerFactory
+from ..query_budget import query_budget
+
 
 class TestPlayer:
     """Players."""
 
+    @query_budget(2)
     def test_get_players(self, testapp, players):
         """Check that we can list players."""
         res = testapp.get(url_for('dashboard.get_players'))
@@ -16,6 +23,7 @@ class TestPlayer:
             found_players.append([col.text for col in row.find_all('td')])
         assert len(players) == 2
 
+    @query_budget(5)
     def test_delete_player(self, testapp, players):
         """Test player deletion."""
         res = testapp.get(url_for('dashboard.get_players'))
@@ -34,3 +42,124 @@ class TestPlayer:
                               post_raw_form.find_all('input',
                                                      {'name': 'player_id'})]
         assert len(post_found_players) == 1
+
+    @query_budget(4)
+    def test_get_player(self, testapp, games):
+        """Show a player's statistics and games."""
+        player = games[0].white
+        res = testapp.get(url_for('dashboard.get_player', player_id=player.id))
+        assert res.status_int == 200
+        assert 'Wins: 1' in res
+        assert len(res.html.find('table').find('tbody').find_all('tr')) == 1
+
+
+class TestGame:
+    """Games."""
+
+    @query_budget(4)
+    def test_player_choices_follow_players(self, testapp, db, players):
+        """Offer new players once they are created."""
+        testapp.get(url_for('dashboard.list_games'))
+        player = PlayerFactory()
+        db.session.commit()
+
+        res = testapp.get(url_for('dashboard.list_games'))
+        choices = [int(option['value']) for option
+                   in res.html.find('select', {'id': 'white_id'})('option')]
+        assert choices == [players[0].id, players[1].id, player.id]
+
+
+class TestReport:
+    """AGA results reports."""
+
+    @query_budget(7)
+    def test_download_report(self, testapp, games):
+        """Download a report as a text file."""
+        res = testapp.get(url_for('dashboard.get_reports'))
+        form = res.forms['reportGenerateForm']
+        form['season'] = '1'
+        form['episode'] = '1'
+        res = form.submit()
+
+        assert res.content_type == 'text/plain'
+        assert res.headers['Content-Disposition'] == (
+            'attachment; filename=results-s1-e1.txt')
+        assert res.text.startswith('PLAYERS\n')
+        assert '{} {} w 0 7\n'.format(games[0].white.aga_id,
+                                      games[0].black.aga_id) in res.text
+
+    @query_budget(1)
+    def test_invalid_report(self, testapp, db):
+        """Show errors for invalid episodes."""
+        res = testapp.get(url_for('dashboard.get_reports'))
+        form = res.forms['reportGenerateForm']
+        form['season'] = '0'
+        form['episode'] = '1'
+        res = form.submit()
+        assert 'reportGenerateForm' in res.forms
+
+
+class TestCachedPages:
+    """Cached dashboard and prizes content."""
+
+    @query_budget(7)
+    def test_dashboard_hit_and_miss(self, testapp, games):
+        """Serve repeated dashboard views from the cache."""
+        fragment_stats.reset()
+        first = testapp.get(url_for('dashboard.dashboard'))
+        second = testapp.get(url_for('dashboard.dashboard'))
+
+        assert first.headers['X-Cache'] == 'MISS'
+        assert second.headers['X-Cache'] == 'HIT'
+        assert first.text == second.text
+        assert fragment_stats.as_dict() == {
+            'dashboard': {'hits': 1, 'misses': 1}}
+
+    @query_budget(5)
+    def test_invalidated_by_games(self, testapp, db, games):
+        """Render again after a game is written."""
+        testapp.get(url_for('dashboard.prizes'))
+        GameFactory(white=games[0].black, black=games[0].white)
+        db.session.commit()
+
+        res = testapp.get(url_for('dashboard.prizes'))
+        assert res.headers['X-Cache'] == 'MISS'
+        res = testapp.get(url_for('dashboard.prizes'))
+        assert res.headers['X-Cache'] == 'HIT'
+
+    @query_budget(7)
+    def test_invalidated_by_players(self, testapp, db, players):
+        """Show new players once they are created."""
+        testapp.get(url_for('dashboard.dashboard'))
+        player = PlayerFactory(first_name='Newcomer')
+        db.session.commit()
+
+        res = testapp.get(url_for('dashboard.dashboard'))
+        assert res.headers['X-Cache'] == 'MISS'
+        assert player.full_name in res
+
+    @query_budget(6)
+    def test_invalidated_by_site_settings(self, app, testapp, db):
+        """Show new site settings once they are saved."""
+        testapp.get(url_for('dashboard.dashboard'))
+        update_site_settings(app, dashboard_title='Go Ladder')
+
+        res = testapp.get(url_for('dashboard.dashboard'))
+        assert res.headers['X-Cache'] == 'MISS'
+        assert 'Go Ladder' in res
+
+    @query_budget(6)
+    def test_login_form_not_cached(self, testapp, db):
+        """Keep the login form working on cached pages."""
+        testapp.get(url_for('dashboard.dashboard'))
+        res = testapp.get(url_for('dashboard.dashboard'))
+        assert res.headers['X-Cache'] == 'HIT'
+        assert 'loginForm' in res.forms
+
+    @query_budget(4)
+    def test_cache_stats(self, testapp, db):
+        """Report hits and misses to administrators."""
+        fragment_stats.reset()
+        testapp.get(url_for('dashboard.prizes'))
+        res = testapp.get(url_for('admin.cache_stats'))
+        assert res.json == {'prizes': {'hits': 0, 'misses': 1}}
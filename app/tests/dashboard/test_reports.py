@@ -1,25 +1,140 @@
 # -*- coding: utf-8 -*-
-"""Model unit tests."""
+"""Report tests."""
+import pytest
+from click.testing import CliRunner
 
+from league.commands import generate_reports
 from league.dashboard.reports import Report
-from league.models import Game, Player
+from league.models import StoredReport
+
+from ..factories import GameFactory, PlayerFactory
+
+
+def _player_line(player):
+    """Format a player the way reports list them."""
+    return '{} {}, {} {}\n'.format(player.aga_id, player.last_name,
+                                   player.first_name, player.aga_rank)
+
+
+@pytest.fixture
+def file_db(app, tmpdir, request):
+    """A database in a file, which forked processes can share."""
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///{}'.format(
+        tmpdir.join('league.sqlite'))
+    return request.getfixturevalue('db')
 
 
 class TestReport:
-    """User tests."""
+    """AGA results reports."""
 
     def test_generate_report(self, games):
-        """Generate a report."""
+        """Generate a report of an episode."""
         report = Report(1, 1)
         assert report.season == 1
         assert report.episode == 1
 
-        players = list(report.players)
-        games = list(report.games)
-        assert len(players) == 4
-        assert len(games) == 2
+        players = sorted((player for game in games for player in game.players),
+                         key=lambda player: player.aga_id)
+        assert list(report) == (
+            ['PLAYERS\n'] + [_player_line(player) for player in players] +
+            ['GAMES\n'] +
+            ['{} {} w 0 7\n'.format(game.white.aga_id, game.black.aga_id)
+             for game in games])
+        assert report.filename == 'results-s1-e1.txt'
+
+    def test_generate_season_report(self, db):
+        """Generate a report of every episode of a season."""
+        white, black = PlayerFactory(), PlayerFactory()
+        for episode in (1, 2):
+            GameFactory(white=white, black=black, episode=episode)
+        GameFactory(white=white, black=black, season=2)
+        db.session.commit()
+
+        lines = list(Report(1, 0))
+        assert lines.count('{} {} w 0 7\n'.format(white.aga_id,
+                                                  black.aga_id)) == 2
+        assert lines[1:3] == [_player_line(white), _player_line(black)]
+        assert Report(1, 0).filename == 'results-s1.txt'
+
+    def test_single_query(self, db, games, statements):
+        """Read every game and player with one query."""
+        db.session.expunge_all()
+        del statements[:]
+        assert len(list(Report(1, 0))) == 8
+        assert len(statements) == 1
+
+
+class TestStoredReport:
+    """Reports stored until their games change."""
+
+    def test_reused(self, games, statements):
+        """Serve a stored report without reading the games again."""
+        report = Report(1, 1)
+        content = ''.join(report.stored_lines())
+        assert StoredReport.query.one().content == content
+
+        del statements[:]
+        assert ''.join(report.stored_lines()) == content
+        assert len(statements) == 3
+
+    def test_game_modified(self, games):
+        """Generate the report again once one of its games changes."""
+        report = Report(1, 0)
+        content = ''.join(report.stored_lines())
+        games[0].update(komi=6)
+
+        assert ''.join(report.stored_lines()) != content
+        assert StoredReport.query.one().content == ''.join(report)
+
+    def test_player_modified(self, games):
+        """Generate the report again once one of its players changes."""
+        report = Report(1, 1)
+        content = ''.join(report.stored_lines())
+        player = games[0].white
+        player.update(aga_rank=-30)  # Dans are ranked from 1 up
+
+        assert ''.join(report.stored_lines()) != content
+        assert _player_line(player) in StoredReport.query.one().content
+
+    def test_game_deleted(self, games):
+        """Generate the report again once one of its games is deleted."""
+        report = Report(1, 1)
+        content = ''.join(report.stored_lines())
+        games[0].delete()
+        assert ''.join(report.stored_lines()) != content
+
+    def test_other_episode_changed(self, db, games):
+        """Keep reports of other episodes."""
+        report = Report(1, 1)
+        stored = ''.join(report.stored_lines())
+        GameFactory(episode=2)
+        db.session.commit()
+        assert StoredReport.get_current(1, 1, report.digest()).content == stored
+
+    def test_generate_command(self, db, script_info, games):
+        """Generate every report from the command line."""
+        GameFactory(episode=2)
+        db.session.commit()
+
+        runner = CliRunner()
+        result = runner.invoke(generate_reports, ['--processes', '1'],
+                               obj=script_info)
+        assert result.output.endswith('Generated 3 reports.\n')
+        assert {(report.season, report.episode)
+                for report in StoredReport.query} == {(1, 0), (1, 1), (1, 2)}
+        result = runner.invoke(generate_reports, ['--processes', '1'],
+                               obj=script_info)
+        assert result.output == 'Generated 0 reports.\n'
+
+    def test_generate_in_processes(self, file_db, script_info):
+        """Generate reports in a pool of processes."""
+        GameFactory(episode=1)
+        GameFactory(episode=2)
+        file_db.session.commit()
 
-        for game in games:
-            assert isinstance(game, Game)
-        for player in players:
-            assert isinstance(player, Player)
+        result = CliRunner().invoke(generate_reports, ['--processes', '2'],
+                                    obj=script_info)
+        assert result.output.endswith('Generated 3 reports.\n')
+        for report in StoredReport.query:
+            assert report.content == ''.join(
+                Report(report.season, report.episode))
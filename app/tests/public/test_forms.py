@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 """Test forms."""
 
+from league.extensions import passwords
 from league.public.forms import LoginForm
 
 
@@ -39,3 +40,60 @@ class TestLoginForm:
         form = LoginForm(username=user.username, password='example')
         assert form.validate() is False
         assert 'User not activated' in form.username.errors
+
+    def test_validate_rehashes_old_cost(self, app, user):
+        """Upgrade passwords hashed with another cost."""
+        app.config['BCRYPT_LOG_ROUNDS'] = 5
+        form = LoginForm(username=user.username, password='myprecious')
+        assert form.validate() is True
+        assert user.password.startswith(b'$2b$05$')
+        assert user.check_password('myprecious')
+
+    def test_validate_too_many_attempts(self, app, user, monkeypatch):
+        """Refuse floods of failed attempts for a username without hashing."""
+        app.config['LOGIN_ATTEMPT_LIMIT'] = 2
+        for _ in range(2):
+            LoginForm(username=user.username, password='wrong').validate()
+
+        monkeypatch.setattr(passwords, 'check', None)
+        form = LoginForm(username=user.username, password='myprecious')
+        assert form.validate() is False
+        assert ('Too many login attempts, try again later' in
+                form.username.errors)
+
+    def test_validate_too_many_attempts_from_address(self, app, users):
+        """Refuse floods of failed attempts from one address."""
+        app.config['LOGIN_ADDRESS_ATTEMPT_LIMIT'] = 1
+        LoginForm(username=users[0].username, password='wrong').validate()
+        form = LoginForm(username=users[1].username, password='wrong')
+        assert form.validate() is False
+        assert ('Too many login attempts, try again later' in
+                form.username.errors)
+
+    def test_validate_other_addresses_not_locked_out(self, app, user):
+        """Let a username log in from addresses that did not fail."""
+        app.config['LOGIN_ATTEMPT_LIMIT'] = 2
+        for _ in range(3):
+            LoginForm(username=user.username, password='wrong').validate()
+
+        with app.test_request_context(
+                environ_base={'REMOTE_ADDR': '192.0.2.1'}):
+            assert LoginForm(username=user.username,
+                             password='myprecious').validate() is True
+
+    def test_validate_only_failures_counted(self, app, user):
+        """Let a username log in as often as it likes."""
+        app.config['LOGIN_ATTEMPT_LIMIT'] = 2
+        for _ in range(3):
+            assert LoginForm(username=user.username,
+                             password='myprecious').validate() is True
+
+    def test_validate_attempts_reset_by_login(self, app, user):
+        """Forget a username's failed attempts once it logs in."""
+        app.config['LOGIN_ATTEMPT_LIMIT'] = 2
+        LoginForm(username=user.username, password='wrong').validate()
+        assert LoginForm(username=user.username,
+                         password='myprecious').validate() is True
+        LoginForm(username=user.username, password='wrong').validate()
+        assert LoginForm(username=user.username,
+                         password='myprecious').validate() is True
@@ -6,11 +6,13 @@ See: http://webtest.readthedocs.org/
 from flask import url_for
 
 from ..factories import UserFactory
+from ..query_budget import query_budget
 
 
 class TestLoggingIn:
     """Login."""
 
+    @query_budget(6)
     def test_can_log_in_returns_200(self, db, testapp):
         """Login successful."""
         password = 'some_test_password'
@@ -25,6 +27,7 @@ class TestLoggingIn:
         res = form.submit().follow()
         assert res.status_code == 200
 
+    @query_budget(6)
     def test_sees_alert_on_log_out(self, user, testapp):
         """Show alert on logout."""
         res = testapp.get(url_for('dashboard.dashboard'))
@@ -38,6 +41,7 @@ class TestLoggingIn:
         # sees alert
         assert 'You are logged out.' in res
 
+    @query_budget(6)
     def test_sees_error_message_if_password_is_incorrect(self, user, testapp):
         """Show error if password is incorrect."""
         # Goes to homepage
@@ -51,6 +55,7 @@ class TestLoggingIn:
         # sees error
         assert 'Invalid password' in res
 
+    @query_budget(6)
     def test_sees_error_message_if_username_doesnt_exist(self, user, testapp):
         """Show error if username doesn't exist."""
         # Goes to homepage
@@ -68,6 +73,7 @@ class TestLoggingIn:
 class TestUser:
     """Users."""
 
+    @query_budget(6)
     def test_delete_user(self, testapp, authed_user):
         """Test user deletion."""
         res = testapp.get(url_for('admin.list_and_delete_users'))
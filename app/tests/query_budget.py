@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Query budgets for requests made through WebTest."""
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from webtest import TestApp
+
+
+def query_budget(limit):
+    """
+    Declare the most SQL statements each request of a test may execute.
+
+    Usage: ::
+
+        @query_budget(4)
+        def test_dashboard(testapp):
+            ...
+    """
+    return pytest.mark.query_budget(limit)
+
+
+@contextmanager
+def recording_statements():
+    """Record the SQL statements executed within, in the list yielded."""
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, 'before_cursor_execute', record)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a request executes more statements than its budget."""
+
+
+class BudgetedTestApp(TestApp):
+    """
+    A WebTest app counting the SQL statements of each request.
+
+    Counts are appended to ``query_counts``. A request executing more than
+    ``budget`` statements fails with the statements it ran. ``warm_up`` is
+    called before the first request, uncounted, to run the app's one-time
+    setup, which would otherwise be charged to that request.
+    """
+
+    def __init__(self, app, budget=None, warm_up=None, **kwargs):
+        """Wrap app, failing requests over budget unless it is None."""
+        super(BudgetedTestApp, self).__init__(app, **kwargs)
+        self.budget = budget
+        self.warm_up = warm_up
+        self.query_counts = []
+
+    def do_request(self, req, status=None, expect_errors=None):
+        """Make a request, counting its statements."""
+        if self.warm_up is not None:
+            warm_up, self.warm_up = self.warm_up, None
+            warm_up()
+        with recording_statements() as statements:
+            response = super(BudgetedTestApp, self).do_request(
+                req, status=status, expect_errors=expect_errors)
+
+        self.query_counts.append(len(statements))
+        if self.budget is not None and len(statements) > self.budget:
+            raise QueryBudgetExceeded(
+                '{} {} executed {} SQL statements, over its budget of {}:\n'
+                '{}'.format(req.method, req.path_qs, len(statements),
+                            self.budget, '\n'.join(statements)))
+        return response
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""A local stand-in for a Slack incoming webhook."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+
+class SlackStub(object):
+    """
+    An HTTP server recording webhook payloads.
+
+    Requests are answered with the queued ``statuses`` in turn, then with
+    200. Set ``delay`` to make every answer that many seconds late.
+    """
+
+    def __init__(self):
+        """Start serving on a free local port."""
+        self.payloads = []
+        self.statuses = []
+        self.delay = 0
+        self._stopped = threading.Event()
+        self.server = HTTPServer(('127.0.0.1', 0), self._handler())
+        self.url = 'http://127.0.0.1:{}/webhook'.format(
+            self.server.server_port)
+        self._thread = threading.Thread(target=self.server.serve_forever,
+                                        args=(0.05,), daemon=True)
+        self._thread.start()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):  # noqa: N802
+                length = int(self.headers['Content-Length'])
+                stub.payloads.append(
+                    json.loads(self.rfile.read(length).decode('utf-8')))
+                stub._stopped.wait(stub.delay)
+                status = stub.statuses.pop(0) if stub.statuses else 200
+                self.send_response(status)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'ok')
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    @property
+    def texts(self):
+        """Get the texts posted so far."""
+        return [payload['text'] for payload in self.payloads]
+
+    def stop(self):
+        """Stop serving."""
+        self._stopped.set()
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""Columnar statistics backend tests."""
+import random
+
+import pytest
+
+from league.analytics import ColumnarLeague
+from league.caching import bump_generation
+from league.models import Color, Game
+
+from .factories import GameFactory, PlayerFactory
+
+np = pytest.importorskip('numpy')
+
+
+@pytest.fixture
+def random_league(db):
+    """A league of random games over two seasons."""
+    rand = random.Random(1234)
+    players = [PlayerFactory(aga_rank=rand.choice([-20, -5, -1, 1, 3, 6]))
+               for _ in range(15)]
+    for season in (1, 2):
+        for episode in (1, 2, 3):
+            for _ in range(rand.randint(1, 20)):
+                white, black = rand.sample(players, 2)
+                GameFactory(white=white, black=black,
+                            winner=rand.choice(list(Color)),
+                            handicap=rand.choice([0, 2, 5, 9]),
+                            season=season, episode=episode)
+    db.session.commit()
+    return players
+
+
+def _flatten(stats):
+    """Turn statistics into comparable lists of player IDs and values."""
+    flat = {}
+    for name, stat in stats.items():
+        if name in ('steady_freddy', 'fifteen_min_fame', 'rock_bottom'):
+            flat[name] = [player.id for player in stat]
+        else:
+            flat[name] = [(place, player.id, value)
+                          for place, (player, value) in stat]
+    return flat
+
+
+class TestColumnarLeague:
+    """Columnar league."""
+
+    def test_from_database(self, random_league):
+        """Load every game into columns."""
+        league = ColumnarLeague.from_database()
+        assert len(league) == Game.query.count()
+        assert league.white.dtype == np.int32
+        assert set(league.winner) <= {1, 2}
+
+    def test_empty(self, db):
+        """Handle a league without games."""
+        PlayerFactory()
+        db.session.commit()
+        stats = ColumnarLeague.from_database().season_stats(1)
+        assert stats['steady_freddy'] == []
+        assert [value for _, (_, value) in stats['wins']] == [0]
+
+    @pytest.mark.parametrize('num_players', [3, 20])
+    def test_matches_sql_backend(self, app, random_league, num_players):
+        """Compute the same statistics as the SQL backend."""
+        results = {}
+        for backend in ('sql', 'numpy'):
+            app.config['STATS_BACKEND'] = backend
+            results[backend] = (
+                [_flatten(Game.episode_stats(episode, season, num_players))
+                 for season in (1, 2) for episode in (1, 2, 3)],
+                [_flatten(Game.season_stats(season, num_players))
+                 for season in (1, 2)])
+        assert results['numpy'] == results['sql']
+
+    def test_reloaded_after_commit(self, app, random_league):
+        """Reload games after they change."""
+        app.config['STATS_BACKEND'] = 'numpy'
+        white, black = random_league[0:2]
+        assert Game.season_stats(season=3)['steady_freddy'] == []
+
+        GameFactory(white=white, black=black, winner=Color.white, season=3,
+                    episode=1).save()
+        stats = Game.season_stats(season=3)
+        assert stats['steady_freddy'] == [white, black]
+        assert list(stats['wins'])[0] == (0, (white, 1))
+
+    def test_reloaded_across_processes(self, app, db, random_league):
+        """Reload games once another process commits changes."""
+        app.config['STATS_BACKEND'] = 'numpy'
+
+        def most_games(season):
+            _, (_, games) = next(iter(
+                Game.season_stats(season=season)['games_played']))
+            return games
+
+        assert most_games(3) == 0
+        Game.query.filter_by(season=2).update({'season': 3})  # No hooks
+        db.session.commit()
+        assert most_games(3) == 0
+
+        bump_generation('league')  # As the other process's commit does
+        assert most_games(3) > 0
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Benchmark suite tests."""
+import json
+
+from click.testing import CliRunner
+
+from league.app import create_app
+from league.bench import (BENCHMARKS, compare, load, percentile, run_benchmarks,
+                          save)
+from league.commands import bench
+from league.settings import BenchConfig
+
+
+def _results(p50_ms, queries):
+    """Results of one benchmark."""
+    return {'results': {'100': {'dashboard': {'p50_ms': p50_ms,
+                                              'queries': queries}}}}
+
+
+class TestBench:
+    """Benchmarks on synthetic leagues."""
+
+    def test_run(self, tmpdir):
+        """Measure every benchmark on each league size."""
+        results = run_benchmarks(lambda: create_app(BenchConfig), [20, 40],
+                                 repeat=1)
+        assert list(results['results']) == ['20', '40']
+        for by_name in results['results'].values():
+            assert list(by_name) == list(BENCHMARKS)
+            for result in by_name.values():
+                assert 0 < result['p50_ms'] <= result['p99_ms']
+                assert result['queries'] > 0
+                assert result['peak_kib'] > 0
+
+        path = str(tmpdir.join('bench.json'))
+        save(results, path)
+        assert load(path) == results
+
+    def test_percentile(self):
+        """Take nearest-rank percentiles."""
+        values = list(range(1, 101))
+        assert [percentile(values, percent) for percent in (50, 90, 99)] == [
+            50, 90, 99]
+        assert percentile([3], 99) == 3
+
+    def test_compare(self):
+        """Report slower medians and extra queries."""
+        baseline = _results(10, 5)
+        assert compare(_results(11.9, 5), baseline, 0.2) == []
+        assert compare(_results(12.1, 6), baseline, 0.2) == [
+            ('100', 'dashboard', 'p50 12.1 ms, was 10 ms'),
+            ('100', 'dashboard', '6 queries, was 5')]
+        assert compare(_results(50, 50), {'results': {}}, 0.2) == []
+
+    def test_command(self, script_info, tmpdir):
+        """Write results and fail on regressions against a baseline."""
+        output = tmpdir.join('bench.json')
+        baseline = tmpdir.join('baseline.json')
+        args = ['--sizes', '50', '-n', '1', '-b', 'api_games',
+                '-o', str(output)]
+        runner = CliRunner()
+
+        result = runner.invoke(bench, args, obj=script_info)
+        assert result.exit_code == 0
+        results = json.loads(output.read())
+        assert list(results['results']['50']) == ['api_games']
+
+        results['results']['50']['api_games']['queries'] = 0
+        baseline.write(json.dumps(results))
+        result = runner.invoke(bench, args + ['--baseline', str(baseline)],
+                               obj=script_info)
+        assert result.exit_code == 1
+        assert 'Regression: 50 games, api_games: 2 queries, was 0' in (
+            result.output)
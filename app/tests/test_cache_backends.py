@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""Cache backend tests."""
+import multiprocessing
+
+import pytest
+
+from league import cache_backends, extensions
+from league.app import create_app
+from league.cache_backends import SQLiteCache
+from league.settings import TestConfig
+
+
+@pytest.fixture
+def path(tmpdir):
+    """A path for a cache database."""
+    return str(tmpdir.join('cache.sqlite'))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A controllable clock for the cache backend."""
+    now = [1000.0]
+    monkeypatch.setattr(cache_backends.time, 'time', lambda: now[0])
+    return now
+
+
+def _set_in_child(path):
+    SQLiteCache(path).set('from_child', {'pid': 'child'})
+
+
+class TestSQLiteCache:
+    """SQLite cache backend."""
+
+    def test_get_and_set(self, path):
+        """Round-trip values through the cache."""
+        cache = SQLiteCache(path)
+        assert cache.get('missing') is None
+        assert cache.set('key', [1, 'two'])
+        cache.set_many({'a': 1, 'b': 2})
+
+        assert cache.get('key') == [1, 'two']
+        assert cache.get_many('a', 'missing', 'b') == [1, None, 2]
+        assert cache.has('a')
+        cache.delete('a')
+        assert not cache.has('a')
+
+    def test_shared_between_instances(self, path):
+        """See values set through another connection to the same file."""
+        SQLiteCache(path).set('key', 'value')
+        assert SQLiteCache(path).get('key') == 'value'
+
+    def test_shared_between_processes(self, path):
+        """See values set by another process."""
+        cache = SQLiteCache(path)
+        cache.get('key')
+        process = multiprocessing.get_context('fork').Process(
+            target=_set_in_child, args=(path,))
+        process.start()
+        process.join()
+        assert cache.get('from_child') == {'pid': 'child'}
+
+    def test_timeout(self, path, clock):
+        """Expire entries after their timeout, keeping timeout 0 forever."""
+        cache = SQLiteCache(path, default_timeout=10)
+        cache.set('default', 1)
+        cache.set('short', 2, timeout=1)
+        cache.set('forever', 3, timeout=0)
+
+        clock[0] += 5
+        assert cache.get_many('default', 'short', 'forever') == [1, None, 3]
+        clock[0] += 10
+        assert cache.get_many('default', 'short', 'forever') == [
+            None, None, 3]
+
+    def test_lru_eviction(self, path, clock):
+        """Evict the least recently used entries beyond the threshold."""
+        cache = SQLiteCache(path, threshold=2)
+        cache.set('a', 1)
+        clock[0] += 2
+        cache.set('b', 2)
+        clock[0] += 2
+        cache.get('a')
+        clock[0] += 2
+        cache.set('c', 3)
+
+        assert cache.get_many('a', 'b', 'c') == [1, None, 3]
+
+    def test_add(self, path, clock):
+        """Only add values for keys without a live value."""
+        cache = SQLiteCache(path)
+        assert cache.add('key', 1, timeout=1)
+        assert not cache.add('key', 2)
+        clock[0] += 2
+        assert cache.add('key', 3)
+        assert cache.get('key') == 3
+
+    def test_inc_and_dec(self, path):
+        """Count atomically, starting from zero."""
+        cache = SQLiteCache(path)
+        assert cache.inc('counter') == 1
+        assert cache.inc('counter', 5) == 6
+        assert cache.dec('counter', 2) == 4
+
+    def test_clear(self, path):
+        """Clear every entry by bumping the generation counter."""
+        cache = SQLiteCache(path)
+        other = SQLiteCache(path)
+        cache.set('key', 'value')
+        generation = cache.generation
+
+        other.clear()
+        assert cache.generation == generation + 1
+        assert cache.get('key') is None
+        cache.set('key', 'new')
+        assert other.get('key') == 'new'
+
+    def test_selected_by_config(self, path):
+        """Back the application's cache with SQLite when configured."""
+        class Config(TestConfig):
+            CACHE_TYPE = 'league.cache_backends.sqlite'
+            CACHE_SQLITE_PATH = path
+
+        app = create_app(Config)
+        with app.app_context():
+            assert isinstance(extensions.cache.cache, SQLiteCache)
+            extensions.cache.set('key', 'value')
+            assert SQLiteCache(path).get('key') == 'value'
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""SQL instrumentation tests."""
+import json
+import logging
+
+from flask import url_for
+from webtest import TestApp
+
+from league.app import create_app
+from league.database import db
+from league.instrumentation import statement_shape
+from league.models import Game
+from league.settings import TestConfig
+
+from .factories import GameFactory
+
+
+def _events(caplog, name):
+    """Get the logged JSON events called name."""
+    events = []
+    for record in caplog.records:
+        try:
+            event = json.loads(record.getMessage())
+        except ValueError:
+            continue
+        if event.get('event') == name:
+            events.append((record.levelno, event))
+    return events
+
+
+class TestSQLInstrumentation:
+    """Statements counted and timed per request."""
+
+    def test_headers(self, testapp, games):
+        """Report statement counts and times on responses."""
+        res = testapp.get(url_for('api.get_games'))
+        assert int(res.headers['X-Query-Count']) > 0
+        assert res.headers['Server-Timing'].startswith('db;dur=')
+        assert '{} queries'.format(res.headers['X-Query-Count']) in (
+            res.headers['Server-Timing'])
+
+    def test_log_line(self, testapp, db, caplog):
+        """Log each request's statements as JSON."""
+        caplog.set_level(logging.INFO)
+        res = testapp.get(url_for('dashboard.prizes'))
+
+        (level, event), = _events(caplog, 'request')
+        assert level == logging.INFO
+        assert event['path'] == '/dashboard/prizes/'
+        assert event['status'] == 200
+        assert event['queries'] == int(res.headers['X-Query-Count'])
+
+    def test_repeated_statements(self, app, testapp, db, caplog):
+        """Warn about statements repeated within a request."""
+        app.config['SQL_REPEAT_THRESHOLD'] = 2
+        for _ in range(3):
+            GameFactory()
+        db.session.commit()
+        game_ids = [game_id for game_id, in db.session.query(Game.id)]
+
+        def lazy_games():
+            # One query per game, as lazy loading a relationship of each does
+            return str([Game.get_by_id(game_id).id for game_id in game_ids])
+
+        app.add_url_rule('/lazy-games', 'lazy_games', lazy_games)
+        db.session.expunge_all()
+        testapp.get('/lazy-games')
+        (level, event), = _events(caplog, 'repeated_query')
+        assert level == logging.WARNING
+        assert event['count'] == 3
+        assert event['path'] == '/lazy-games'
+
+    def test_under_threshold(self, testapp, games, caplog):
+        """Stay quiet while no statement repeats too often."""
+        testapp.get(url_for('api.get_games'))
+        assert _events(caplog, 'repeated_query') == []
+
+    def test_disabled(self):
+        """Leave responses alone when disabled."""
+        class Config(TestConfig):
+            SQL_INSTRUMENTATION = False
+
+        app = create_app(Config)
+        with app.test_request_context():
+            db.create_all()
+            res = TestApp(app).get(url_for('public.about'))
+            db.session.remove()
+        assert 'X-Query-Count' not in res.headers
+
+    def test_statement_shape(self):
+        """Collapse parameter lists and whitespace."""
+        assert statement_shape(
+            'SELECT * FROM players\n WHERE id IN (?, ?, ?)') == (
+            'SELECT * FROM players WHERE id IN (?)')
+        assert statement_shape('SELECT 1 WHERE id IN (%(id_1)s, %(id_2)s)') == (
+            'SELECT 1 WHERE id IN (?)')
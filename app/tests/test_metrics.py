@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""Request metrics tests."""
+import json
+import os
+
+import pytest
+from flask import url_for
+from webtest import TestApp
+
+from league.app import create_app
+from league.database import db
+from league.metrics import LATENCY_BUCKETS, MetricStore
+from league.settings import TestConfig
+
+LOCAL = {'REMOTE_ADDR': '127.0.0.1'}
+
+
+def _samples(text):
+    """Get the value of each sample line of a Prometheus text page."""
+    return {line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1])
+            for line in text.splitlines() if not line.startswith('#')}
+
+
+class TestMetricStore:
+    """Metric values."""
+
+    def test_counter(self):
+        """Render counters with their labels."""
+        store = MetricStore()
+        store.inc('league_requests_total', ('public.home', 'GET', '200'))
+        store.inc('league_requests_total', ('public.home', 'GET', '200'), 2)
+        assert _samples(store.render()) == {
+            'league_requests_total{endpoint="public.home",method="GET",'
+            'status="200"}': 3}
+
+    def test_histogram(self):
+        """Render cumulative buckets, the sum and the count."""
+        store = MetricStore()
+        for duration in (0.004, 0.02, 0.02, 30):
+            store.observe('league_request_duration_seconds',
+                          ('public.home', 'GET'), duration)
+        samples = _samples(store.render())
+        prefix = 'league_request_duration_seconds'
+        labels = 'endpoint="public.home",method="GET"'
+        assert samples['{}_bucket{{{},le="0.005"}}'.format(
+            prefix, labels)] == 1
+        assert samples['{}_bucket{{{},le="0.01"}}'.format(
+            prefix, labels)] == 1
+        assert samples['{}_bucket{{{},le="0.025"}}'.format(
+            prefix, labels)] == 3
+        assert samples['{}_bucket{{{},le="10"}}'.format(prefix, labels)] == 3
+        assert samples['{}_bucket{{{},le="+Inf"}}'.format(
+            prefix, labels)] == 4
+        assert samples['{}_sum{{{}}}'.format(prefix, labels)] == (
+            pytest.approx(30.044))
+        assert samples['{}_count{{{}}}'.format(prefix, labels)] == 4
+        assert len([sample for sample in samples if '_bucket' in sample]) == (
+            len(LATENCY_BUCKETS) + 1)
+
+    def test_load(self):
+        """Add up the dumped values of several workers."""
+        first, second, total = MetricStore(), MetricStore(), MetricStore()
+        first.inc('league_request_queries_total', ('public.home',), 3)
+        second.inc('league_request_queries_total', ('public.home',), 4)
+        first.observe('league_request_duration_seconds', ('a', 'GET'), 0.1)
+        second.observe('league_request_duration_seconds', ('a', 'GET'), 0.2)
+        for store in first, second:
+            total.load(json.loads(json.dumps(store.dump())))
+        assert total.values['league_request_queries_total'] == {
+            ('public.home',): 7}
+        assert total.values['league_request_duration_seconds'][
+            ('a', 'GET')][-1] == pytest.approx(0.3)
+
+    def test_escape_labels(self):
+        """Escape quotes, backslashes and newlines in label values."""
+        store = MetricStore()
+        store.inc('league_request_queries_total', ('a"b\\c\n',))
+        assert (r'league_request_queries_total{endpoint="a\"b\\c\n"} 1' in
+                store.render())
+
+
+class TestMetrics:
+    """Metrics of requests."""
+
+    @pytest.fixture
+    def metrics_app(self, tmpdir):
+        """An app sharing metrics through a directory."""
+        class Config(TestConfig):
+            METRICS_DIR = str(tmpdir)
+            METRICS_FLUSH_INTERVAL = 0
+
+        app = create_app(Config)
+        with app.test_request_context():
+            db.create_all()
+            yield app
+            db.session.remove()
+
+    def test_requests(self, testapp, db):
+        """Count requests, their queries and cache lookups by endpoint."""
+        testapp.get(url_for('dashboard.dashboard'))
+        testapp.get(url_for('dashboard.dashboard'))
+        testapp.get('/missing', status=404)
+        samples = _samples(
+            testapp.get(url_for('metrics'), extra_environ=LOCAL).text)
+
+        assert samples['league_requests_total{endpoint="dashboard.dashboard",'
+                       'method="GET",status="200"}'] == 2
+        assert samples['league_requests_total{endpoint="none",method="GET",'
+                       'status="404"}'] == 1
+        assert samples['league_request_duration_seconds_count{'
+                       'endpoint="dashboard.dashboard",method="GET"}'] == 2
+        assert samples['league_request_queries_total{'
+                       'endpoint="dashboard.dashboard"}'] > 0
+        assert samples['league_request_db_seconds_total{'
+                       'endpoint="dashboard.dashboard"}'] > 0
+        assert samples['league_cache_lookups_total{'
+                       'endpoint="dashboard.dashboard",result="hit"}'] == 1
+        assert samples['league_cache_lookups_total{'
+                       'endpoint="dashboard.dashboard",result="miss"}'] == 1
+
+    def test_content_type(self, testapp, db):
+        """Serve the Prometheus text format."""
+        res = testapp.get(url_for('metrics'), extra_environ=LOCAL)
+        assert res.headers['Content-Type'] == (
+            'text/plain; version=0.0.4; charset=utf-8')
+        assert '# TYPE league_request_duration_seconds histogram' in res.text
+
+    def test_remote_address(self, testapp, db):
+        """Hide metrics from other addresses."""
+        testapp.get(url_for('metrics'),
+                    extra_environ={'REMOTE_ADDR': '203.0.113.7'}, status=404)
+
+    def test_workers(self, metrics_app, tmpdir):
+        """Add up the metrics of every worker."""
+        other = MetricStore()
+        other.inc('league_requests_total', ('public.about', 'GET', '200'), 5)
+        tmpdir.join('worker-1.json').write(json.dumps(other.dump()))
+
+        testapp = TestApp(metrics_app)
+        testapp.get(url_for('public.about'))
+        samples = _samples(
+            testapp.get(url_for('metrics'), extra_environ=LOCAL).text)
+        assert samples['league_requests_total{endpoint="public.about",'
+                       'method="GET",status="200"}'] == 6
+        assert tmpdir.join('worker-{}.json'.format(os.getpid())).check()
+
+    def test_forked(self, app):
+        """Drop metrics inherited from the parent process."""
+        metrics = app.extensions['metrics']
+        metrics.store.inc('league_request_queries_total', ('a',))
+        metrics._pid = -1
+        assert metrics.store.values['league_request_queries_total'] == {}
+
+    def test_disabled(self):
+        """Neither count requests nor serve metrics when disabled."""
+        class Config(TestConfig):
+            METRICS = False
+
+        app = create_app(Config)
+        assert 'metrics' not in [rule.endpoint
+                                 for rule in app.url_map.iter_rules()]
@@ -4,7 +4,7 @@ import datetime as dt
 
 import pytest
 
-from league.admin.models import Role, User
+from league.admin.models import Role, User, user_cache
 
 from .factories import UserFactory
 
@@ -65,3 +65,54 @@ class TestUser:
         user.roles.append(role)
         user.save()
         assert role in user.roles
+
+
+@pytest.mark.usefixtures('db')
+class TestUserCache:
+    """Users cached for authenticated requests."""
+
+    @pytest.fixture
+    def cached_user(self, db):
+        """A user with a role, already in the cache."""
+        user = UserFactory(password='myprecious')
+        user.roles.append(Role(name='admin'))
+        db.session.commit()
+        user_cache.load(user.id)
+        db.session.expunge_all()
+        return user
+
+    def test_hit_without_query(self, cached_user, statements):
+        """Load cached users and their roles without a query."""
+        user = user_cache.load(cached_user.id)
+        assert user.username == cached_user.username
+        assert [role.name for role in user.roles] == ['admin']
+        assert statements == []
+
+    def test_expired(self, app, user, statements):
+        """Load users again once their entry expires."""
+        app.config['USER_CACHE_TIMEOUT'] = 0
+        user_id = user.id
+        del statements[:]
+        user_cache.load(user_id)
+        user_cache.load(user_id)
+        assert len(statements) == 2
+
+    def test_password_changed(self, cached_user):
+        """Load users again after their password changed."""
+        user = user_cache.load(cached_user.id)
+        user.set_password('changed')
+        user.save()
+        assert user_cache.load(cached_user.id).check_password('changed')
+
+    def test_deleted(self, cached_user):
+        """Forget deleted users."""
+        User.delete_by_id([cached_user.id])
+        assert user_cache.load(cached_user.id) is None
+
+    def test_created(self, db, cached_user, statements):
+        """Forget cached users after a user is created."""
+        UserFactory()
+        db.session.commit()
+        del statements[:]
+        user_cache.load(cached_user.id)
+        assert len(statements) == 1
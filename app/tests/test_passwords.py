@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""Password hashing tests."""
+import threading
+
+import pytest
+
+from league.extensions import cache, passwords
+from league.passwords import HashingBusy
+
+
+@pytest.mark.usefixtures('app')
+class TestPasswordHasher:
+    """Hashing in a bounded number of slots."""
+
+    def test_hash_and_check(self):
+        """Check passwords against their hash."""
+        pw_hash = passwords.hash('secret')
+        assert passwords.check(pw_hash, 'secret') is True
+        assert passwords.check(pw_hash, 'other') is False
+
+    def test_needs_rehash(self, app):
+        """Detect hashes made with another cost."""
+        pw_hash = passwords.hash('secret')
+        assert passwords.needs_rehash(pw_hash) is False
+        app.config['BCRYPT_LOG_ROUNDS'] += 1
+        assert passwords.needs_rehash(pw_hash) is True
+
+    def test_busy(self, app):
+        """Refuse hashes at once while every slot is taken."""
+        keys = ['password-hash-slots/{}'.format(index) for index
+                in range(app.config['PASSWORD_HASH_SLOTS'])]
+        release = threading.Event()
+
+        def hold():
+            with app.app_context():
+                passwords._run(release.wait)
+
+        holding = threading.Thread(target=hold)
+        holding.start()
+        try:
+            while not any(cache.get(key) for key in keys):
+                release.wait(0.01)
+            assert passwords.check(passwords.hash('secret'), 'secret')
+            # The other slots are held by workers of other processes.
+            for key in keys:
+                cache.add(key, 1)
+            with pytest.raises(HashingBusy):
+                passwords.hash('secret')
+        finally:
+            release.set()
+            holding.join()
+        assert passwords.check(passwords.hash('secret'), 'secret') is True
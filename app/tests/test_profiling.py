@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Route profiler tests."""
+import io
+import os
+
+import pytest
+from click.testing import CliRunner
+
+from league.commands import profile
+from league.profiling import profile_route
+
+
+@pytest.mark.usefixtures('db')
+class TestProfileRoute:
+    """Profiles of requests to a route."""
+
+    def test_split(self, app, games):
+        """Split request time between SQL, Jinja and Python."""
+        result = profile_route(app, '/dashboard/', repeat=2)
+        split = result.split
+        assert split.sql > 0
+        assert split.jinja > 0
+        assert split.python > 0
+        assert split.sql + split.jinja + split.python == (
+            pytest.approx(split.total))
+        assert list(split.as_dict()) == ['sql', 'jinja', 'python', 'total']
+
+    def test_hotspots(self, app, games):
+        """List the functions taking the most time."""
+        result = profile_route(app, '/dashboard/prizes/', repeat=2)
+        calls = {function: call_count for function, (_, call_count, _, _, _)
+                 in result.stats.stats.items()}
+        view, = [(filename, line, name) for filename, line, name in calls
+                 if name == 'prizes' and filename.endswith(
+                     os.path.join('dashboard', 'views.py'))]
+        assert calls[view] == 2
+
+        hotspots = result.hotspots(limit=5)
+        assert 'Ordered by: cumulative time' in hotspots
+        # Directories are only stripped from the listing.
+        assert view in result.stats.stats
+
+    def test_callgrind(self, app, games):
+        """Write calls between functions in the callgrind format."""
+        result = profile_route(app, '/dashboard/', repeat=1)
+        output = io.StringIO()
+        result.write_callgrind(output)
+        text = output.getvalue()
+        assert text.startswith('# callgrind format\n')
+        assert 'events: Microseconds\n' in text
+        assert 'fn=dashboard:' in text
+        assert 'cfn=cached_fragment:' in text
+
+    def test_not_found(self, app):
+        """Refuse routes that do not answer."""
+        with pytest.raises(ValueError) as error:
+            profile_route(app, '/missing/', repeat=1)
+        assert '404' in str(error.value)
+
+    def test_command(self, games, script_info, tmpdir):
+        """Print the split and hotspots, and write the profiles."""
+        callgrind = tmpdir.join('callgrind.out')
+        stats = tmpdir.join('profile.pstats')
+        result = CliRunner().invoke(profile, [
+            '/dashboard/players/{}'.format(games[0].white.id), '-n', '1',
+            '-l', '5', '-o', str(callgrind), '--stats', str(stats)],
+            obj=script_info)
+        assert result.exit_code == 0, result.output
+        assert 'Mean time of 1 requests to /dashboard/players/' in (
+            result.output)
+        for part in ('sql', 'jinja', 'python', 'total'):
+            assert part in result.output
+        assert callgrind.read().startswith('# callgrind format')
+        assert stats.size() > 0
+
+        result = CliRunner().invoke(profile, ['/missing/'], obj=script_info)
+        assert result.exit_code != 0
+        assert '404' in result.output
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Query budget tests."""
+import pytest
+from flask import url_for
+
+from league.caching import bump_generation
+from league.database import db
+from league.models import Game, WhitePlayerGame, league_clock
+from league.seeding import seed_league
+
+from .query_budget import QueryBudgetExceeded, query_budget
+
+
+def _busiest_player_id():
+    """Get the ID of the player with the most games as white."""
+    return (db.session.query(WhitePlayerGame.player_id)
+            .group_by(WhitePlayerGame.player_id)
+            .order_by(db.func.count().desc()).limit(1).scalar())
+
+
+def _middle_game_id():
+    """Get an ID halfway through the games, to start a page after."""
+    return db.session.query(db.func.max(Game.id)).scalar() // 2
+
+
+#: Pages whose statement count must not grow with the league, with the
+#: arguments of their URLs.
+PAGES = [
+    ('dashboard.dashboard', {}),
+    ('dashboard.prizes', {}),
+    ('dashboard.get_players', {}),
+    ('dashboard.get_player', {'player_id': _busiest_player_id}),
+    ('dashboard.list_games', {}),
+    ('dashboard.get_reports', {}),
+    ('api.get_games', {}),
+    ('api.get_games', {'after_id': _middle_game_id, 'limit': 20}),
+    ('admin.list_and_delete_users', {}),
+]
+
+
+def _seed(games):
+    """Add games to the league, as ``flask seed`` does."""
+    seed_league(db.session, players=max(10, games // 10), seasons=1,
+                episodes=4, games=games)
+    league_clock.forget()
+
+
+def _count(app, testapp, endpoint, arguments):
+    """Get the statements of an uncached request in a fresh app context."""
+    bump_generation('league')
+    url = url_for(endpoint, **{
+        key: value() if callable(value) else value
+        for key, value in arguments.items()})
+    db.session.remove()
+    with app.app_context():
+        testapp.get(url)
+        db.session.remove()
+    return testapp.query_counts[-1]
+
+
+@pytest.mark.parametrize('endpoint,arguments', PAGES)
+def test_constant_as_league_grows(app, testapp, db, endpoint, arguments):
+    """Run as many statements for 1000 games as for 10."""
+    counts = []
+    for games in (10, 990):
+        _seed(games)
+        _count(app, testapp, endpoint, arguments)  # Warm up
+        counts.append(_count(app, testapp, endpoint, arguments))
+    assert counts[0] == counts[1]
+
+
+class TestBudgetedTestApp:
+    """WebTest apps holding requests to budgets."""
+
+    def test_counts(self, testapp, db):
+        """Count the statements of each request."""
+        testapp.get(url_for('dashboard.get_players'))
+        testapp.get(url_for('public.about'))
+        assert len(testapp.query_counts) == 2
+        assert testapp.query_counts[0] > testapp.query_counts[1]
+
+    @query_budget(1)
+    def test_over_budget(self, testapp, db):
+        """Fail requests running more statements than the budget."""
+        with pytest.raises(QueryBudgetExceeded) as error:
+            testapp.get(url_for('dashboard.get_players'))
+        assert '/dashboard/players/' in str(error.value)
+        assert 'SELECT' in str(error.value)
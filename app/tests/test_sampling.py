@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""Sampling profiler tests."""
+import threading
+
+import pytest
+from flask import url_for
+
+from league.admin.models import SiteSettings
+from league.extensions import sampling_profiler
+
+
+@pytest.fixture
+def profiler(app, tmpdir):
+    """The sampling profiler, writing samples to a temporary directory."""
+    app.config['SAMPLING_DIR'] = str(tmpdir)
+    app.config['SAMPLING_INTERVAL'] = 0.001
+    yield sampling_profiler
+    sampling_profiler.update_configuration(enabled=False)
+    if sampling_profiler._thread is not None:
+        sampling_profiler._thread.join()
+
+
+def _read(path):
+    """Get the count of each stack in a collapsed stack file."""
+    with open(path) as source:
+        return {line.rsplit(' ', 1)[0]: int(line.rsplit(' ', 1)[1])
+                for line in source}
+
+
+class TestSamplingProfiler:
+    """Stacks of requests sampled per endpoint."""
+
+    def test_sample(self, profiler):
+        """Count the stacks of threads handling requests, by endpoint."""
+        profiler._endpoints[threading.get_ident()] = 'dashboard.dashboard'
+        try:
+            profiler.sample()
+            profiler.sample()
+        finally:
+            profiler._endpoints.clear()
+        profiler.sample()
+
+        stacks = _read(profiler.dump())
+        (stack, count), = stacks.items()
+        assert count == 2
+        assert stack.startswith('dashboard.dashboard;')
+        assert stack.endswith(';league.sampling:sample')
+        assert 'tests.test_sampling:test_sample' in stack.split(';')
+
+    def test_dump_nothing(self, profiler, tmpdir):
+        """Write no file without samples."""
+        assert profiler.dump() is None
+        assert tmpdir.listdir() == []
+
+    def test_delay(self, profiler, app):
+        """Keep the time spent sampling under the overhead limit."""
+        app.config['SAMPLING_INTERVAL'] = 0.05
+        app.config['SAMPLING_MAX_OVERHEAD'] = 0.02
+        assert profiler.delay(0.0001) == 0.05
+        assert profiler.delay(0.002) == pytest.approx(0.098)
+
+    def test_disabled(self, profiler, testapp, db):
+        """Leave requests alone by default."""
+        testapp.get(url_for('public.about'))
+        assert profiler._thread is None or not profiler._thread.is_alive()
+        assert profiler._endpoints == {}
+
+    def test_requests(self, profiler, testapp, db, tmpdir):
+        """Sample requests from a thread, dumping samples when switched off."""
+        profiler.update_configuration(enabled=True)
+        testapp.get(url_for('dashboard.dashboard'))
+        assert profiler._thread.is_alive()
+        assert profiler._endpoints == {}
+
+        # A request in progress, as seen by the sampling thread
+        profiler._endpoints[threading.get_ident()] = 'dashboard.prizes'
+        try:
+            while not any(stack.startswith('dashboard.prizes;')
+                          for stack in list(profiler._samples)):
+                profiler._thread.join(0.01)
+        finally:
+            profiler._endpoints.clear()
+        profiler.update_configuration(enabled=False)
+        profiler._thread.join()
+
+        dump, = tmpdir.listdir()
+        assert dump.basename.endswith('.collapsed')
+        stacks = _read(str(dump))
+        assert any(stack.startswith('dashboard.prizes;') for stack in stacks)
+        assert all(stack.split(';')[0] in ('dashboard.dashboard',
+                                           'dashboard.prizes')
+                   for stack in stacks)
+
+
+class TestSamplingProfilerSettings:
+    """Sampling switched from the admin settings."""
+
+    def test_manage(self, profiler, testapp, db):
+        """Switch sampling on and off for every worker."""
+        res = testapp.get(url_for('admin.settings'))
+        res = res.click(href=url_for('admin.manage_sampling_profiler'))
+        form = res.forms['samplingProfilerForm']
+        assert not form['enabled'].checked
+        form['enabled'] = True
+        res = form.submit()
+
+        assert 'Sampling profiler enabled!' in res
+        assert profiler.enabled
+        assert SiteSettings.get_values()['profiler_enabled'] == 'True'
+        assert res.forms['samplingProfilerForm']['enabled'].checked
+
+        form = res.forms['samplingProfilerForm']
+        form['enabled'] = False
+        res = form.submit()
+        assert 'Sampling profiler disabled!' in res
+        assert not profiler.enabled
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Synthetic league tests."""
+from click.testing import CliRunner
+
+from league.commands import seed
+from league.database import session
+from league.models import Color, Game, Player, PlayerEpisodeStats
+from league.seeding import rank, seed_league
+
+from .factories import PlayerFactory
+
+
+def _league():
+    """Get every player and game, without IDs."""
+    players = session.query(Player.first_name, Player.last_name,
+                            Player.aga_id, Player.aga_rank).all()
+    games = [(game.white.aga_id, game.black.aga_id, game.winner,
+              game.handicap, game.komi, game.season, game.episode,
+              game.played_at) for game in Game.query.order_by(Game.id)]
+    return players, games
+
+
+class TestSeedLeague:
+    """Synthetic leagues."""
+
+    def test_counts(self, db):
+        """Add the requested players and games over every episode."""
+        seed_league(db.session, 20, 2, 3, 60, batch_size=7)
+        assert Player.query.count() == 20
+        assert Game.query.count() == 60
+        assert (session.query(Game.season, Game.episode).distinct().count() ==
+                6)
+        assert PlayerEpisodeStats.query.count() > 0
+
+    def test_deterministic(self, db):
+        """Add the same league for the same seed."""
+        seed_league(db.session, 20, 2, 3, 60)
+        league = _league()
+        db.drop_all()
+        db.create_all()
+
+        seed_league(db.session, 20, 2, 3, 60)
+        assert _league() == league
+        db.drop_all()
+        db.create_all()
+
+        seed_league(db.session, 20, 2, 3, 60, seed=1)
+        assert _league() != league
+
+    def test_realistic(self, db):
+        """Give handicaps to weaker players, who still win some games."""
+        seed_league(db.session, 100, 1, 10, 400)
+        for game in Game.query:
+            assert game.white.aga_rank >= game.black.aga_rank
+            assert game.handicap in (0, 2, 3, 4, 5, 6, 7, 8, 9)
+            assert game.komi in ((0,) if game.handicap else (0, 7))
+        ranks = [player.aga_rank for player in Player.query]
+        assert 0 not in ranks
+        assert min(ranks) < -10 and max(ranks) > 0
+        black_wins = Game.query.filter_by(winner=Color.black).count()
+        assert 100 < black_wins < 300
+
+    def test_after_existing(self, db):
+        """Add players after existing ones, leaving room for more."""
+        PlayerFactory(aga_id=20000)
+        db.session.commit()
+        seed_league(db.session, 5, 1, 1, 5)
+        assert (session.query(Player.aga_id).order_by(Player.id)[1:] ==
+                [(20001,), (20002,), (20003,), (20004,), (20005,)])
+        PlayerFactory()
+        db.session.commit()
+
+    def test_rank(self):
+        """Map strengths to AGA ranks, skipping zero."""
+        assert [rank(strength) for strength in (8.99, 0.5, -0.5, -1, -30)] == [
+            9, 1, -1, -1, -30]
+
+    def test_command(self, app, db, script_info):
+        """Seed a league from the command line."""
+        result = CliRunner().invoke(
+            seed, ['--players', '10', '--games', '50'], obj=script_info)
+        assert result.output == 'Added 10 players and 50 games.\n'
+        assert Game.latest_season_episode() == (3, 12)
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""Slack messenger tests."""
+import datetime as dt
+import time
+
+import pytest
+from click.testing import CliRunner
+from flask import url_for
+
+from league.admin.models import SiteSettings
+from league.commands import drain_slack
+from league.extensions import messenger
+from league.models import SlackMessage
+
+
+def _make_due(message):
+    """Skip a message's backoff."""
+    message.next_attempt_at = dt.datetime.utcnow()
+    message.save()
+
+
+class TestOutbox:
+    """Notifications queued in the outbox."""
+
+    def test_queued_with_game(self, testapp, players, slack_stub):
+        """Queue a notification in the game's transaction, sent later."""
+        testapp.post(url_for('api.create_game'), {
+            'white_id': players[0].id, 'black_id': players[1].id,
+            'winner': 'white', 'handicap': 0, 'komi': 7, 'season': 1,
+            'episode': 1})
+
+        message, = SlackMessage.query.all()
+        assert players[0].full_name in message.text
+        assert slack_stub.payloads == []
+
+        assert messenger.deliver_pending() == (1, 0)
+        assert slack_stub.texts == [message.text]
+        assert slack_stub.payloads[0]['channel'] == '#league'
+        assert message.sent_at is not None
+
+    def test_rolled_back(self, db, slack_stub):
+        """Drop notifications of rolled back transactions."""
+        messenger.notify_slack('Never happened')
+        db.session.rollback()
+        assert SlackMessage.query.count() == 0
+
+    def test_disabled(self, db):
+        """Ignore notifications while Slack is disabled."""
+        messenger.notify_slack('Ignored')
+        db.session.commit()
+        assert SlackMessage.query.count() == 0
+
+
+class TestDelivery:
+    """Delivery of queued notifications."""
+
+    def test_retry_with_backoff(self, db, slack_stub):
+        """Retry failed deliveries after a growing delay."""
+        slack_stub.statuses = [500, 503]
+        messenger.notify_slack('Hello')
+        db.session.commit()
+        message = SlackMessage.query.one()
+
+        assert messenger.deliver_pending() == (0, 1)
+        first_delay = message.next_attempt_at - dt.datetime.utcnow()
+        assert message.attempts == 1
+        assert '500' in message.last_error
+        assert messenger.deliver_pending() == (0, 0)
+
+        _make_due(message)
+        assert messenger.deliver_pending() == (0, 1)
+        assert message.next_attempt_at - dt.datetime.utcnow() > first_delay
+
+        _make_due(message)
+        assert messenger.deliver_pending() == (1, 0)
+        assert message.attempts == 3
+        assert message.last_error is None
+        assert slack_stub.texts == ['Hello'] * 3
+
+    def test_timeout(self, app, db, slack_stub):
+        """Give up on slow responses after the read timeout."""
+        app.config['SLACK_TIMEOUT'] = (1, 0.2)
+        slack_stub.delay = 2
+        messenger.notify_slack('Slow')
+        db.session.commit()
+
+        started = time.monotonic()
+        assert messenger.deliver_pending() == (0, 1)
+        assert time.monotonic() - started < 1.5
+        assert 'timed out' in SlackMessage.query.one().last_error
+
+    def test_max_attempts(self, app, db, slack_stub):
+        """Stop retrying after the last attempt."""
+        app.config['SLACK_MAX_ATTEMPTS'] = 1
+        slack_stub.statuses = [500]
+        messenger.notify_slack('Lost')
+        db.session.commit()
+
+        assert messenger.deliver_pending() == (0, 1)
+        _make_due(SlackMessage.query.one())
+        assert messenger.deliver_pending() == (0, 0)
+
+    def test_lease_runs_out(self, db, slack_stub):
+        """Send a claimed message again once its worker's lease runs out."""
+        messenger.notify_slack('Orphaned')
+        db.session.commit()
+        message, = messenger._claim(messenger._next_posts(flush=False))
+
+        assert messenger.deliver_pending() == (0, 0)
+        assert 20 < messenger.seconds_until_due() <= 26.1
+
+        message.claimed_until = dt.datetime.utcnow()
+        message.save()
+        assert messenger.deliver_pending() == (1, 0)
+        assert message.claimed_until is None
+        assert slack_stub.texts == ['Orphaned']
+
+    def test_drain_command(self, db, script_info, slack_stub):
+        """Deliver due notifications from the command line."""
+        messenger.notify_slack('From the outbox')
+        db.session.commit()
+
+        result = CliRunner().invoke(drain_slack, obj=script_info)
+        assert result.output == 'Sent 1 Slack messages, 0 failed.\n'
+        assert slack_stub.texts == ['From the outbox']
+
+
+class TestDigest:
+    """Notifications coalesced into digests."""
+
+    @pytest.fixture
+    def digest(self, slack_stub):
+        """Hold messages for a minute, or until three are waiting."""
+        messenger.update_configuration({'enabled': True, 'digest_window': 60,
+                                        'digest_size': 3})
+        return slack_stub
+
+    def test_held_for_window(self, db, digest):
+        """Send one summary once the oldest message's window closes."""
+        messenger.notify_slack('First')
+        messenger.notify_slack('Second')
+        db.session.commit()
+
+        assert messenger.deliver_pending() == (0, 0)
+        assert 55 < messenger.seconds_until_due() <= 60
+        _make_due(SlackMessage.query.first())
+
+        assert messenger.deliver_pending() == (2, 0)
+        assert digest.texts == ['2 updates:\n• First\n• Second']
+
+    def test_sent_at_size(self, db, digest):
+        """Send a summary as soon as enough messages are waiting."""
+        for text in ('One', 'Two', 'Three', 'Four'):
+            messenger.notify_slack(text)
+        db.session.commit()
+
+        assert messenger.deliver_pending() == (3, 0)
+        assert digest.texts == ['3 updates:\n• One\n• Two\n'
+                                '• Three']
+        assert messenger.deliver_pending(flush=True) == (1, 0)
+        assert digest.texts[1] == 'Four'
+
+    def test_failed_digest_retried(self, db, digest):
+        """Retry every message of a failed summary together."""
+        digest.statuses = [500]
+        messenger.notify_slack('First')
+        messenger.notify_slack('Second')
+        db.session.commit()
+
+        assert messenger.deliver_pending(flush=True) == (0, 2)
+        for message in SlackMessage.query:
+            _make_due(message)
+        assert messenger.deliver_pending() == (2, 0)
+        assert digest.texts[0] == digest.texts[1]
+
+    def test_claimed_by_one_worker(self, db, digest):
+        """Post a digest once when two workers interleave its claim."""
+        messenger.notify_slack('First')
+        messenger.notify_slack('Second')
+        db.session.commit()
+
+        first_worker = messenger._next_posts(flush=True)
+        second_worker = messenger._next_posts(flush=True)
+        assert len(first_worker) == len(second_worker) == 2
+        assert messenger._claim(first_worker) == first_worker
+        assert messenger._claim(second_worker) == []
+        # Never attempted messages are no longer waiting once claimed.
+        assert messenger._next_posts(flush=True) is None
+        assert messenger.deliver_pending(flush=True) == (0, 0)
+
+        assert messenger.deliver(first_worker)
+        assert messenger.deliver_pending(flush=True) == (0, 0)
+        assert digest.texts == ['2 updates:\n• First\n• Second']
+
+    def test_configured_from_admin(self, testapp, db):
+        """Save the digest settings from the Slack integration page."""
+        res = testapp.get(url_for('admin.manage_slack_integration'))
+        form = res.forms['slackIntegrationForm']
+        form['webhook'] = 'https://hooks.slack.com/services/T0/B0/X'
+        form['channel'] = '#league'
+        form['username'] = 'leaguebot'
+        form['icon_emoji'] = ':robot_face:'
+        form['digest_window'] = '120'
+        form['digest_size'] = '20'
+        form.submit('update')
+
+        assert messenger.config['digest_window'] == 120
+        assert messenger.config['digest_size'] == 20
+        assert SiteSettings.get_by_key('slack_digest_window').value == '120'
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""League statistics tests."""
+import pytest
+
+from league.models import Color, Game, PlayerEpisodeStats
+from league.stats import Leaderboards, refresh_player_episode_stats
+
+from .factories import GameFactory, PlayerFactory
+
+
+@pytest.fixture
+def league(db):
+    """A dan, two kyus and a handful of games over two episodes."""
+    dan = PlayerFactory(aga_rank=3)
+    kyu = PlayerFactory(aga_rank=-5)
+    novice = PlayerFactory(aga_rank=-20)
+    results = [
+        (dan, kyu, Color.white, 4, 1),
+        (dan, novice, Color.black, 9, 1),
+        (kyu, novice, Color.white, 5, 1),
+        (kyu, dan, Color.white, 0, 2),
+        (novice, kyu, Color.black, 0, 2),
+    ]
+    for white, black, winner, handicap, episode in results:
+        GameFactory(white=white, black=black, winner=winner,
+                    handicap=handicap, season=1, episode=episode)
+    db.session.commit()
+    return dan, kyu, novice
+
+
+def _values(leaderboard):
+    """Map player to value for a leaderboard."""
+    return {player: value for _, (player, value) in leaderboard}
+
+
+class TestEpisodeStats:
+    """Episode statistics."""
+
+    def test_counters(self, league):
+        """Count wins, games, stones and rank upsets in an episode."""
+        dan, kyu, novice = league
+        stats = Game.episode_stats(episode=1, season=1)
+
+        assert _values(stats['wins']) == {dan: 1, kyu: 1, novice: 1}
+        assert _values(stats['games_played']) == {dan: 2, kyu: 2, novice: 2}
+        assert _values(stats['stones_given']) == {dan: 13, kyu: 5,
+                                                  novice: 0}
+        assert _values(stats['dans_slain']) == {dan: 0, kyu: 0, novice: 1}
+        assert _values(stats['kyus_killed']) == {dan: 1, kyu: 0, novice: 0}
+        assert _values(stats['win_ratios']) == {dan: 0.5, kyu: 0.5,
+                                                novice: 0.5}
+
+    def test_counted_with_current_ranks(self, league):
+        """Count rank upsets again after a player's rank changes."""
+        dan, kyu, novice = league
+        dan.update(aga_rank=-1)
+
+        stats = Game.episode_stats(episode=1, season=1)
+        assert _values(stats['dans_slain']) == {dan: 0, kyu: 0, novice: 0}
+        assert _values(stats['kyus_killed']) == {dan: 0, kyu: 0, novice: 0}
+        stats = Game.episode_stats(episode=2, season=1)
+        assert _values(stats['dans_slain']) == {dan: 0, kyu: 0, novice: 0}
+
+    def test_defaults_to_latest_episode(self, league):
+        """Use the latest season and episode by default."""
+        dan, kyu, novice = league
+        stats = Game.episode_stats()
+        assert _values(stats['wins']) == {dan: 0, kyu: 2, novice: 0}
+
+    def test_leaderboard_is_truncated(self, league):
+        """Only return the requested number of players, best first."""
+        stats = Game.episode_stats(episode=1, season=1, num_players=1)
+        assert [(place, player.aga_rank, value) for place, (player, value)
+                in stats['stones_given']] == [(0, 3, 13)]
+
+
+class TestSeasonStats:
+    """Season statistics."""
+
+    def test_counters(self, league):
+        """Aggregate counters over every episode of a season."""
+        dan, kyu, novice = league
+        stats = Game.season_stats(season=1)
+
+        assert _values(stats['wins']) == {dan: 1, kyu: 3, novice: 1}
+        assert _values(stats['losses']) == {dan: 2, kyu: 1, novice: 2}
+        assert _values(stats['wins_minus_losses']) == {dan: -1, kyu: 2,
+                                                       novice: -1}
+        assert _values(stats['games_played_one_ep']) == {
+            dan: 2, kyu: 2, novice: 2}
+        assert _values(stats['games_against_weaker']) == {dan: 3, kyu: 2,
+                                                          novice: 0}
+        assert _values(stats['dans_slain']) == {dan: 0, kyu: 1, novice: 1}
+
+    def test_prizes(self, league):
+        """Award prizes based on per-episode results."""
+        dan, kyu, novice = league
+        stats = Game.season_stats(season=1)
+
+        assert stats['steady_freddy'] == [dan, kyu, novice]
+        assert stats['fifteen_min_fame'] == []
+        assert stats['rock_bottom'] == []
+
+    def test_no_games(self, db):
+        """Return empty prizes for a season without games."""
+        PlayerFactory()
+        db.session.commit()
+        stats = Game.season_stats(season=1)
+
+        assert stats['steady_freddy'] == []
+        assert [value for _, (_, value) in stats['wins']] == [0]
+        assert list(stats['wins_minus_losses']) == []
+
+
+class TestLeaderboards:
+    """Leaderboard builder."""
+
+    def test_ranking(self, db):
+        """Rank by value, then by player ID, padding with zeros."""
+        players = [PlayerFactory() for _ in range(6)]
+        db.session.commit()
+        ids = [player.id for player in players]
+
+        leaderboards = Leaderboards(num_players=3)
+        leaderboards.add('filled', {ids[4]: 2, ids[1]: 0})
+        leaderboards.add('unfilled', {ids[5]: 1, ids[3]: 1}, fill=False)
+        leaderboards.add_players('listed', [ids[2], ids[0]])
+        stats = leaderboards.build()
+
+        assert list(stats['filled']) == [
+            (0, (players[4], 2)), (1, (players[0], 0)), (2, (players[1], 0))]
+        assert list(stats['unfilled']) == [
+            (0, (players[3], 1)), (1, (players[5], 1))]
+        assert stats['listed'] == [players[0], players[2]]
+
+
+class TestPlayerEpisodeStats:
+    """Incrementally maintained player episode stats."""
+
+    @staticmethod
+    def _rows():
+        return sorted((row.player_id, row.season, row.episode, row.wins,
+                       row.losses) for row in PlayerEpisodeStats.query.all())
+
+    def test_created_with_games(self, league):
+        """Keep one row per player per episode played."""
+        dan, kyu, novice = league
+        assert self._rows() == [
+            (dan.id, 1, 1, 1, 1), (dan.id, 1, 2, 0, 1),
+            (kyu.id, 1, 1, 1, 1), (kyu.id, 1, 2, 2, 0),
+            (novice.id, 1, 1, 1, 1), (novice.id, 1, 2, 0, 1),
+        ]
+
+    def test_updated_with_games(self, league):
+        """Move results between rows when a game is updated."""
+        dan, kyu, novice = league
+        game = Game.query.filter_by(episode=2).first()
+        game.update(winner=Color.black, episode=3)
+
+        assert dan.episode_stats((1, 3)) == {'wins': 1, 'losses': 0}
+        assert kyu.episode_stats((1, 2)) == {'wins': 1, 'losses': 0}
+        assert kyu.season_stats(1) == {'wins': 2, 'losses': 2}
+
+    def test_deleted_with_games(self, league):
+        """Drop results of deleted games."""
+        dan, kyu, novice = league
+        for game in Game.query.filter_by(episode=2):
+            game.delete()
+
+        assert [row for row in self._rows() if row[2] == 2] == []
+        assert dan.league_stats() == {'wins': 1, 'losses': 1}
+
+    def test_rebuild(self, db, league):
+        """Rebuild every row from games."""
+        rows = self._rows()
+        PlayerEpisodeStats.query.delete()
+        refresh_player_episode_stats(db.session)
+        db.session.commit()
+        assert self._rows() == rows
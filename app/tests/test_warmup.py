@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Warm-up tests."""
+import threading
+
+import pytest
+from click.testing import CliRunner
+from flask import url_for
+
+from league.admin.models import User
+from league.app import create_app
+from league.commands import warm_up
+from league.database import db
+from league.extensions import messenger
+from league.settings import TestConfig
+from league.warmup import warm_deploy, warm_worker
+
+from .query_budget import BudgetedTestApp
+
+
+class TestWarmDeploy:
+    """Warm-up once per deploy."""
+
+    def test_root_user_and_pages(self, app, db, games):
+        """Create the root user and render cached pages."""
+        assert warm_deploy(app) == [url_for('dashboard.dashboard'),
+                                    url_for('dashboard.prizes')]
+        assert User.get_by_username('root') is not None
+
+        testapp = BudgetedTestApp(app)
+        for endpoint in 'dashboard.dashboard', 'dashboard.prizes':
+            assert testapp.get(url_for(endpoint)).headers['X-Cache'] == 'HIT'
+
+    def test_not_before_first_request(self, app):
+        """Leave nothing for the first request to do."""
+        assert app.before_first_request_funcs == []
+
+    def test_command(self, db, script_info):
+        """Warm up from the command line."""
+        result = CliRunner().invoke(warm_up, obj=script_info)
+        assert result.exit_code == 0, result.output
+        assert 'Cached /dashboard/.' in result.output
+        assert result.output.endswith('Warmed up.\n')
+        assert User.get_by_username('root') is not None
+
+
+class TestWarmWorker:
+    """Warm-up of each worker process."""
+
+    @pytest.fixture
+    def file_app(self, tmpdir):
+        """An app with a database that outlives its connections."""
+        class Config(TestConfig):
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///{}'.format(
+                tmpdir.join('league.sqlite'))
+
+        app = create_app(Config)
+        with app.app_context():
+            db.create_all()
+            warm_deploy(app)
+        # As a new worker would, having loaded nothing
+        app.extensions.pop('settings_version')
+        app.extensions.pop('league_clock')
+        yield app
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+    def test_first_request(self, file_app):
+        """Serve the first request as cheaply as the next."""
+        warm_worker(file_app)
+        assert set(file_app.extensions['league_clock']) == {
+            'generation', 'latest', 'max'}
+        assert 'settings_version' in file_app.extensions
+
+        testapp = BudgetedTestApp(file_app)
+        with file_app.test_request_context():
+            url = url_for('dashboard.dashboard')
+        testapp.get(url)
+        testapp.get(url)
+        first, second = testapp.query_counts
+        assert first == second
+
+    def test_templates(self, file_app):
+        """Compile every template."""
+        warm_worker(file_app)
+        cached = {name for _, name in file_app.jinja_env.cache.keys()}
+        assert {'layout.html', 'dashboard/dashboard.html'} <= cached
+
+    def test_slack_delivery(self, file_app, monkeypatch):
+        """Start delivering Slack messages left pending by other workers."""
+        started = threading.Event()
+        monkeypatch.setattr(messenger, '_deliver_forever', started.set)
+        warm_worker(file_app)
+        assert not started.wait(0.1)
+
+        file_app.config['SLACK_DELIVERY_THREAD'] = True
+        warm_worker(file_app)
+        assert started.wait(5)